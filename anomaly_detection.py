@@ -1,16 +1,23 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import sqlite3
 import json
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
+from log_compression import attach_compact_reader
+from connection_manager import get_manager
 
 class AnomalyDetection:
     def __init__(self, db_path="logs/crm.db"):
-        self.conn = sqlite3.connect(db_path)
+        self.db = get_manager(db_path)
+        # Read compacted rows transparently through `logs`
+        self.db.add_reader_hook(attach_compact_reader)
         self.model = None
         self.scaler = None
+
+    @property
+    def conn(self):
+        return self.db.reader()
     
     def detect_system_anomalies(self, days=7, contamination=0.05):
         """
@@ -1,31 +1,26 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import sqlite3
 import json
 from datetime import datetime, timedelta
-import altair as alt
 from log_analyzer import LogAnalyzer
+from log_query import LogQuery
+from async_log_analyzer import AsyncLogAnalyzer
+import asyncio
 from pathlib import Path
 from logging_system import DatabaseLogHandler
+from connection_manager import get_manager
+from model_warmup import (ModelWarmer, warm_sentiment_scorer, load_keras_model, warm_keras_model,
+                          load_pickle, warm_arima_model)
+from sentiment_scoring import load_sentiment_scorer
 import logging
-import pickle
-import numpy as np
-from flask import Flask, request, render_template
-import matplotlib.pyplot as plt
-import joblib
-import calplot
 import smtplib
 from email.mime.text import MIMEText
 from dotenv import load_dotenv
 import os
-import smtplib
-from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from tensorflow.keras.models import load_model  # Add this import
-import pandas as pd
-from tensorflow.keras.preprocessing.sequence import pad_sequences
-from tensorflow.keras.preprocessing.text import Tokenizer
+# Heavy libraries (TensorFlow, scikit-learn, plotly, altair, matplotlib, calplot)
+# are imported by the pages that use them, so a rerun of any other page doesn't
+# pay for them. Check with: python -m benchmarks.profile_startup
 # Page configuration
 st.set_page_config(
     page_title="Automotive CRM Logging Dashboard",
@@ -33,8 +28,45 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize analyzer
-analyzer = LogAnalyzer()
+# Initialize analyzer once per process; its hot tier and backfills would
+# otherwise be rebuilt on every rerun
+@st.cache_resource
+def get_analyzer():
+    return LogAnalyzer()
+
+analyzer = get_analyzer()
+
+# Coroutine API for pages that issue several independent queries
+@st.cache_resource
+def get_async_analyzer():
+    return AsyncLogAnalyzer(analyzer=get_analyzer())
+
+async_analyzer = get_async_analyzer()
+
+# Similar-customer and vehicle recommendation indexes, loaded (or built) once per process
+@st.cache_resource
+def get_predictive_analytics():
+    from predictive_analytics import PredictiveAnalytics
+    return PredictiveAnalytics()
+
+# Closed registration weeks are folded in on a background thread, never during a rerun
+@st.cache_resource
+def get_cohort_retention():
+    from cohort_analysis import CohortRetention
+    cohorts = CohortRetention()
+    cohorts.start_maintenance()
+    return cohorts
+
+# Expired sessions, token revocations and idle login-throttling keys are cleaned up
+# on a background thread, once per process
+@st.cache_resource
+def get_auth_system():
+    from auth_system import AuthenticationSystem
+    auth = AuthenticationSystem()
+    auth.start_maintenance()
+    return auth
+
+auth_system = get_auth_system()
 
 # Initialize database and logging system
 @st.cache_resource
@@ -43,11 +75,16 @@ def initialize_db():
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
     
-    # Create and initialize the database
-    conn = sqlite3.connect("logs/crm.db")
+    # Log writes share the process-wide writer connection (WAL mode)
+    db = get_manager("logs/crm.db")
+    conn = db.writer()
     
     # Add database handler to logging system
-    db_handler = DatabaseLogHandler(conn)
+    db_handler = DatabaseLogHandler(conn, write_lock=db.write_lock)
+    # This process's own log writes reach the analyzer's hot tier straight away
+    hot_tier = get_analyzer().hot_tier
+    if hot_tier is not None:
+        db_handler.add_listener(hot_tier)
     logging.getLogger().addHandler(db_handler)
     
     return conn
@@ -103,20 +140,41 @@ def send_email(to_email, subject, body):
     except Exception as e:
         st.error(f"Error while sending email: {str(e)}")
 
-# Load the saved sentiment analysis model
-model = load_model('sentiment_model.keras')
+FORECAST_MODEL_DIR = "sales_models"
+FORECAST_CARS = ['Ertiga', 'WagonR', 'Brezza', 'Grand Vitara']
 
-# Load or define your tokenizer (recreate or load from a file if saved separately)
-tokenizer = Tokenizer(num_words=5000)
+def forecast_model_path(car):
+    return f"{FORECAST_MODEL_DIR}/{car.lower().replace(' ', '_')}_arima_model.pkl"
+
+# Models load and warm up on a background thread, once per process; pages show
+# a "warming up" state until theirs is ready instead of blocking the rerun
+@st.cache_resource
+def get_model_warmer():
+    warmer = ModelWarmer()
+    warmer.register("sentiment", load_sentiment_scorer, warm_sentiment_scorer)
+    warmer.register("esg", lambda: load_keras_model("esg_model.h5"), warm_keras_model)
+    for car in FORECAST_CARS:
+        warmer.register(f"forecast:{car}", lambda path=forecast_model_path(car): load_pickle(path), warm_arima_model)
+    return warmer.start()
+
+model_warmer = get_model_warmer()
+
+def show_warming_up(name, label):
+    """Shown instead of a page's model output while the model isn't ready"""
+    status = model_warmer.status(name)
+    if status["state"] == "failed":
+        st.error(f"Could not load the {label}: {status['error']}")
+    else:
+        st.info(f"The {label} is warming up; this takes a few seconds after the app starts.")
+        st.button("Check again")
 
-# Function to predict sentiment
+# Functions to predict sentiment, with the tokenizer fitted at training time
 def predict_sentiment(text):
-    # Tokenize the text using the fitted tokenizer
-    tw = tokenizer.texts_to_sequences([text])
-    tw = pad_sequences(tw, maxlen=200)  # Adjust the maxlen as per your training
-    prediction = int(model.predict(tw).round().item())
-    return 'Positive' if prediction == 1 else 'Negative'
+    return predict_sentiment_batch([text])[0]
 
+def predict_sentiment_batch(texts):
+    """Sentiment of many comments, scored in fixed-size batches"""
+    return model_warmer.get("sentiment").predict(texts)
 
 
 # Sidebar
@@ -126,6 +184,7 @@ page = st.sidebar.radio(
     [
         "Overview", 
         "Customer Logs", 
+        "Customer Retention",
         "ESG Integration", 
         "Service Tracking", 
         "ESG Integration",
@@ -145,8 +204,15 @@ time_options = {
 selected_time = st.sidebar.selectbox("Time Period", list(time_options.keys()))
 time_hours = time_options[selected_time]
 
+# Readiness of the background-loaded models
+with st.sidebar.expander("Model status"):
+    for name, status in model_warmer.status().items():
+        took = f" ({status['seconds']:.1f}s)" if status['seconds'] is not None else ""
+        st.write(f"{name}: {status['state']}{took}")
+
 # Main content based on selected page
 if page == "Overview":
+    import altair as alt
     st.title("Automotive CRM Logging Dashboard")
     
     # Stats cards
@@ -155,10 +221,27 @@ if page == "Overview":
     # If time_hours is None, use a large value to get all logs
     hours_filter = time_hours if time_hours else 24*365*10
     
-    logs_df = analyzer.get_logs_by_timeframe(hours=hours_filter)
+    # The page's independent queries run concurrently
+    async def load_overview():
+        return await asyncio.gather(
+            async_analyzer.get_logs_by_timeframe(hours=hours_filter),
+            async_analyzer.get_log_volume_by_day(days=30 if time_hours is None else time_hours//24),
+            async_analyzer.get_heavy_hitters(window_minutes=60),
+            async_analyzer.get_top_leads(limit=10)
+        )
+
+    logs_df, volume_data, heavy_hitters, top_leads = asyncio.run(load_overview())
     
     with col1:
-        customer_count = len(logs_df[logs_df['category'] == 'CUSTOMER']['customer_id'].unique())
+        if time_hours is None or time_hours >= 24*7:
+            # Long windows: merge daily HyperLogLog sketches instead of scanning rows
+            customer_count = analyzer.approx_count_distinct(
+                "customer_id",
+                days=None if time_hours is None else time_hours // 24,
+                category="CUSTOMER"
+            )
+        else:
+            customer_count = len(logs_df[logs_df['category'] == 'CUSTOMER']['customer_id'].unique())
         st.metric("Unique Customers", customer_count)
     
     with col2:
@@ -175,8 +258,6 @@ if page == "Overview":
     
     # Log volume chart
     st.subheader("Log Volume by Category")
-    volume_data = analyzer.get_log_volume_by_day(days=30 if time_hours is None else time_hours//24)
-    
     if not volume_data.empty:
         chart = alt.Chart(volume_data).mark_area().encode(
             x='day:T',
@@ -188,6 +269,21 @@ if page == "Overview":
     else:
         st.info("No log data available for the selected time period.")
     
+    # Noisiest system messages, from the streaming tracker snapshot
+    st.subheader("Top System Messages (last hour)")
+    if not heavy_hitters.empty:
+        st.dataframe(heavy_hitters[['message', 'component', 'level', 'count']])
+    else:
+        st.info("No system messages tracked in the last hour.")
+    
+    # Lead ranking, rescored on ingest as customer/sales/service events arrive
+    st.subheader("Top Leads")
+    if not top_leads.empty:
+        top_leads['purchase_likelihood'] = (top_leads['score'] * 100).round(1)
+        st.dataframe(top_leads[['customer_id', 'purchase_likelihood', 'priority', 'stage', 'scored_at']])
+    else:
+        st.info("No lead scores yet. Train the purchase prediction model to start scoring.")
+    
     # Recent logs table
     st.subheader("Recent Log Events")
     recent_logs = logs_df.head(10)
@@ -197,39 +293,126 @@ if page == "Overview":
         st.info("No recent logs found.")
 
 elif page == "Customer Logs":
+    import plotly.express as px
     st.title("Customer Interaction Logs")
     
     # Customer search
     customer_id = st.text_input("Enter Customer ID")
     
     if customer_id:
-        customer_logs = analyzer.get_logs_by_customer(customer_id)
+        # Materialized profile: one row read however long the history is
+        profile = analyzer.get_customer_profile(customer_id)
         
-        if not customer_logs.empty:
-            st.subheader(f"Journey for Customer {customer_id}")
+        if profile is not None:
+            st.subheader(profile['name'] or f"Customer {customer_id}")
+            st.write(f"{profile['email'] or 'No email'} · {profile['phone'] or 'No phone'}"
+                     + (f" · {profile['address']}" if profile['address'] else ""))
             
-            # Timeline visualization
-            timeline_data = customer_logs[['timestamp', 'category', 'message']]
-            fig = px.timeline(
-                timeline_data, 
-                x_start="timestamp", 
-                y="category",
-                color="category",
-                hover_data=["message"]
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Funnel Stage", profile['stage_name'] or "None")
+            col2.metric("Services Completed", f"{profile['services_completed']} / {profile['service_count']}")
+            col3.metric("Avg Satisfaction",
+                        f"{profile['avg_satisfaction']:.1f}" if profile['avg_satisfaction'] is not None else "N/A")
+            col4.metric("Events", profile['event_count'])
             
-            # Detailed log table
-            st.subheader("Detailed Customer Logs")
-            st.dataframe(customer_logs)
+            st.write(f"**Last interaction:** {profile['last_interaction']} ({profile['last_category']}: {profile['last_message']})")
+            if profile['last_service_at']:
+                st.write(f"**Last service:** {profile['last_service_type']} on {profile['last_service_at']}")
+            if profile['vehicles']:
+                st.write("**Vehicles:** " + ", ".join(
+                    f"{vehicle_id} ({model})" if model else vehicle_id
+                    for vehicle_id, model in profile['vehicles'].items()
+                ))
+            if profile['preferences']:
+                st.write("**Preferences:** " + ", ".join(map(str, profile['preferences'])))
+            
+            if profile['satisfaction_trend']:
+                trend = pd.DataFrame(profile['satisfaction_trend'], columns=['timestamp', 'satisfaction_score'])
+                fig = px.line(trend, x='timestamp', y='satisfaction_score', markers=True,
+                              title="Service Satisfaction Trend")
+                st.plotly_chart(fig, use_container_width=True)
+            
+            # Customers like this one, for targeting
+            st.subheader("Similar Customers")
+            similar = get_predictive_analytics().similar_customers(customer_id, k=10)
+            if not similar.empty:
+                st.dataframe(similar)
+            else:
+                st.info("No similar customers found.")
+            
+            # Item-item recommendations from funnel activity and preferences
+            st.subheader("Recommended Vehicles")
+            recommendations = get_predictive_analytics().recommend_vehicles(customer_id, n=5)
+            if not recommendations.empty:
+                st.dataframe(recommendations)
+            else:
+                st.info("No vehicle recommendations available.")
+            
+            # Raw events are only read on request
+            if st.checkbox("Show event history"):
+                customer_logs = analyzer.get_logs_by_customer(customer_id)
+                st.subheader(f"Journey for Customer {customer_id}")
+                
+                # Timeline visualization
+                timeline_data = customer_logs[['timestamp', 'category', 'message']]
+                fig = px.scatter(
+                    timeline_data, 
+                    x="timestamp", 
+                    y="category",
+                    color="category",
+                    hover_data=["message"]
+                )
+                st.plotly_chart(fig, use_container_width=True)
+                
+                # Detailed log table
+                st.subheader("Detailed Customer Logs")
+                st.dataframe(customer_logs)
         else:
             st.info(f"No logs found for customer {customer_id}")
     else:
         st.info("Enter a customer ID to view their journey.")
+    
+    # Free-text search (phone numbers, notes, service types, ...)
+    st.subheader("Search Logs")
+    search_text = st.text_input("Search messages and details", placeholder='e.g. 555-0142, needs_followup, "oil change"')
+    
+    if search_text:
+        filters = LogQuery().customer(customer_id) if customer_id else None
+        results = analyzer.search(search_text, filters=filters, limit=100)
+        if not results.empty:
+            st.dataframe(results[['timestamp', 'category', 'customer_id', 'message', 'snippet']])
+        else:
+            st.info("No matching logs found.")
+
+elif page == "Customer Retention":
+    import plotly.express as px
+    st.title("Registration Cohort Retention")
+
+    cohorts = get_cohort_retention()
+
+    matrix = cohorts.retention_matrix()
+    if not matrix.empty:
+        st.subheader("Weekly cohorts returning for service or sales")
+        fig = px.imshow(
+            matrix,
+            labels=dict(x="Weeks since registration", y="Cohort week", color="Retention"),
+            color_continuous_scale="Blues",
+            aspect="auto"
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.subheader("Returned within 30 / 60 / 90 days")
+        st.dataframe(cohorts.retention_within())
+    else:
+        st.info("No closed registration weeks to analyse yet.")
 
 elif page == "ESG Integration":
     from esg_dashboard import show_esg_dashboard
-    show_esg_dashboard()
+    esg_model = model_warmer.get("esg")
+    if esg_model is None:
+        show_warming_up("esg", "ESG model")
+    else:
+        show_esg_dashboard(esg_model)
 
 
 
@@ -325,6 +508,7 @@ Phone: +91-99760-54678
 
 
 elif page == "ESG Integration":
+    import altair as alt
     st.title("ESG Actions & Metrics")
     
     esg_data = analyzer.get_esg_actions()
@@ -378,12 +562,43 @@ elif page == "Social Media Analytics":
 
     # Analyzing sentiment
     if st.sidebar.button("Analyze Sentiment"):
-        if comment:
+        if comment and model_warmer.get("sentiment") is None:
+            show_warming_up("sentiment", "sentiment model")
+        elif comment:
             sentiment = predict_sentiment(comment)
             st.write(f"Sentiment of the comment: **{sentiment}**")
         else:
             st.write("Please enter a comment to analyze.")
 
+    # Bulk scoring: a CSV with a text column, or a text file with one comment per line
+    st.subheader("Score Comments in Bulk")
+    uploaded = st.file_uploader("Upload comments (CSV or TXT)", type=["csv", "txt"])
+    if uploaded is not None:
+        if uploaded.name.lower().endswith(".csv"):
+            comments_df = pd.read_csv(uploaded)
+            text_columns = list(comments_df.select_dtypes(include="object").columns)
+            default = text_columns.index("Comment") if "Comment" in text_columns else 0
+            text_column = st.selectbox("Column with the comments", text_columns, index=default) if text_columns else None
+        else:
+            lines = uploaded.getvalue().decode("utf-8", errors="replace").splitlines()
+            comments_df = pd.DataFrame({"Comment": [line for line in lines if line.strip()]})
+            text_column = "Comment"
+
+        if text_column is None:
+            st.warning("The file has no text column to score.")
+        elif model_warmer.get("sentiment") is None:
+            show_warming_up("sentiment", "sentiment model")
+        elif st.button(f"Score {len(comments_df):,} comments"):
+            with st.spinner("Scoring comments..."):
+                comments_df["Sentiment"] = predict_sentiment_batch(comments_df[text_column].tolist())
+            counts = comments_df["Sentiment"].value_counts()
+            col1, col2 = st.columns(2)
+            col1.metric("Positive", int(counts.get("Positive", 0)))
+            col2.metric("Negative", int(counts.get("Negative", 0)))
+            st.dataframe(comments_df)
+            st.download_button("Download results", comments_df.to_csv(index=False),
+                               file_name="scored_comments.csv", mime="text/csv")
+
     # Optionally, show some example positive and negative comments for reference
     st.subheader("Sample Sentiment Analysis")
     sample_comments = [
@@ -422,11 +637,14 @@ elif page == "Inventory Management":
 
 
 elif page == "Sales Forecast":
+    import matplotlib.pyplot as plt
     st.title("📈 Sales Forecast Dashboard (ARIMA)")
     
-    model_dir = "sales_models"
-    car_models = ['Ertiga', 'WagonR', 'Brezza', 'Grand Vitara']
-    selected_car = st.selectbox("Choose a car model to forecast", car_models)
+    selected_car = st.selectbox("Choose a car model to forecast", FORECAST_CARS)
+    model = model_warmer.get(f"forecast:{selected_car}")
+    if model is None:
+        show_warming_up(f"forecast:{selected_car}", f"{selected_car} forecast model")
+        st.stop()
 
     # Load historical data
     df = pd.read_csv("D:\Major project\maruti_monthly_sales.csv")
@@ -434,10 +652,6 @@ elif page == "Sales Forecast":
     car_df = df[df['car_model'] == selected_car].copy().set_index('month')
     ts = car_df['units_sold'].asfreq('MS')
 
-    # Load model
-    model_path = f"{model_dir}/{selected_car.lower().replace(' ', '_')}_arima_model.pkl"
-    model = joblib.load(model_path)
-
     # Forecast next 6 months
     forecast = model.get_forecast(steps=6)
     forecast_index = pd.date_range(start=ts.index[-1] + pd.DateOffset(months=1), periods=6, freq='MS')
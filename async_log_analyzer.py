@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from log_analyzer import LogAnalyzer
+
+
+class AsyncLogAnalyzer:
+    """
+    asyncio counterpart of LogAnalyzer with the same query methods as coroutines.
+
+    Queries run on a bounded thread pool; each worker thread has its own read
+    connection from the ConnectionManager, so independent queries passed to
+    asyncio.gather() execute in parallel. At most max_concurrency queries run
+    at once. Cancelling a coroutine interrupts its SQLite statement.
+    """
+
+    def __init__(self, db_path="logs/crm.db", cache_ttl=300, max_concurrency=4, analyzer=None):
+        self.analyzer = analyzer or LogAnalyzer(db_path, cache_ttl)
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="log-analyzer")
+        self._loop = None
+        self._semaphore = None
+        # Worker connection -> token of the call executing on it, so a late
+        # cancel can't interrupt the next query on the same connection
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+
+    def _limit(self):
+        # asyncio primitives belong to one event loop; Streamlit starts a new one per run
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run(self, method, *args, **kwargs):
+        token = object()
+        running = {}
+
+        def call():
+            conn = self.analyzer.db.reader()
+            with self._in_flight_lock:
+                self._in_flight[conn] = token
+                running["conn"] = conn
+            try:
+                return method(*args, **kwargs)
+            finally:
+                with self._in_flight_lock:
+                    del self._in_flight[conn]
+
+        async with self._limit():
+            future = asyncio.get_running_loop().run_in_executor(self._executor, call)
+            try:
+                return await future
+            except asyncio.CancelledError:
+                # The worker thread can't be cancelled; abort its query instead
+                with self._in_flight_lock:
+                    conn = running.get("conn")
+                    if conn is not None and self._in_flight.get(conn) is token:
+                        conn.interrupt()
+                raise
+
+    def clear_cache(self):
+        self.analyzer.clear_cache()
+
+    async def get_logs_by_category(self, category, limit=100):
+        return await self._run(self.analyzer.get_logs_by_category, category, limit)
+
+    async def get_logs_by_customer(self, customer_id, limit=100):
+        return await self._run(self.analyzer.get_logs_by_customer, customer_id, limit)
+
+    async def get_customer_profile(self, customer_id):
+        return await self._run(self.analyzer.get_customer_profile, customer_id)
+
+    async def get_logs_by_timeframe(self, hours=24):
+        return await self._run(self.analyzer.get_logs_by_timeframe, hours)
+
+    async def get_customer_journey(self, customer_id):
+        return await self._run(self.analyzer.get_customer_journey, customer_id)
+
+    async def get_esg_actions(self):
+        return await self._run(self.analyzer.get_esg_actions)
+
+    async def get_service_events(self, days=30):
+        return await self._run(self.analyzer.get_service_events, days)
+
+    async def get_sales_funnel_metrics(self, days=30):
+        return await self._run(self.analyzer.get_sales_funnel_metrics, days)
+
+    async def get_funnel_conversion(self, days=30, period="week", by_model=True):
+        return await self._run(self.analyzer.get_funnel_conversion, days, period, by_model)
+
+    async def count_distinct(self, field="customer_id", days=None, category=None):
+        return await self._run(self.analyzer.count_distinct, field, days, category)
+
+    async def approx_count_distinct(self, field="customer_id", days=None, category=None, max_error=0.02):
+        return await self._run(self.analyzer.approx_count_distinct, field, days, category, max_error)
+
+    async def get_heavy_hitters(self, window_minutes=60, limit=10):
+        return await self._run(self.analyzer.get_heavy_hitters, window_minutes, limit)
+
+    async def get_top_leads(self, limit=20):
+        return await self._run(self.analyzer.get_top_leads, limit)
+
+    async def get_log_volume_by_day(self, days=30):
+        return await self._run(self.analyzer.get_log_volume_by_day, days)
+
+    async def get_inventory_logs(self, days=30):
+        return await self._run(self.analyzer.get_inventory_logs, days)
+
+    def close(self):
+        """Stop the worker threads (queries already running finish first)"""
+        self._executor.shutdown(wait=True)
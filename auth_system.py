@@ -1,15 +1,49 @@
-import hashlib
 import secrets
-import sqlite3
 import json
+import sqlite3
+import threading
+import time
 from datetime import datetime, timedelta
 import streamlit as st
+from connection_manager import get_manager, serialized
+from password_hashing import HashingBusy, LoginRateLimiter, PasswordHasher
+from role_permissions import PermissionTable
+from session_cache import SessionCache
+from session_tokens import SessionTokens, ensure_token_tables, load_or_create_secret
 
 class AuthenticationSystem:
-    def __init__(self, db_path="logs/crm.db"):
-        self.conn = sqlite3.connect(db_path)
+    def __init__(self, db_path="logs/crm.db", session_cache_ttl=60, session_cache_size=10000,
+                 session_mode="database", token_lifetime=86400, hasher=None, rate_limiter=None):
+        """
+        session_mode "database" stores each login in the sessions table;
+        "token" issues signed, stateless tokens instead (see SessionTokens).
+        validate_session and logout accept both kinds of session id.
+        
+        Passwords are hashed on `hasher`'s worker pool (PasswordHasher) and
+        login attempts are throttled by `rate_limiter` (LoginRateLimiter).
+        """
+        if session_mode not in ("database", "token"):
+            raise ValueError(f"Unknown session mode: {session_mode}")
+        self.db = get_manager(db_path)
+        self.session_mode = session_mode
+        self.hasher = hasher or PasswordHasher()
+        self.rate_limiter = rate_limiter or LoginRateLimiter()
+        # Hot sessions and permission checks are answered without touching SQLite
+        self.session_cache = SessionCache(ttl=session_cache_ttl, max_size=session_cache_size)
+        self.permission_table = PermissionTable(max_age=session_cache_ttl)
         self._setup_tables()
+        with self.db.write_lock:
+            self.tokens = SessionTokens(load_or_create_secret(self.conn), lifetime=token_lifetime)
+            self.tokens.sync(self.conn)
+        self._maintenance = None
+        self._maintenance_stop = threading.Event()
+
+    @property
+    def conn(self):
+        # Shared writer connection; methods using it are @serialized
+        return self.db.writer()
         
+    @serialized
     def _setup_tables(self):
         """Create necessary tables if they don't exist"""
         cursor = self.conn.cursor()
@@ -52,6 +86,10 @@ class AuthenticationSystem:
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
         ''')
+        # Lets purge_expired_sessions() find expired rows without a full scan
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+        
+        ensure_token_tables(self.conn)
         
         # Create default roles if they don't exist
         self._create_default_roles()
@@ -132,14 +170,18 @@ class AuthenticationSystem:
             
             self.conn.commit()
     
-    def _hash_password(self, password, salt):
-        """Hash password with salt using SHA-256"""
-        password_salt = password + salt
-        hash_obj = hashlib.sha256(password_salt.encode())
-        return hash_obj.hexdigest()
-            
     def create_user(self, username, password, full_name, email, role="readonly"):
         """Create a new user with the specified role"""
+        # Generate salt and hash password (on the hashing pool, outside the write lock)
+        salt = secrets.token_hex(16)
+        try:
+            password_hash = self.hasher.hash(password, salt)
+        except HashingBusy:
+            return {"status": "error", "message": "Server busy, try again shortly"}
+        return self._insert_user(username, password_hash, salt, full_name, email, role)
+    
+    @serialized
+    def _insert_user(self, username, password_hash, salt, full_name, email, role):
         cursor = self.conn.cursor()
         
         # Check if username already exists
@@ -152,10 +194,6 @@ class AuthenticationSystem:
         if not cursor.fetchone():
             return {"status": "error", "message": "Invalid role"}
         
-        # Generate salt and hash password
-        salt = secrets.token_hex(16)
-        password_hash = self._hash_password(password, salt)
-        
         # Insert new user
         cursor.execute(
             '''INSERT INTO users 
@@ -167,10 +205,104 @@ class AuthenticationSystem:
         self.conn.commit()
         return {"status": "success", "message": "User created successfully"}
     
-    def authenticate(self, username, password):
-        """Authenticate a user with username and password"""
+    def create_users_bulk(self, records, iterations=None):
+        """
+        Create many users in one transaction.
+        
+        records are dicts with username, password, full_name, email and role
+        (default "readonly"). Rows with a missing username or password, an
+        unknown role or a username that is taken (or repeated in the batch)
+        are reported and skipped; the rest are created. Pass a lower
+        `iterations` to provision temporary passwords faster: those hashes
+        are upgraded to the full cost on each user's first login.
+        """
+        records = list(records)
+        results = [None] * len(records)
+        cursor = self.db.reader().cursor()
+        cursor.execute("SELECT role_name FROM roles")
+        roles = {row[0] for row in cursor.fetchall()}
+        
+        pending = {}
+        for i, record in enumerate(records):
+            username = record.get("username")
+            role = record.get("role") or "readonly"
+            if not username or not record.get("password"):
+                results[i] = {"username": username, "status": "error",
+                              "message": "Username and password are required"}
+            elif role not in roles:
+                results[i] = {"username": username, "status": "error", "message": "Invalid role"}
+            elif username in pending:
+                results[i] = {"username": username, "status": "error", "message": "Duplicate username in batch"}
+            else:
+                pending[username] = i
+        
+        # Don't spend hashes on usernames that are already taken
+        existing = self._existing_usernames(cursor, list(pending))
+        for username in existing:
+            results[pending.pop(username)] = {"username": username, "status": "error",
+                                              "message": "Username already exists"}
+        
+        # Generate salts and hash passwords in parallel, outside the write lock
+        rows = []
+        salts = [secrets.token_hex(16) for _ in pending]
+        hashes = self.hasher.hash_many(
+            [(records[i]["password"], salt) for i, salt in zip(pending.values(), salts)], iterations=iterations)
+        created_at = datetime.now().isoformat()
+        for (username, i), salt, password_hash in zip(pending.items(), salts, hashes):
+            record = records[i]
+            rows.append((username, password_hash, salt, record.get("full_name"), record.get("email"),
+                         record.get("role") or "readonly", created_at))
+        
+        inserted, taken = self._insert_users(rows)
+        for username in taken:
+            results[pending[username]] = {"username": username, "status": "error",
+                                          "message": "Username already exists"}
+        for username in inserted:
+            results[pending[username]] = {"username": username, "status": "success",
+                                          "message": "User created successfully"}
+        
+        return {
+            "status": "success",
+            "created": len(inserted),
+            "failed": len(records) - len(inserted),
+            "results": results
+        }
+    
+    def _existing_usernames(self, cursor, usernames):
+        existing = set()
+        for start in range(0, len(usernames), 500):
+            chunk = usernames[start:start + 500]
+            cursor.execute(f"SELECT username FROM users WHERE username IN ({', '.join('?' for _ in chunk)})", chunk)
+            existing.update(row[0] for row in cursor.fetchall())
+        return existing
+    
+    @serialized
+    def _insert_users(self, rows):
+        """Insert prepared user rows whose usernames are still free; (inserted, taken) usernames"""
         cursor = self.conn.cursor()
         
+        # Checked again under the lock in case a username was taken while hashing
+        taken = self._existing_usernames(cursor, [row[0] for row in rows])
+        rows = [row for row in rows if row[0] not in taken]
+        cursor.executemany(
+            '''INSERT INTO users 
+               (username, password_hash, salt, full_name, email, role, created_at) 
+               VALUES (?, ?, ?, ?, ?, ?, ?)''',
+            rows
+        )
+        
+        self.conn.commit()
+        return [row[0] for row in rows], taken
+    
+    def authenticate(self, username, password, ip_address=None):
+        """Authenticate a user with username and password"""
+        # Shed excess attempts before any database read or hashing
+        keys = [f"user:{username}"] + ([f"ip:{ip_address}"] if ip_address else [])
+        if not self.rate_limiter.allow(*keys):
+            return {"status": "error", "message": "Too many login attempts, try again later"}
+        
+        cursor = self.db.reader().cursor()
+        
         # Get user
         cursor.execute(
             "SELECT id, password_hash, salt, role, is_active FROM users WHERE username = ?", 
@@ -186,10 +318,24 @@ class AuthenticationSystem:
         if not is_active:
             return {"status": "error", "message": "Account is inactive"}
         
-        # Check password
-        calculated_hash = self._hash_password(password, salt)
-        if calculated_hash != stored_hash:
-            return {"status": "error", "message": "Invalid username or password"}
+        # Check password, upgrading legacy or outdated hashes while we have it
+        rehash = None
+        try:
+            if not self.hasher.verify(password, salt, stored_hash):
+                return {"status": "error", "message": "Invalid username or password"}
+            if self.hasher.needs_rehash(stored_hash):
+                new_salt = secrets.token_hex(16)
+                rehash = (self.hasher.hash(password, new_salt), new_salt, stored_hash)
+        except HashingBusy:
+            return {"status": "error", "message": "Server busy, try again shortly"}
+        
+        self.rate_limiter.reset(f"user:{username}")
+        return self._complete_login(user_id, username, role, rehash)
+    
+    @serialized
+    def _complete_login(self, user_id, username, role, rehash=None):
+        """Record a verified login and create its session"""
+        cursor = self.conn.cursor()
         
         # Update last login
         cursor.execute(
@@ -197,8 +343,19 @@ class AuthenticationSystem:
             (datetime.now().isoformat(), user_id)
         )
         
+        if rehash is not None:
+            # Skipped if the password changed since it was verified
+            new_hash, new_salt, old_hash = rehash
+            cursor.execute(
+                "UPDATE users SET password_hash = ?, salt = ? WHERE id = ? AND password_hash = ?",
+                (new_hash, new_salt, user_id, old_hash)
+            )
+        
         # Create session
-        session_id = self._create_session(user_id)
+        if self.session_mode == "token":
+            session_id = self.tokens.issue(user_id, username, role, self._permissions().version(role))
+        else:
+            session_id = self._create_session(user_id)
         
         # Get permissions for role
         permissions = self.get_permissions(role)
@@ -213,6 +370,7 @@ class AuthenticationSystem:
             "session_id": session_id
         }
     
+    @serialized
     def _create_session(self, user_id, expires_in_days=1):
         """Create a new session for the user"""
         session_id = secrets.token_hex(32)
@@ -232,8 +390,27 @@ class AuthenticationSystem:
         """Validate a session and return user info if valid"""
         if not session_id:
             return None
-            
-        cursor = self.conn.cursor()
+        
+        # Database session ids are hex; only tokens contain a "."
+        if "." in session_id:
+            return self._validate_token(session_id)
+        
+        cached = self.session_cache.get(session_id)
+        if cached is not None:
+            return cached
+        
+        generation = self.session_cache.generation
+        session = self._load_session(session_id)
+        if session is None:
+            return None
+        
+        info, expires_at = session
+        self.session_cache.put(session_id, info, expires_at, generation)
+        return info
+    
+    def _load_session(self, session_id):
+        """(user info, expires_at) for a live session, from the database"""
+        cursor = self.db.reader().cursor()
         
         # Get session
         cursor.execute(
@@ -262,38 +439,59 @@ class AuthenticationSystem:
             "username": username,
             "role": role,
             "permissions": permissions
+        }, expires_at
+    
+    def _validate_token(self, token):
+        """User info for a signed session token, without reading the database"""
+        claims = self.tokens.verify(token)
+        if claims is None:
+            return None
+        
+        # A token is only good for the role permissions it was issued under
+        permissions = self._permissions()
+        if claims["pv"] != permissions.version(claims["role"]):
+            return None
+        
+        return {
+            "user_id": claims["uid"],
+            "username": claims["usr"],
+            "role": claims["role"],
+            "permissions": permissions.permissions(claims["role"])
         }
     
+    @serialized
     def logout(self, session_id):
         """Log out a user by removing their session"""
+        if session_id and "." in session_id:
+            claims = self.tokens.decode(session_id)
+            if claims is not None:
+                self.tokens.revoke(self.conn, claims)
+            return {"status": "success", "message": "Logged out successfully"}
+        
         cursor = self.conn.cursor()
         cursor.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
         self.conn.commit()
+        self.session_cache.invalidate(session_id)
         return {"status": "success", "message": "Logged out successfully"}
     
+    def _load_permission_table(self):
+        """Recompile role permissions from the roles table"""
+        self.permission_table.load(self.db.reader())
+    
+    def _permissions(self):
+        if self.permission_table.stale():
+            self._load_permission_table()
+        return self.permission_table
+    
     def get_permissions(self, role):
         """Get permissions for a role"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT permissions FROM roles WHERE role_name = ?", (role,))
-        result = cursor.fetchone()
-        
-        if not result:
-            return {}
-            
-        return json.loads(result[0])
+        return self._permissions().permissions(role)
     
     def check_permission(self, role, module, action):
         """Check if a role has permission to perform an action on a module"""
-        permissions = self.get_permissions(role)
-        
-        if not permissions:
-            return False
-            
-        if module not in permissions:
-            return False
-            
-        return action in permissions[module]
+        return self._permissions().check(role, module, action)
     
+    @serialized
     def update_user(self, user_id, full_name=None, email=None, role=None, is_active=None):
         """Update user information"""
         cursor = self.conn.cursor()
@@ -335,11 +533,15 @@ class AuthenticationSystem:
             return {"status": "error", "message": "User not found"}
             
         self.conn.commit()
+        self.session_cache.invalidate_user(user_id)
+        # Tokens carry the role, so a role change or deactivation ends them
+        if role is not None or is_active is not None:
+            self.tokens.revoke_user(self.conn, user_id)
         return {"status": "success", "message": "User updated successfully"}
     
     def change_password(self, user_id, current_password, new_password):
         """Change a user's password"""
-        cursor = self.conn.cursor()
+        cursor = self.db.reader().cursor()
         
         # Get current password hash and salt
         cursor.execute(
@@ -353,26 +555,46 @@ class AuthenticationSystem:
             
         stored_hash, salt = result
         
-        # Verify current password
-        calculated_hash = self._hash_password(current_password, salt)
-        if calculated_hash != stored_hash:
-            return {"status": "error", "message": "Current password is incorrect"}
-            
-        # Generate new salt and hash
-        new_salt = secrets.token_hex(16)
-        new_hash = self._hash_password(new_password, new_salt)
+        try:
+            # Verify current password
+            if not self.hasher.verify(current_password, salt, stored_hash):
+                return {"status": "error", "message": "Current password is incorrect"}
+                
+            # Generate new salt and hash
+            new_salt = secrets.token_hex(16)
+            new_hash = self.hasher.hash(new_password, new_salt)
+        except HashingBusy:
+            return {"status": "error", "message": "Server busy, try again shortly"}
         
-        # Update password
+        return self._store_password(user_id, new_hash, new_salt, stored_hash)
+    
+    @serialized
+    def _store_password(self, user_id, new_hash, new_salt, old_hash):
+        cursor = self.conn.cursor()
+        
+        # Update password, unless it changed since the current one was verified
         cursor.execute(
-            "UPDATE users SET password_hash = ?, salt = ? WHERE id = ?",
-            (new_hash, new_salt, user_id)
+            "UPDATE users SET password_hash = ?, salt = ? WHERE id = ? AND password_hash = ?",
+            (new_hash, new_salt, user_id, old_hash)
         )
+        if cursor.rowcount == 0:
+            return {"status": "error", "message": "Current password is incorrect"}
         
         self.conn.commit()
         return {"status": "success", "message": "Password changed successfully"}
     
     def reset_password(self, username, new_password):
         """Admin function to reset a user's password"""
+        # Generate new salt and hash
+        new_salt = secrets.token_hex(16)
+        try:
+            new_hash = self.hasher.hash(new_password, new_salt)
+        except HashingBusy:
+            return {"status": "error", "message": "Server busy, try again shortly"}
+        return self._reset_password(username, new_hash, new_salt)
+    
+    @serialized
+    def _reset_password(self, username, new_hash, new_salt):
         cursor = self.conn.cursor()
         
         # Check if user exists
@@ -384,10 +606,6 @@ class AuthenticationSystem:
             
         user_id = result[0]
         
-        # Generate new salt and hash
-        new_salt = secrets.token_hex(16)
-        new_hash = self._hash_password(new_password, new_salt)
-        
         # Update password
         cursor.execute(
             "UPDATE users SET password_hash = ?, salt = ? WHERE id = ?",
@@ -398,11 +616,13 @@ class AuthenticationSystem:
         cursor.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
         
         self.conn.commit()
+        self.session_cache.invalidate_user(user_id)
+        self.tokens.revoke_user(self.conn, user_id)
         return {"status": "success", "message": "Password reset successfully"}
     
     def list_users(self):
         """Get a list of all users"""
-        cursor = self.conn.cursor()
+        cursor = self.db.reader().cursor()
         
         cursor.execute(
             """SELECT id, username, full_name, email, role, created_at, 
@@ -419,6 +639,7 @@ class AuthenticationSystem:
             
         return users
     
+    @serialized
     def create_role(self, role_name, permissions, description=""):
         """Create a new role with specified permissions"""
         cursor = self.conn.cursor()
@@ -435,8 +656,10 @@ class AuthenticationSystem:
         )
         
         self.conn.commit()
+        self._load_permission_table()
         return {"status": "success", "message": "Role created successfully"}
     
+    @serialized
     def update_role(self, role_name, permissions=None, description=None):
         """Update an existing role"""
         cursor = self.conn.cursor()
@@ -466,12 +689,14 @@ class AuthenticationSystem:
         
         cursor.execute(query, params)
         self.conn.commit()
+        self._load_permission_table()
+        self.session_cache.invalidate_role(role_name)
         
         return {"status": "success", "message": "Role updated successfully"}
     
     def list_roles(self):
         """Get a list of all roles with their permissions"""
-        cursor = self.conn.cursor()
+        cursor = self.db.reader().cursor()
         
         cursor.execute("SELECT role_name, permissions, description FROM roles")
         
@@ -485,7 +710,53 @@ class AuthenticationSystem:
             
         return roles
     
+    @serialized
+    def purge_expired_sessions(self):
+        """Delete expired sessions and revocations of tokens that have expired anyway"""
+        cursor = self.conn.cursor()
+        cursor.execute("DELETE FROM sessions WHERE expires_at < ?", (datetime.now().isoformat(),))
+        sessions = cursor.rowcount
+        cursor.execute("DELETE FROM token_revocations WHERE expires_at < ?", (time.time(),))
+        revocations = cursor.rowcount
+        self.conn.commit()
+        self.tokens.prune()
+        return {"sessions": sessions, "revocations": revocations}
+    
+    def start_maintenance(self, purge_interval=300.0, sync_interval=5.0):
+        """
+        Background thread that loads other processes' token revocations every
+        sync_interval seconds, and purges expired sessions and idle rate-limiter
+        keys every purge_interval
+        """
+        if self._maintenance is not None:
+            return
+        self._maintenance_stop.clear()
+        self._maintenance = threading.Thread(target=self._maintenance_loop, args=(purge_interval, sync_interval),
+                                             name="auth-maintenance", daemon=True)
+        self._maintenance.start()
+    
+    def stop_maintenance(self):
+        if self._maintenance is None:
+            return
+        self._maintenance_stop.set()
+        self._maintenance.join()
+        self._maintenance = None
+    
+    def _maintenance_loop(self, purge_interval, sync_interval):
+        last_purge = None
+        while True:
+            try:
+                self.tokens.sync(self.db.reader())
+                if last_purge is None or time.monotonic() - last_purge >= purge_interval:
+                    last_purge = time.monotonic()
+                    self.purge_expired_sessions()
+                    self.rate_limiter.sweep()
+            except sqlite3.Error as e:
+                print(f"Error in session maintenance: {e}")
+            if self._maintenance_stop.wait(sync_interval):
+                break
+    
     def close(self):
-        """Close the database connection"""
-        if self.conn:
-            self.conn.close()
\ No newline at end of file
+        """Connections belong to the shared ConnectionManager and stay open for other components"""
+        self.stop_maintenance()
+        self.hasher.shutdown()
\ No newline at end of file
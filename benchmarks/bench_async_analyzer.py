@@ -0,0 +1,86 @@
+# Multi-query page latency: LogAnalyzer (serial) vs AsyncLogAnalyzer (asyncio.gather)
+# Run from the repository root: python -m benchmarks.bench_async_analyzer [rows] [runs]
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from async_log_analyzer import AsyncLogAnalyzer
+from benchmarks.bench_log_compression import create_logs
+from log_analyzer import LogAnalyzer
+
+# (method, args) for the independent queries behind one dashboard page
+PAGE_QUERIES = (
+    ("get_logs_by_timeframe", (24 * 7,)),
+    ("count_distinct", ("customer_id", 30, "SERVICE")),
+    ("get_log_volume_by_day", (30,)),
+    ("get_service_events", (30,)),
+    ("get_sales_funnel_metrics", (30,)),
+    ("get_inventory_logs", (30,)),
+)
+
+
+def sync_page(analyzer):
+    return [getattr(analyzer, name)(*args) for name, args in PAGE_QUERIES]
+
+
+async def async_page(analyzer):
+    return await asyncio.gather(*(getattr(analyzer, name)(*args) for name, args in PAGE_QUERIES))
+
+
+async def cancel_latency(analyzer):
+    """Time from cancelling a long query until a single-worker pool has run the next one"""
+    task = asyncio.create_task(analyzer.get_logs_by_timeframe(hours=24 * 365 * 10))
+    await asyncio.sleep(0.05)
+    t0 = time.perf_counter()
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    await analyzer.get_heavy_hitters()
+    return time.perf_counter() - t0
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    random.seed(5)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        create_logs(db_path, rows).close()
+
+        # cache_ttl=0: every call hits the database
+        analyzer = LogAnalyzer(db_path, cache_ttl=0)
+        async_analyzer = AsyncLogAnalyzer(analyzer=analyzer, max_concurrency=len(PAGE_QUERIES))
+        sync_page(analyzer)
+
+        sync_times, async_times = [], []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            sync_page(analyzer)
+            sync_times.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            asyncio.run(async_page(async_analyzer))
+            async_times.append(time.perf_counter() - t0)
+
+        sync_ms = statistics.median(sync_times) * 1000
+        async_ms = statistics.median(async_times) * 1000
+        print(f"{rows:,} rows, {len(PAGE_QUERIES)} queries per page, median of {runs} runs")
+        print(f"LogAnalyzer (serial):            {sync_ms:,.0f} ms")
+        print(f"AsyncLogAnalyzer (gather):       {async_ms:,.0f} ms ({sync_ms / async_ms:.2f}x speedup)")
+        async_analyzer.close()
+
+        single = AsyncLogAnalyzer(analyzer=analyzer, max_concurrency=1)
+        print(f"Cancel a full-table query:       {asyncio.run(cancel_latency(single)) * 1000:.0f} ms "
+              f"until the next query completes")
+        single.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Idempotent bulk ingest benchmark
+# Run from the repository root: python -m benchmarks.bench_bulk_ingest [events]
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.bench_log_compression import random_row
+from logging_system import ingest_events
+
+RETRY_RATE = 0.1
+
+
+def generate_events(count, now):
+    events = []
+    for _ in range(count):
+        timestamp, level, category, message, customer_id, vehicle_id, details = random_row(now)
+        events.append({
+            "timestamp": timestamp, "level": level, "category": category, "message": message,
+            "customer_id": customer_id, "vehicle_id": vehicle_id,
+            "operation_id": str(uuid.uuid4()), "user_id": f"USER-{random.randrange(10):02d}",
+            "details": details
+        })
+    return events
+
+
+def run(db_path, events, listeners):
+    conn = sqlite3.connect(db_path)
+    t0 = time.perf_counter()
+    result = ingest_events(conn, events, listeners=listeners)
+    elapsed = time.perf_counter() - t0
+    conn.close()
+    return result, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    random.seed(11)
+    events = generate_events(count, datetime.now())
+    # Client retries: a sample of already-sent events is sent again
+    retries = random.sample(events, int(count * RETRY_RATE))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, listeners in (("raw (listeners=())", ()), ("with ingest listeners", None)):
+            db_path = str(Path(tmp) / f"{len(label)}.db")
+            result, elapsed = run(db_path, events, listeners)
+            print(f"{label}: {result['accepted']:,} accepted in {elapsed:.2f}s "
+                  f"({count / elapsed:,.0f} events/s)")
+
+            result, elapsed = run(db_path, retries, listeners)
+            print(f"  retry of {len(retries):,} events: {result['accepted']} accepted, "
+                  f"{result['duplicates']:,} duplicates in {elapsed:.2f}s")
+
+            conn = sqlite3.connect(db_path)
+            rows = conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+            conn.close()
+            print(f"  rows stored: {rows:,}")
+
+
+if __name__ == "__main__":
+    main()
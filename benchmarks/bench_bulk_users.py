@@ -0,0 +1,58 @@
+# User provisioning: create_user per row vs create_users_bulk, at full and provisioning hash cost
+# Run from the repository root: python -m benchmarks.bench_bulk_users [users] [iterations]
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from auth_system import AuthenticationSystem
+from password_hashing import PBKDF2_ITERATIONS, PasswordHasher
+
+ROLES = ["sales", "service", "readonly"]
+
+
+def records(prefix, count):
+    return [{"username": f"{prefix}{i}", "password": f"temp-{random.randrange(10**9)}",
+             "full_name": f"User {i}", "email": f"{prefix}{i}@dealer.example.com", "role": random.choice(ROLES)}
+            for i in range(count)]
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    random.seed(47)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        auth = AuthenticationSystem(str(Path(tmp) / "bench.db"), hasher=PasswordHasher(iterations=iterations))
+
+        # 1 iteration shows the database side alone; `iterations` adds realistic provisioning cost
+        for cost in (1, iterations):
+            auth.hasher.iterations = cost
+            t0 = time.perf_counter()
+            for record in records(f"single{cost}-", users // 5):
+                auth.create_user(record["username"], record["password"], record["full_name"], record["email"],
+                                 record["role"])
+            single = users // 5 / (time.perf_counter() - t0)
+            print(f"create_user per row ({cost:,} iterations):  {single:8,.0f} users/s")
+
+            batch = records(f"bulk{cost}-", users)
+            # A few rows that must be reported without aborting the batch
+            batch += [dict(batch[0]), dict(batch[1], username=f"single{cost}-0"),
+                      dict(batch[2], username="x", role="nope")]
+            t0 = time.perf_counter()
+            result = auth.create_users_bulk(batch)
+            bulk = result["created"] / (time.perf_counter() - t0)
+            print(f"create_users_bulk ({cost:,} iterations):    {bulk:8,.0f} users/s "
+                  f"({result['created']:,} created, {result['failed']} rejected)")
+
+        full = records("full", 20)
+        t0 = time.perf_counter()
+        auth.create_users_bulk(full, iterations=PBKDF2_ITERATIONS)
+        print(f"create_users_bulk ({PBKDF2_ITERATIONS:,} iterations): "
+              f"{len(full) / (time.perf_counter() - t0):8,.1f} users/s")
+        auth.close()
+
+
+if __name__ == "__main__":
+    main()
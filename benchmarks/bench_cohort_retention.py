@@ -0,0 +1,98 @@
+# Cohort retention benchmark
+# Run from the repository root: python -m benchmarks.bench_cohort_retention [customers]
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from cohort_analysis import CohortRetention
+
+WEEKS = 26
+
+
+def generate_logs(conn, customers, start, weeks, id_offset=0):
+    """Registrations spread over `weeks`, each followed by 0-3 SERVICE/SALES events"""
+    span_seconds = weeks * 7 * 24 * 3600
+    rows = []
+    for i in range(id_offset, id_offset + customers):
+        customer_id = f"CUST-{i:07d}"
+        registered = start + timedelta(seconds=random.randrange(span_seconds))
+        rows.append((registered.isoformat(), "INFO", "CUSTOMER", "Customer registration",
+                     customer_id, str(uuid.uuid4())))
+        for _ in range(random.choice((0, 1, 1, 2, 3))):
+            event_at = registered + timedelta(days=random.expovariate(1 / 40))
+            category = random.choice(("SERVICE", "SALES"))
+            message = "Service SCHEDULED" if category == "SERVICE" else "Sales event: CONTACT"
+            rows.append((event_at.isoformat(), "INFO", category, message, customer_id, str(uuid.uuid4())))
+
+        if len(rows) >= 200_000:
+            conn.executemany(
+                "INSERT INTO logs (timestamp, level, category, message, customer_id, operation_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            rows = []
+    conn.executemany(
+        "INSERT INTO logs (timestamp, level, category, message, customer_id, operation_id) "
+        "VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+
+
+def main():
+    customers = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute('''
+        CREATE TABLE logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT, level TEXT, category TEXT, message TEXT,
+            customer_id TEXT, vehicle_id TEXT, operation_id TEXT,
+            user_id TEXT, details TEXT
+        )
+        ''')
+
+        now = datetime(2026, 1, 5)  # a Monday
+        start = now - timedelta(weeks=WEEKS)
+
+        t0 = time.perf_counter()
+        generate_logs(conn, customers, start, WEEKS)
+        rows = conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+        print(f"Generated {rows:,} log rows for {customers:,} customers "
+              f"in {time.perf_counter() - t0:.1f}s")
+
+        cohorts = CohortRetention(db_path)
+
+        t0 = time.perf_counter()
+        weeks = cohorts.update(now=now)
+        full_build = time.perf_counter() - t0
+        print(f"Full build ({weeks} weeks): {full_build:.2f}s")
+
+        # One more week of registrations and activity arrives, then closes
+        generate_logs(conn, customers // WEEKS, now, 1, id_offset=customers)
+        t0 = time.perf_counter()
+        weeks = cohorts.update(now=now + timedelta(weeks=1))
+        incremental = time.perf_counter() - t0
+        print(f"Incremental update ({weeks} week): {incremental:.2f}s")
+
+        t0 = time.perf_counter()
+        matrix = cohorts.retention_matrix()
+        within = cohorts.retention_within()
+        print(f"Matrix + 30/60/90 day retention read: {(time.perf_counter() - t0) * 1000:.1f}ms "
+              f"({matrix.shape[0]} cohorts x {matrix.shape[1]} periods)")
+
+        t0 = time.perf_counter()
+        cohorts.rebuild(now=now + timedelta(weeks=1))
+        print(f"Rebuild from scratch for comparison: {time.perf_counter() - t0:.2f}s")
+
+        print(within[['cohort_week', 'cohort_size', 'retention_30d', 'retention_60d', 'retention_90d']].tail())
+        cohorts.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
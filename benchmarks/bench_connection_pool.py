@@ -0,0 +1,129 @@
+# Log ingestion under concurrent dashboard reads: default connections vs ConnectionManager (WAL)
+# Run from the repository root: python -m benchmarks.bench_connection_pool [rows] [readers] [seconds]
+import json
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from benchmarks.bench_log_compression import create_logs
+from connection_manager import ConnectionManager
+
+DASHBOARD_QUERIES = (
+    ("SELECT category, COUNT(*), COUNT(DISTINCT customer_id) FROM logs WHERE timestamp >= ? GROUP BY category",
+     lambda: ((datetime.now() - timedelta(days=30)).isoformat(),)),
+    ("SELECT * FROM logs WHERE category = ? ORDER BY timestamp DESC LIMIT 100",
+     lambda: (random.choice(["SYSTEM", "SALES", "SERVICE"]),)),
+    ("SELECT level, COUNT(*) FROM logs WHERE category = 'SYSTEM' GROUP BY level", lambda: ()),
+)
+
+INSERT_SQL = ("INSERT INTO logs (timestamp, level, category, message, operation_id, details) "
+              "VALUES (?, 'INFO', 'SYSTEM', 'System health check', ?, ?)")
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def run(get_reader, write, seconds, readers):
+    """One writer committing single log rows (like DatabaseLogHandler) while readers loop over dashboard queries"""
+    stop = threading.Event()
+    latencies = []
+    errors = [0]
+    read_errors = [0]
+    queries = [0] * readers
+
+    def writer():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                write((datetime.now().isoformat(), str(uuid.uuid4()), json.dumps({"component": "api"})))
+            except sqlite3.OperationalError:
+                errors[0] += 1
+            latencies.append(time.perf_counter() - t0)
+
+    def reader(index):
+        conn = get_reader()
+        while not stop.is_set():
+            query, params = random.choice(DASHBOARD_QUERIES)
+            try:
+                conn.execute(query, params()).fetchall()
+                queries[index] += 1
+            except sqlite3.OperationalError:
+                read_errors[0] += 1
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        "writes_per_sec": len(latencies) / seconds,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000 if latencies else 0.0,
+        "write_errors": errors[0],
+        "queries_per_sec": sum(queries) / seconds,
+        "read_errors": read_errors[0],
+    }
+
+
+def default_connections(db_path):
+    """What the modules did before: sqlite3.connect() defaults, one connection per component"""
+    local = threading.local()
+    write_conn = sqlite3.connect(db_path, check_same_thread=False)
+
+    def get_reader():
+        local.conn = sqlite3.connect(db_path)
+        return local.conn
+
+    def write(params):
+        write_conn.execute(INSERT_SQL, params)
+        write_conn.commit()
+
+    return get_reader, write
+
+
+def managed_connections(db_path):
+    db = ConnectionManager(db_path)
+
+    def write(params):
+        with db.write() as conn:
+            conn.execute(INSERT_SQL, params)
+
+    return db.reader, write
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+    random.seed(3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seed_path = str(Path(tmp) / "seed.db")
+        create_logs(seed_path, rows).close()
+        print(f"{rows:,} log rows, 1 writer, {readers} dashboard readers, {seconds:.0f}s per run")
+
+        for label, factory in (("default connections", default_connections),
+                               ("ConnectionManager (WAL)", managed_connections)):
+            db_path = str(Path(tmp) / f"{factory.__name__}.db")
+            shutil.copy(seed_path, db_path)
+            result = run(*factory(db_path), seconds=seconds, readers=readers)
+            print(f"{label}: {result['writes_per_sec']:,.0f} log writes/s "
+                  f"(p99 {result['p99_ms']:.1f} ms, max {result['max_ms']:.0f} ms, "
+                  f"{result['write_errors']} lock errors), {result['queries_per_sec']:,.1f} dashboard queries/s "
+                  f"({result['read_errors']} lock errors)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Opening a customer: full history scan vs materialized profile
+# Run from the repository root: python -m benchmarks.bench_customer_profile [rows] [repeats]
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.bench_log_compression import create_logs, random_row
+from customer_profiles import (CustomerProfileRecorder, backfill_customer_profiles,
+                               ensure_customer_profiles_table, get_customer_profile)
+from logging_system import ingest_events
+
+HISTORY_LENGTHS = (10, 1_000, 50_000)
+
+
+def customer_events(customer_id, count):
+    now = datetime.now()
+    events = []
+    for _ in range(count):
+        timestamp, level, category, message, _, vehicle_id, details = random_row(now)
+        if category in ("SYSTEM", "INVENTORY"):
+            category, message = "CUSTOMER", "Customer profile update"
+        events.append({"timestamp": timestamp, "level": level, "category": category, "message": message,
+                       "customer_id": customer_id, "vehicle_id": vehicle_id, "details": details})
+    return events
+
+
+def median_ms(func, repeats):
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    random.seed(21)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        conn = create_logs(db_path, rows)
+        conn.execute("CREATE INDEX idx_logs_customer_time ON logs (customer_id, timestamp)")
+        ensure_customer_profiles_table(conn)
+
+        t0 = time.perf_counter()
+        applied = backfill_customer_profiles(conn)
+        profiles = conn.execute("SELECT COUNT(*) FROM customer_profiles").fetchone()[0]
+        print(f"{rows:,} rows; backfilled {profiles:,} profiles from {applied:,} customer rows "
+              f"in {time.perf_counter() - t0:.1f}s")
+
+        # Incremental maintenance cost on ingest; the recorder runs first, as it would
+        # otherwise also fold in the rows loaded without it
+        for label, listeners in (("with CustomerProfileRecorder", [CustomerProfileRecorder()]), ("without profiles", ())):
+            events = customer_events(None, 100_000)
+            for event in events:
+                event["customer_id"] = f"CUST-{random.randrange(200000):06d}"
+            t0 = time.perf_counter()
+            ingest_events(conn, events, listeners=listeners)
+            print(f"Ingested {len(events):,} customer events {label}: "
+                  f"{len(events) / (time.perf_counter() - t0):,.0f} events/s")
+
+        for length in HISTORY_LENGTHS:
+            customer_id = f"CUST-LONG-{length}"
+            ingest_events(conn, customer_events(customer_id, length), listeners=[CustomerProfileRecorder()])
+            history_ms = median_ms(lambda: pd.read_sql_query(
+                "SELECT * FROM logs WHERE customer_id = ?", conn, params=(customer_id,)), repeats)
+            profile_ms = median_ms(lambda: get_customer_profile(conn, customer_id), repeats)
+            print(f"Customer with {length:>6,} events: full history {history_ms:8.2f} ms   "
+                  f"profile {profile_ms:6.3f} ms")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
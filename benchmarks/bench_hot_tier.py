@@ -0,0 +1,61 @@
+# Recent-window dashboard queries: disk vs in-memory hot tier
+# Run from the repository root: python -m benchmarks.bench_hot_tier [rows] [repeats]
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_log_compression import create_logs
+from log_analyzer import LogAnalyzer
+
+RECENT_QUERIES = (
+    ("Recent Log Events (SYSTEM, LIMIT 100)", "get_logs_by_category", ("SYSTEM", 100)),
+    ("Latest customer event (LIMIT 1)", "get_logs_by_customer", None),
+    ("Last hour of logs", "get_logs_by_timeframe", (1,)),
+    ("Log volume, last day", "get_log_volume_by_day", (1,)),
+)
+
+
+def median_ms(func, args, repeats):
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    random.seed(9)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        create_logs(db_path, rows).close()
+
+        disk = LogAnalyzer(db_path, cache_ttl=0, hot_hours=0)
+        hot = LogAnalyzer(db_path, cache_ttl=0, hot_hours=24)
+        t0 = time.perf_counter()
+        hot.hot_tier.refresh(hot.conn)
+        stats = hot.hot_tier.stats()
+        print(f"{rows:,} rows; hot tier loaded {stats['rows']:,} rows from the last 24h "
+              f"({stats['memory_bytes'] / 1e6:.1f} MB) in {time.perf_counter() - t0:.2f}s")
+
+        # A customer with recent activity
+        customer = hot.hot_tier.query(
+            "SELECT customer_id FROM logs WHERE customer_id IS NOT NULL "
+            "GROUP BY customer_id ORDER BY COUNT(*) DESC LIMIT 1"
+        )['customer_id'][0]
+
+        for label, method, args in RECENT_QUERIES:
+            args = args or (customer, 1)
+            disk_ms = median_ms(getattr(disk, method), args, repeats)
+            hot_ms = median_ms(getattr(hot, method), args, repeats)
+            print(f"{label:40s} disk {disk_ms:8.2f} ms   hot {hot_ms:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Lead scoring on ingest: added per-event latency and compiled vs sklearn forest inference
+# Run from the repository root: python -m benchmarks.bench_lead_scoring [rows] [events]
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from benchmarks.bench_log_compression import create_logs
+from customer_profiles import (CustomerProfileRecorder, backfill_customer_profiles,
+                               ensure_customer_profiles_table, load_profiles, profile_features)
+from lead_scoring import CompiledForest, LeadScorer
+from logging_system import ensure_logs_table, ingest_events
+from sales_funnel import PURCHASE_STAGE
+
+
+def percentiles(samples):
+    samples = np.array(samples)
+    return f"p50 {np.percentile(samples, 50):6.3f} ms   p99 {np.percentile(samples, 99):6.3f} ms"
+
+
+def train_model(conn, path):
+    """Purchase model over profile features, trained the way PredictiveAnalytics does"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT customer_id FROM customer_profiles ORDER BY random() LIMIT 20000")
+    profiles = list(load_profiles(cursor, [row[0] for row in cursor.fetchall()]).values())
+    X = np.array([list(profile_features(profile).values()) for profile in profiles], dtype=float)
+    y = np.array([1 if profile['stage'] >= PURCHASE_STAGE else 0 for profile in profiles])
+    # Keep the funnel stage out of reach so the forest has to grow real trees
+    X[:, 5] = 0
+    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model.fit(X, y)
+    joblib.dump(model, path)
+    return model, X
+
+
+def single_event_ms(conn, listeners, events):
+    times = []
+    for event in events:
+        t0 = time.perf_counter()
+        ingest_events(conn, [event], listeners=listeners)
+        times.append((time.perf_counter() - t0) * 1000)
+    return times
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_logs(str(Path(tmp) / "bench.db"), rows)
+        ensure_logs_table(conn)
+        ensure_customer_profiles_table(conn)
+        backfill_customer_profiles(conn)
+        model_path = str(Path(tmp) / "purchase_prediction_model.joblib")
+        model, X = train_model(conn, model_path)
+        print(f"{rows:,} rows; forest of {len(model.estimators_)} trees, "
+              f"max depth {max(tree.tree_.max_depth for tree in model.estimators_)}")
+
+        compiled = CompiledForest(model)
+        one = X[:1]
+        sklearn_ms = [0.0] * 200
+        compiled_ms = [0.0] * 200
+        for i in range(200):
+            t0 = time.perf_counter()
+            model.predict_proba(one)
+            sklearn_ms[i] = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter()
+            compiled.predict_proba(one)
+            compiled_ms[i] = (time.perf_counter() - t0) * 1000
+        print(f"One customer, sklearn predict_proba:  {percentiles(sklearn_ms)}")
+        print(f"One customer, compiled forest:        {percentiles(compiled_ms)}")
+        print(f"Compiled matches sklearn on {len(X):,} customers: "
+              f"{np.allclose(compiled.predict_proba(X), model.predict_proba(X)[:, 1])}")
+
+        customers = [f"CUST-{random.randrange(200000):06d}" for _ in range(events)]
+        sample = [{"timestamp": datetime.now().isoformat(), "level": "INFO", "category": "SALES",
+                   "message": f"Sales event: {random.choice(['LEAD', 'CONTACT', 'TEST_DRIVE'])}",
+                   "customer_id": customer, "details": {"model": "SUV Pro"}} for customer in customers]
+        scorer = LeadScorer(model_path)
+        baseline = single_event_ms(conn, [CustomerProfileRecorder()], sample[:events // 2])
+        scored = single_event_ms(conn, [CustomerProfileRecorder(), scorer], sample[events // 2:])
+        print(f"Single-event ingest, profiles only:   {percentiles(baseline)}")
+        print(f"Single-event ingest, + lead scoring:  {percentiles(scored)}")
+        stats = scorer.latency_stats()
+        print(f"LeadScorer added latency per event:   p50 {stats['p50_ms']:6.3f} ms   "
+              f"p99 {stats['p99_ms']:6.3f} ms   max {stats['max_ms']:.3f} ms")
+
+        batch = [dict(event, customer_id=f"CUST-{random.randrange(200000):06d}") for event in sample * 10]
+        for label, listeners in (("profiles only", [CustomerProfileRecorder()]),
+                                 ("+ lead scoring", [CustomerProfileRecorder(), LeadScorer(model_path)])):
+            t0 = time.perf_counter()
+            ingest_events(conn, batch, listeners=listeners)
+            print(f"Batch ingest of {len(batch):,} SALES events, {label}: "
+                  f"{len(batch) / (time.perf_counter() - t0):,.0f} events/s")
+
+        t0 = time.perf_counter()
+        leads = conn.execute("SELECT customer_id, score FROM lead_scores ORDER BY score DESC LIMIT 20").fetchall()
+        print(f"Top 20 leads read: {(time.perf_counter() - t0) * 1000:.2f} ms ({len(leads)} rows)")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Multi-process logging load test: direct SQLite writers vs the single-writer collector
+# Run from the repository root: python -m benchmarks.bench_log_collector [producers] [events_per_producer]
+import contextlib
+import io
+import logging
+import multiprocessing
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import logging_system
+from log_collector import LogCollector
+
+
+def produce(handler_factory, events, seed):
+    """Log a mix of sales, service and system events through the given handler"""
+    random.seed(seed)
+    root = logging.getLogger()
+    root.handlers = [handler_factory()]
+    errors = io.StringIO()
+    with contextlib.redirect_stdout(errors):
+        for i in range(events):
+            kind = random.random()
+            if kind < 0.4:
+                logging_system.log_system_event(random.choice(["health check", "backup", "update"]),
+                                                component=random.choice(["api", "database", "auth"]))
+            elif kind < 0.7:
+                logging_system.log_sales_event(random.choice(["LEAD", "CONTACT", "TEST_DRIVE", "PURCHASE"]),
+                                               customer_id=f"CUST-{random.randrange(5000):05d}",
+                                               details={"model": "SUV Pro"})
+            else:
+                logging_system.log_service_event(f"SRV-{i}", "SCHEDULED",
+                                                 customer_id=f"CUST-{random.randrange(5000):05d}",
+                                                 details={"service_type": "Oil Change"})
+    root.handlers[0].close()
+    return errors.getvalue().count("\n")
+
+
+class _DirectHandler:
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def __call__(self):
+        # The handler flushes its listeners from a background thread
+        return logging_system.DatabaseLogHandler(sqlite3.connect(self.db_path, check_same_thread=False))
+
+
+class _CollectorHandler:
+    def __init__(self, address):
+        self.address = address
+
+    def __call__(self):
+        return logging_system.CollectorLogHandler(self.address)
+
+
+def run_producers(handler_factory, producers, events):
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(producers) as pool:
+        errors = pool.starmap(produce, [(handler_factory, events, seed) for seed in range(producers)])
+    return time.perf_counter() - t0, sum(errors)
+
+
+def count_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+    conn.close()
+    return rows
+
+
+def main():
+    producers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    expected = producers * events
+    print(f"{producers} producers x {events:,} events")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        direct_db = str(Path(tmp) / "direct.db")
+        logging_system.ensure_logs_table(sqlite3.connect(direct_db))
+        elapsed, errors = run_producers(_DirectHandler(direct_db), producers, events)
+        rows = count_rows(direct_db)
+        print(f"Direct DatabaseLogHandler: {elapsed:.2f}s ({rows / elapsed:,.0f} events/s), "
+              f"{rows:,}/{expected:,} stored, {errors} write errors")
+
+        collector_db = str(Path(tmp) / "collector.db")
+        address = str(Path(tmp) / "collector.sock")
+        collector = LogCollector(collector_db, address=address, queue_size=10000)
+        collector.start()
+        server = threading.Thread(target=collector.serve_forever)
+        server.start()
+
+        elapsed, errors = run_producers(_CollectorHandler(address), producers, events)
+        t0 = time.perf_counter()
+        collector.shutdown()
+        server.join()
+        drain = time.perf_counter() - t0
+        rows = count_rows(collector_db)
+        print(f"CollectorLogHandler: {elapsed:.2f}s to send, {drain:.2f}s shutdown drain "
+              f"({rows / (elapsed + drain):,.0f} events/s), {rows:,}/{expected:,} stored, {errors} send errors, "
+              f"{collector.stats['batches']} batches")
+
+
+if __name__ == "__main__":
+    main()
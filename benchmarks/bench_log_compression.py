@@ -0,0 +1,140 @@
+# Template + dictionary log compression benchmark
+# Run from the repository root: python -m benchmarks.bench_log_compression [rows]
+import json
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from log_compression import attach_compact_reader, compact_logs, storage_stats
+
+COMPONENTS = ["database", "api", "frontend", "auth", "scheduler"]
+MODELS = ["Sedan X", "SUV Pro", "Compact Y", "Luxury Z", "Electric Future", "Hybrid Max"]
+SERVICE_TYPES = ["Oil Change", "Tire Rotation", "Brake Service", "Regular Maintenance", "Battery Replacement"]
+STAGES = ["LEAD", "CONTACT", "TEST_DRIVE", "NEGOTIATION", "PURCHASE", "DELIVERY"]
+
+
+def random_row(now):
+    timestamp = (now - timedelta(seconds=random.randrange(90 * 24 * 3600))).isoformat()
+    customer_id = f"CUST-{random.randrange(200000):06d}"
+    vehicle_id = f"VEH-{random.randrange(50000):05d}"
+    kind = random.random()
+    if kind < 0.35:
+        level = random.choice(["INFO", "INFO", "INFO", "WARN", "ERROR"])
+        return (timestamp, level, "SYSTEM",
+                f"System {random.choice(['startup', 'config change', 'backup', 'update', 'health check'])}",
+                None, None, json.dumps({"component": random.choice(COMPONENTS),
+                                        "status": "success" if level == "INFO" else "failed"}))
+    if kind < 0.55:
+        return (timestamp, "INFO", "INVENTORY", f"Inventory {random.choice(['received', 'allocated', 'sold'])}",
+                None, vehicle_id, json.dumps({"model": random.choice(MODELS), "quantity": 1,
+                                              "location": random.choice(["main_showroom", "warehouse"]),
+                                              "value": random.randint(25000, 75000)}))
+    if kind < 0.8:
+        return (timestamp, "INFO", "SERVICE",
+                f"Service {random.choice(['SCHEDULED', 'CHECK_IN', 'COMPLETED'])}",
+                customer_id, vehicle_id,
+                json.dumps({"service_type": random.choice(SERVICE_TYPES),
+                            "duration_minutes": random.randint(30, 240),
+                            "satisfaction_score": round(random.uniform(3.0, 5.0), 1)}))
+    if kind < 0.95:
+        return (timestamp, "INFO", "SALES", f"Sales event: {random.choice(STAGES)}", customer_id, vehicle_id,
+                json.dumps({"model": random.choice(MODELS), "status": "successful",
+                            "notes": f"Customer interested in {random.choice(['financing', 'leasing'])}"}))
+    return (timestamp, "INFO", "CUSTOMER", "Customer profile update", customer_id, None,
+            json.dumps({"updated_fields": ["email", "phone"], "reason": "customer request"}))
+
+
+def create_logs(db_path, rows):
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+    CREATE TABLE logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT, level TEXT, category TEXT, message TEXT,
+        customer_id TEXT, vehicle_id TEXT, operation_id TEXT,
+        user_id TEXT, details TEXT
+    )
+    ''')
+    now = datetime.now()
+    batch = []
+    for _ in range(rows):
+        timestamp, level, category, message, customer_id, vehicle_id, details = random_row(now)
+        batch.append((timestamp, level, category, message, customer_id, vehicle_id,
+                      str(uuid.uuid4()), f"USER-{random.randrange(10):02d}", details))
+        if len(batch) == 100000:
+            conn.executemany(
+                "INSERT INTO logs (timestamp, level, category, message, customer_id, vehicle_id, "
+                "operation_id, user_id, details) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany(
+            "INSERT INTO logs (timestamp, level, category, message, customer_id, vehicle_id, "
+            "operation_id, user_id, details) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+    conn.execute("CREATE INDEX idx_logs_category_time ON logs (category, timestamp)")
+    conn.commit()
+    return conn
+
+
+def read_throughput(conn):
+    """Full decode scan plus a typical dashboard query"""
+    t0 = time.perf_counter()
+    rows = 0
+    for _ in conn.execute("SELECT id, message, details FROM logs"):
+        rows += 1
+    scan = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for category in ("SYSTEM", "SERVICE", "INVENTORY"):
+        conn.execute(
+            "SELECT * FROM logs WHERE category = ? ORDER BY timestamp DESC LIMIT 100", (category,)
+        ).fetchall()
+    query = (time.perf_counter() - t0) / 3
+    return rows / scan, query * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    random.seed(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_path = str(Path(tmp) / "plain.db")
+        compact_path = str(Path(tmp) / "compact.db")
+
+        t0 = time.perf_counter()
+        conn = create_logs(plain_path, rows)
+        conn.close()
+        print(f"Generated {rows:,} rows in {time.perf_counter() - t0:.1f}s")
+        shutil.copy(plain_path, compact_path)
+
+        conn = sqlite3.connect(plain_path)
+        plain_stats = storage_stats(conn)
+        plain_scan, plain_query = read_throughput(conn)
+        conn.close()
+
+        conn = sqlite3.connect(compact_path)
+        t0 = time.perf_counter()
+        moved = compact_logs(conn)
+        compact_time = time.perf_counter() - t0
+        conn.execute("VACUUM")
+        compact_stats = storage_stats(conn)
+        templates = conn.execute("SELECT COUNT(*) FROM log_templates").fetchone()[0]
+        codec = conn.execute("SELECT codec FROM compression_dictionaries").fetchone()[0]
+        attach_compact_reader(conn)
+        compact_scan, compact_query = read_throughput(conn)
+        conn.close()
+
+        reduction = 1 - compact_stats["database_bytes"] / plain_stats["database_bytes"]
+        print(f"Compacted {moved:,} rows in {compact_time:.1f}s ({templates} templates, {codec} dictionary)")
+        print(f"On-disk size: {plain_stats['database_bytes'] / 1e6:.1f} MB -> "
+              f"{compact_stats['database_bytes'] / 1e6:.1f} MB ({reduction:.0%} smaller)")
+        print(f"Full decode scan: {plain_scan:,.0f} -> {compact_scan:,.0f} rows/s")
+        print(f"Category query (LIMIT 100): {plain_query:.2f} -> {compact_query:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
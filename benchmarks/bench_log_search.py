@@ -0,0 +1,97 @@
+# Full-text log search benchmark (FTS5 over message + flattened details)
+# Run from the repository root: python -m benchmarks.bench_log_search [rows] [repeats]
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.bench_log_compression import create_logs, random_row
+from log_analyzer import LogAnalyzer
+from log_query import LogQuery
+from log_search import SearchIndexer, ensure_search_index
+from logging_system import ingest_events
+
+# Support-desk style notes mixed into the generated history
+NOTES = ["needs_followup", "callback requested", "warranty claim", "prefers email", "loan approved"]
+
+
+def support_events(count):
+    now = datetime.now()
+    events = []
+    for i in range(count):
+        timestamp, _, _, _, customer_id, _, _ = random_row(now)
+        events.append({
+            "timestamp": timestamp, "level": "INFO", "category": "CUSTOMER",
+            "message": "Customer support call", "customer_id": customer_id or f"CUST-{i:06d}",
+            "details": {"phone": f"555-{random.randrange(1000):03d}-{random.randrange(10000):04d}",
+                        "notes": random.choice(NOTES)}
+        })
+    return events
+
+
+def median_ms(func, repeats):
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000, len(result)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    random.seed(13)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        t0 = time.perf_counter()
+        conn = create_logs(db_path, rows)
+        print(f"Generated {rows:,} rows in {time.perf_counter() - t0:.0f}s")
+
+        t0 = time.perf_counter()
+        indexed = ensure_search_index(conn)
+        print(f"Built FTS5 index over {indexed:,} rows in {time.perf_counter() - t0:.0f}s")
+
+        # Ingest cost of keeping the index in sync, against a plain bulk load
+        for label, listeners in (("without index sync", ()), ("with SearchIndexer", [SearchIndexer()])):
+            events = support_events(100_000)
+            t0 = time.perf_counter()
+            ingest_events(conn, events, listeners=listeners)
+            print(f"Ingested {len(events):,} events {label}: "
+                  f"{len(events) / (time.perf_counter() - t0):,.0f} events/s")
+        phone = events[0]["details"]["phone"]
+        note = events[0]["details"]["notes"]
+        customer = events[0]["customer_id"]
+        conn.close()
+
+        analyzer = LogAnalyzer(db_path, cache_ttl=0, hot_hours=0)
+        searches = (
+            (f"phone number {phone}", lambda: analyzer.search(phone)),
+            (f"'{note}' for one customer",
+             lambda: analyzer.search(note, filters=LogQuery().customer(customer))),
+            ('"Battery Replacement", last 7 days',
+             lambda: analyzer.search('"Battery Replacement"', filters=LogQuery().last(days=7))),
+            ("leasing (common term, top 50)", lambda: analyzer.search("leasing")),
+            ("Electr* prefix (top 50)", lambda: analyzer.search("Electr*")),
+        )
+        baseline_conn = sqlite3.connect(db_path)
+        t0 = time.perf_counter()
+        baseline = baseline_conn.execute(
+            "SELECT COUNT(*) FROM logs WHERE details LIKE ?", (f"%{phone}%",)
+        ).fetchone()[0]
+        print(f"Baseline LIKE scan for the phone number: {(time.perf_counter() - t0) * 1000:,.0f} ms "
+              f"({baseline} match)")
+        baseline_conn.close()
+
+        for label, search in searches:
+            ms, found = median_ms(search, repeats)
+            print(f"{label:45s} {ms:8.1f} ms  ({found} results)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Login hashing: cost per scheme, writer-lock stalls during a login burst, and rate-limiter shedding
+# Run from the repository root: python -m benchmarks.bench_password_hashing [logins] [threads]
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from auth_system import AuthenticationSystem
+from password_hashing import PBKDF2_ITERATIONS, LoginRateLimiter, PasswordHasher, hash_password, legacy_hash
+
+
+def per_call_ms(func, calls=5):
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - t0) / calls * 1000
+
+
+def burst(auth, login, logins, threads):
+    """Run `logins` logins on `threads` threads; meanwhile time small writes. Returns (s, write ms samples)"""
+    writes = []
+    done = threading.Event()
+
+    def writer():
+        while not done.is_set():
+            t0 = time.perf_counter()
+            auth.update_user(1, email="bench@example.com")
+            writes.append((time.perf_counter() - t0) * 1000)
+            time.sleep(0.005)
+
+    def work(count):
+        for _ in range(count):
+            login()
+
+    workers = [threading.Thread(target=work, args=(logins // threads,)) for _ in range(threads)]
+    watcher = threading.Thread(target=writer)
+    watcher.start()
+    t0 = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - t0
+    done.set()
+    watcher.join()
+    return elapsed, writes
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    print(f"legacy SHA-256:            {per_call_ms(lambda: legacy_hash('password', 'salt'), 1000):8.3f} ms/hash")
+    for iterations in (100_000, PBKDF2_ITERATIONS):
+        print(f"PBKDF2, {iterations:>7,} iterations: "
+              f"{per_call_ms(lambda: hash_password('password', 'salt', iterations)):8.3f} ms/hash")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        auth = AuthenticationSystem(str(Path(tmp) / "bench.db"),
+                                    hasher=PasswordHasher(workers=4, queue_limit=logins),
+                                    rate_limiter=LoginRateLimiter(max_attempts=logins * 2))
+        auth.create_user("alice", "password", "Alice", "alice@example.com", "sales")
+        auth.create_user("bob", "password", "Bob", "bob@example.com", "sales")
+
+        def inline_login():
+            # The previous shape: the whole login, hashing included, under the write lock
+            with auth.db.write_lock:
+                auth.authenticate("alice", "password")
+
+        for label, login in (("hash under write lock", inline_login),
+                             ("hash on worker pool", lambda: auth.authenticate("alice", "password"))):
+            elapsed, writes = burst(auth, login, logins, threads)
+            print(f"{logins} logins on {threads} threads, {label}: {logins / elapsed:6.1f} logins/s; "
+                  f"concurrent writes median {statistics.median(writes):7.2f} ms, max {max(writes):7.1f} ms")
+
+        auth.rate_limiter = LoginRateLimiter()
+        t0 = time.perf_counter()
+        results = [auth.authenticate("bob", "guess", ip_address="10.0.0.1")["message"] for _ in range(10_000)]
+        elapsed = time.perf_counter() - t0
+        hashed = sum(1 for message in results if message == "Invalid username or password")
+        print(f"10,000 guesses at one account: {hashed} reached the hash pool, "
+              f"{auth.rate_limiter.refused:,} shed, {elapsed:.2f}s total")
+        auth.close()
+
+
+if __name__ == "__main__":
+    main()
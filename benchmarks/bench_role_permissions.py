@@ -0,0 +1,64 @@
+# Authorization checks: per-call roles query + JSON parse vs the compiled PermissionTable
+# Run from the repository root: python -m benchmarks.bench_role_permissions [checks]
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from auth_system import AuthenticationSystem
+
+MODULES = ["dashboard", "customers", "sales", "service", "esg", "system", "users", "analytics"]
+ACTIONS = ["view", "edit", "delete", "export", "run"]
+
+
+def check_from_database(conn, role, module, action):
+    """How check_permission used to work: read the role row and parse it on every call"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT permissions FROM roles WHERE role_name = ?", (role,))
+    result = cursor.fetchone()
+    if not result:
+        return False
+    return action in json.loads(result[0]).get(module, [])
+
+
+def checks_per_second(func, sample):
+    t0 = time.perf_counter()
+    for args in sample:
+        func(*args)
+    return len(sample) / (time.perf_counter() - t0)
+
+
+def main():
+    checks = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    random.seed(44)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        auth = AuthenticationSystem(str(Path(tmp) / "bench.db"))
+        for i in range(40):
+            auth.create_role(f"team{i}", {module: random.sample(ACTIONS, random.randint(1, 3))
+                                          for module in random.sample(MODULES, 5)})
+        roles = auth.permission_table.roles()
+        sample = [(random.choice(roles), random.choice(MODULES), random.choice(ACTIONS)) for _ in range(checks)]
+
+        conn = auth.db.writer()
+        mismatches = sum(check_from_database(conn, *args) != auth.check_permission(*args) for args in sample[:20000])
+        database_rate = checks_per_second(lambda *args: check_from_database(conn, *args), sample[:checks // 10])
+        compiled_rate = checks_per_second(auth.check_permission, sample)
+        print(f"{len(roles)} roles; {mismatches} mismatches on 20,000 checks")
+        print(f"check_permission: query + JSON {database_rate:12,.0f} checks/s   compiled {compiled_rate:12,.0f} checks/s")
+
+        t0 = time.perf_counter()
+        for role in roles:
+            auth.get_permissions(role)
+        print(f"get_permissions for every role: {(time.perf_counter() - t0) * 1000:.2f} ms")
+
+        t0 = time.perf_counter()
+        auth.update_role("team0", permissions={"dashboard": ["view"]})
+        print(f"update_role + recompile: {(time.perf_counter() - t0) * 1000:.2f} ms; "
+              f"team0 can edit sales: {auth.check_permission('team0', 'sales', 'edit')}")
+
+
+if __name__ == "__main__":
+    main()
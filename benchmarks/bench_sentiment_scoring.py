@@ -0,0 +1,74 @@
+# Sentiment scoring throughput on CPU: one predict() per comment vs SentimentScorer's fixed-size batches
+# Run from the repository root: python -m benchmarks.bench_sentiment_scoring [comments]
+import os
+import random
+import sys
+import time
+
+# Measure the CPU path even on machines with a GPU
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")
+
+import numpy as np
+from tensorflow.keras.layers import LSTM, Bidirectional, Dense, Dropout, Embedding, SpatialDropout1D
+from tensorflow.keras.models import Sequential
+from tensorflow.keras.preprocessing.sequence import pad_sequences
+from tensorflow.keras.preprocessing.text import Tokenizer
+
+from sentiment_scoring import SENTIMENT_MAXLEN, SentimentScorer
+
+WORDS = ("service staff car delivery price dealer test drive mileage engine comfort booking wait "
+         "great good excellent friendly quick smooth bad poor slow rude worst late broken noisy").split()
+
+
+def comment():
+    return " ".join(random.choice(WORDS) for _ in range(random.randint(5, 40)))
+
+
+def sentiment_model():
+    """The architecture from train_sentiment_model.py; weights don't matter for throughput"""
+    model = Sequential([
+        Embedding(input_dim=5000, output_dim=32),
+        SpatialDropout1D(0.2),
+        Bidirectional(LSTM(64, dropout=0.5, recurrent_dropout=0.5)),
+        Dropout(0.5),
+        Dense(1, activation='sigmoid')
+    ])
+    model.build((None, SENTIMENT_MAXLEN))
+    return model
+
+
+def main():
+    comments = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    random.seed(50)
+    texts = [comment() for _ in range(comments)]
+    tokenizer = Tokenizer(num_words=5000)
+    tokenizer.fit_on_texts(texts)
+    model = sentiment_model()
+
+    # The old path: tokenize, pad and predict() one comment per call
+    single = texts[:200]
+    model.predict(pad_sequences(tokenizer.texts_to_sequences(single[:1]), maxlen=SENTIMENT_MAXLEN), verbose=0)
+    t0 = time.perf_counter()
+    for text in single:
+        model.predict(pad_sequences(tokenizer.texts_to_sequences([text]), maxlen=SENTIMENT_MAXLEN), verbose=0)
+    print(f"one predict() per comment:   {len(single) / (time.perf_counter() - t0):10,.0f} comments/s")
+
+    reference = None
+    for batch_size in (32, 256, 1024):
+        scorer = SentimentScorer(model, tokenizer, batch_size=batch_size)
+        scorer.predict_proba(texts[:1])
+        t0 = time.perf_counter()
+        scores = scorer.predict_proba(texts)
+        rate = comments / (time.perf_counter() - t0)
+        if reference is None:
+            reference = scores
+        print(f"SentimentScorer, batch {batch_size:5d}: {rate:10,.0f} comments/s "
+              f"(matches batch 32: {np.allclose(scores, reference, atol=1e-5)})")
+
+    t0 = time.perf_counter()
+    pad_sequences(tokenizer.texts_to_sequences(texts), maxlen=SENTIMENT_MAXLEN)
+    print(f"tokenize + pad alone:        {comments / (time.perf_counter() - t0):10,.0f} comments/s")
+
+
+if __name__ == "__main__":
+    main()
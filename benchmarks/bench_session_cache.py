@@ -0,0 +1,74 @@
+# Session validation: per-request SQLite lookup vs the in-process SessionCache
+# Run from the repository root: python -m benchmarks.bench_session_cache [sessions] [requests] [threads]
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from auth_system import AuthenticationSystem
+from password_hashing import PasswordHasher
+
+
+def median_us(func, args_list):
+    times = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1_000_000
+
+
+def threaded_rate(func, session_ids, requests, threads):
+    """Validations per second across `threads` workers"""
+    def work():
+        for _ in range(requests // threads):
+            func(random.choice(session_ids))
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return requests / (time.perf_counter() - t0)
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    random.seed(43)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Logins aren't measured here, so keep key derivation cheap
+        auth = AuthenticationSystem(str(Path(tmp) / "bench.db"), hasher=PasswordHasher(iterations=1000))
+        roles = ["admin", "sales", "service", "readonly"]
+        for i in range(50):
+            auth.create_user(f"user{i}", "password", f"User {i}", f"user{i}@example.com", roles[i % len(roles)])
+        session_ids = [auth.authenticate(f"user{i % 50}", "password")["session_id"] for i in range(sessions)]
+        sample = [(random.choice(session_ids),) for _ in range(requests)]
+
+        uncached = median_us(lambda session_id: auth._load_session(session_id), sample[:5000])
+        auth.session_cache.clear()
+        median_us(auth.validate_session, sample)
+        cached = median_us(auth.validate_session, sample)
+        stats = auth.session_cache.stats()
+        print(f"validate_session: SQLite {uncached:6.1f} us   cached {cached:6.2f} us   "
+              f"hit rate {stats['hit_rate']:.1%} over {stats['hits'] + stats['misses']:,} lookups")
+
+        sqlite_rate = threaded_rate(lambda session_id: auth._load_session(session_id),
+                                    session_ids, requests // 5, threads)
+        cached_rate = threaded_rate(auth.validate_session, session_ids, requests, threads)
+        print(f"{threads} threads: SQLite {sqlite_rate:10,.0f} validations/s   cached {cached_rate:10,.0f} validations/s")
+
+        t0 = time.perf_counter()
+        auth.update_role("sales", description="Sales team access")
+        print(f"update_role invalidation of {sessions:,} cached sessions: "
+              f"{(time.perf_counter() - t0) * 1000:.2f} ms, {auth.session_cache.stats()['size']:,} left cached")
+
+
+if __name__ == "__main__":
+    main()
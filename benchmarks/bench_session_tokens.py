@@ -0,0 +1,82 @@
+# Session modes under load: database sessions (uncached / cached) vs signed tokens, plus the expiry purge
+# Run from the repository root: python -m benchmarks.bench_session_tokens [sessions] [requests] [threads]
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from auth_system import AuthenticationSystem
+from password_hashing import PasswordHasher
+
+
+def load_test(validate, session_ids, requests, threads):
+    """Validations per second and the slowest thread's p99 latency in us"""
+    latencies = []
+
+    def work():
+        times = []
+        for _ in range(requests // threads):
+            session_id = random.choice(session_ids)
+            t0 = time.perf_counter()
+            if validate(session_id) is None:
+                raise AssertionError("valid session rejected")
+            times.append(time.perf_counter() - t0)
+        times.sort()
+        latencies.append(times[int(len(times) * 0.99)] * 1_000_000)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return requests / (time.perf_counter() - t0), max(latencies)
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    random.seed(45)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        # Logins aren't measured here, so keep key derivation cheap
+        hasher = PasswordHasher(iterations=1000)
+        database = AuthenticationSystem(db_path, hasher=hasher)
+        tokens = AuthenticationSystem(db_path, session_mode="token", hasher=hasher)
+        for i in range(100):
+            database.create_user(f"user{i}", "password", f"User {i}", f"user{i}@example.com", "sales")
+        db_sessions = [database.authenticate(f"user{i % 100}", "password")["session_id"] for i in range(sessions)]
+        token_sessions = [tokens.authenticate(f"user{i % 100}", "password")["session_id"] for i in range(sessions)]
+        # Revoke some tokens so verification checks a non-empty revocation list
+        for session_id in random.sample(token_sessions, sessions // 10):
+            tokens.logout(session_id)
+            token_sessions.remove(session_id)
+
+        print(f"{sessions:,} sessions per mode, {requests:,} validations on {threads} threads")
+        for label, validate, session_ids, count in (
+            ("database, uncached", database._load_session, db_sessions, requests // 5),
+            ("database, cached", database.validate_session, db_sessions, requests),
+            ("signed tokens", tokens.validate_session, token_sessions, requests),
+        ):
+            rate, p99 = load_test(validate, session_ids, count, threads)
+            print(f"  {label:20s} {rate:10,.0f} validations/s   p99 {p99:8.1f} us")
+
+        conn = database.db.writer()
+        expired = (datetime.now() - timedelta(days=1)).isoformat()
+        conn.executemany(
+            "INSERT INTO sessions (session_id, user_id, created_at, expires_at) VALUES (?, 1, ?, ?)",
+            [(f"expired-{i}", expired, expired) for i in range(200_000)])
+        conn.commit()
+        t0 = time.perf_counter()
+        purged = database.purge_expired_sessions()
+        print(f"Purged {purged['sessions']:,} expired sessions of {200_000 + sessions:,} "
+              f"in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
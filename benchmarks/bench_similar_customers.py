@@ -0,0 +1,107 @@
+# "Similar customers": BallTree index vs O(N) scan over every profile
+# Run from the repository root: python -m benchmarks.bench_similar_customers [customers] [queries]
+import json
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from customer_profiles import PROFILE_COLUMNS, ensure_customer_profiles_table
+from similar_customers import CustomerSimilarityIndex, load_profile_features
+
+
+def random_profile(customer_id, log_id, now):
+    first_seen = now - timedelta(days=random.uniform(1, 720))
+    last = first_seen + (now - first_seen) * random.random()
+    counts = {"CUSTOMER": random.randint(1, 5), "SALES": random.randint(0, 8), "SERVICE": random.randint(0, 12)}
+    satisfaction = [round(random.uniform(3.0, 5.0), 1) for _ in range(random.randint(0, 4))]
+    profile = dict.fromkeys(PROFILE_COLUMNS)
+    profile.update({
+        "customer_id": customer_id, "registered_at": first_seen.isoformat(), "first_seen": first_seen.isoformat(),
+        "stage": random.randint(0, 6), "vehicles": "{}", "category_counts": json.dumps(counts),
+        "event_count": sum(counts.values()), "service_count": counts["SERVICE"], "services_completed": 0,
+        "satisfaction_sum": sum(satisfaction), "satisfaction_count": len(satisfaction),
+        "satisfaction_trend": "[]", "last_interaction": last.isoformat(), "last_log_id": log_id
+    })
+    return tuple(profile[column] for column in PROFILE_COLUMNS)
+
+
+def write_profiles(conn, profiles):
+    conn.executemany(
+        f"INSERT OR REPLACE INTO customer_profiles ({', '.join(PROFILE_COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in PROFILE_COLUMNS)})", profiles)
+    conn.commit()
+
+
+def brute_force(index, conn, customer_id, k):
+    """O(N) reference: scan every profile, scale, sort by distance"""
+    ids, matrix, _ = load_profile_features(conn)
+    scaled = index._scaled(matrix)
+    target = scaled[ids.index(customer_id)]
+    distances = np.linalg.norm(scaled - target, axis=1)
+    order = [i for i in np.argsort(distances, kind="stable") if ids[i] != customer_id][:k]
+    return [ids[i] for i in order], distances[order]
+
+
+def median_ms(func, args_list):
+    times = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def main():
+    customers = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    random.seed(40)
+    now = datetime.now()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(str(Path(tmp) / "bench.db"))
+        ensure_customer_profiles_table(conn)
+        write_profiles(conn, [random_profile(f"CUST-{i:07d}", i + 1, now) for i in range(customers)])
+
+        index = CustomerSimilarityIndex(Path(tmp) / "similarity.joblib")
+        t0 = time.perf_counter()
+        index.build(conn)
+        print(f"Built and saved index over {customers:,} customers in {time.perf_counter() - t0:.2f}s")
+        t0 = time.perf_counter()
+        index = CustomerSimilarityIndex(Path(tmp) / "similarity.joblib")
+        index.load()
+        print(f"Loaded index in {(time.perf_counter() - t0) * 1000:.0f} ms")
+        index.refresh(conn, force=True)
+
+        sample = [(conn, f"CUST-{random.randrange(customers):07d}", 10) for _ in range(queries)]
+        scan_ms = median_ms(lambda c, cid, k: brute_force(index, c, cid, k), sample[:10])
+        tree_ms = median_ms(index.similar_customers, sample)
+        print(f"similar_customers(k=10): O(N) scan {scan_ms:8.1f} ms   index {tree_ms:6.2f} ms")
+
+        # Incremental refresh: 1% of profiles change, queries merge tree and delta
+        changed = random.sample(range(customers), customers // 100)
+        write_profiles(conn, [random_profile(f"CUST-{i:07d}", customers + n + 1, now) for n, i in enumerate(changed)])
+        t0 = time.perf_counter()
+        refreshed = index.refresh(conn, force=True)
+        print(f"Refreshed {refreshed:,} changed profiles in {(time.perf_counter() - t0) * 1000:.0f} ms "
+              f"({index.stats()['delta_size']:,} in delta)")
+        tree_ms = median_ms(index.similar_customers, sample)
+        print(f"similar_customers(k=10) with delta:  index {tree_ms:6.2f} ms")
+
+        mismatches = 0
+        for c, customer_id, k in sample[:20]:
+            expected_ids, expected = brute_force(index, c, customer_id, k)
+            found = index.similar_customers(c, customer_id, k)
+            mismatches += not np.allclose(found['distance'].to_numpy(), expected)
+        print(f"Distances matching the O(N) scan: {20 - mismatches}/20 queries")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Import-time profile of app.py's module-level imports (what every page and rerun pays for)
+# Run from the repository root: python -m benchmarks.profile_startup [top]
+import ast
+import subprocess
+import sys
+
+APP = "app.py"
+
+# Must stay out of the startup path; pages import them when needed
+HEAVY = ("tensorflow", "keras", "sklearn", "statsmodels", "matplotlib", "calplot", "plotly", "altair", "flask")
+
+
+def startup_imports(path=APP):
+    """Import statements at the top level of the script, in order, and the top-level packages they name"""
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    nodes = [node for node in ast.parse(source).body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    packages = {alias.name.split(".")[0] for node in nodes if isinstance(node, ast.Import) for alias in node.names}
+    packages |= {node.module.split(".")[0] for node in nodes if isinstance(node, ast.ImportFrom)}
+    return [ast.get_source_segment(source, node) for node in nodes], packages
+
+
+def profile(statements):
+    """(self us, cumulative us, module) per imported module, parsed from -X importtime"""
+    code = "\n".join(statements) + "\nimport sys\nprint('LOADED', ' '.join(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), module.rstrip()))
+    loaded = next(line for line in result.stdout.splitlines() if line.startswith("LOADED")).split()[1:]
+    return rows, loaded
+
+
+def main():
+    top = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    statements, packages = startup_imports()
+    rows, loaded = profile(statements)
+
+    # Unindented entries of importtime's tree are direct imports; skip the interpreter's own (site, encodings)
+    direct = [(cumulative, module.strip()) for _, cumulative, module in rows
+              if not module.startswith("  ") and module.strip().split(".")[0] in packages]
+    total = sum(cumulative for cumulative, _ in direct)
+    print(f"{len(statements)} import statements at the top of {APP}: {total / 1000:.0f} ms, "
+          f"{len(loaded)} modules loaded")
+    for cumulative, module in sorted(direct, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+    leaked = sorted({name.split(".")[0] for name in loaded} & set(HEAVY))
+    if leaked:
+        print(f"Heavy modules loaded at startup: {', '.join(leaked)}")
+        sys.exit(1)
+    print(f"None of {', '.join(HEAVY)} loaded at startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import sqlite3
+import threading
+import pandas as pd
+from datetime import datetime, timedelta
+from connection_manager import get_manager, serialized
+from log_compression import attach_compact_reader
+
+# Events that count as a customer "coming back" after registering
+RETURN_CATEGORIES = ('SERVICE', 'SALES')
+
+# Monday of the week a timestamp falls in
+WEEK_START_SQL = "date({}, 'weekday 0', '-6 days')"
+
+
+class CohortRetention:
+    """
+    Weekly registration cohorts and their retention, maintained incrementally.
+
+    Only closed weeks are folded in: each update() processes the weeks between
+    the stored watermark and the start of the current week, so every activity
+    week is counted exactly once and nothing is recomputed from scratch.
+    """
+
+    def __init__(self, db_path="logs/crm.db"):
+        self.db = get_manager(db_path)
+        # Scans read compacted rows transparently through `logs`
+        self.db.add_reader_hook(attach_compact_reader)
+        self._maintenance = None
+        self._maintenance_stop = threading.Event()
+        self._setup_tables()
+
+    @property
+    def conn(self):
+        # Table maintenance runs on the shared writer; scans and reports read via self.db.reader()
+        return self.db.writer()
+
+    @serialized
+    def _setup_tables(self):
+        """Create cohort tables if they don't exist"""
+        cursor = self.conn.cursor()
+
+        # One row per registered customer
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cohort_members (
+            customer_id TEXT PRIMARY KEY,
+            registered_at TEXT NOT NULL,
+            cohort_week TEXT NOT NULL,
+            first_return_at TEXT,
+            days_to_return REAL
+        )
+        ''')
+        # Covers both cohort sizes and the within-N-days retention scan
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cohort_members_week ON cohort_members (cohort_week, days_to_return)"
+        )
+
+        # Distinct returning customers per cohort and week offset
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cohort_activity (
+            cohort_week TEXT NOT NULL,
+            period INTEGER NOT NULL,
+            active_customers INTEGER NOT NULL,
+            PRIMARY KEY (cohort_week, period)
+        )
+        ''')
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cohort_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        ''')
+
+        # Range scans over one category at a time
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'logs'")
+        if cursor.fetchone():
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_logs_category_time ON logs (category, timestamp)"
+            )
+
+        self.conn.commit()
+
+    def _get_watermark(self, cursor):
+        """(stored watermark or None, week to start folding in from)"""
+        cursor.execute("SELECT value FROM cohort_state WHERE key = 'processed_until'")
+        row = cursor.fetchone()
+        if row:
+            return row[0], row[0]
+
+        # First run: start from the week of the earliest registration
+        cursor.execute(f'''
+        SELECT {WEEK_START_SQL.format('MIN(timestamp)')}
+        FROM logs
+        WHERE category = 'CUSTOMER' AND message = 'Customer registration'
+        ''')
+        row = cursor.fetchone()
+        return None, (row[0] if row else None)
+
+    def update(self, now=None):
+        """
+        Fold every closed week since the last update into the cohort tables.
+
+        Logs are scanned on this thread's read connection; the write lock is
+        only held to store the results.
+        """
+        now = now or datetime.now()
+        current_week = (now - timedelta(days=now.weekday())).date().isoformat()
+
+        cursor = self.db.reader().cursor()
+        stored, start = self._get_watermark(cursor)
+        if start is None or start >= current_week:
+            return 0
+
+        # New cohort members registered in the closed weeks (idempotent, so
+        # they can be stored ahead of the activity below)
+        cursor.execute(f'''
+        SELECT customer_id, MIN(timestamp), {WEEK_START_SQL.format('MIN(timestamp)')}
+        FROM logs
+        WHERE category = 'CUSTOMER' AND message = 'Customer registration'
+          AND timestamp >= ? AND timestamp < ?
+          AND customer_id IS NOT NULL AND customer_id != ''
+        GROUP BY customer_id
+        ''', (start, current_week))
+        members = cursor.fetchall()
+        with self.db.write() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO cohort_members (customer_id, registered_at, cohort_week) VALUES (?, ?, ?)",
+                members
+            )
+
+        # Returning customers per (cohort, activity week). Activity weeks never
+        # span two updates, so distinct counts can simply be added.
+        placeholders = ", ".join("?" for _ in RETURN_CATEGORIES)
+        cursor.execute(f'''
+        SELECT m.cohort_week,
+               CAST((julianday({WEEK_START_SQL.format('l.timestamp')}) - julianday(m.cohort_week)) / 7
+                    AS INTEGER) AS period,
+               COUNT(DISTINCT l.customer_id)
+        FROM logs l
+        JOIN cohort_members m ON m.customer_id = l.customer_id
+        WHERE l.category IN ({placeholders})
+          AND l.timestamp >= ? AND l.timestamp < ?
+          AND l.timestamp > m.registered_at
+        GROUP BY m.cohort_week, period
+        ''', (*RETURN_CATEGORIES, start, current_week))
+        activity = cursor.fetchall()
+
+        # First return for members that hadn't come back yet
+        cursor.execute(f'''
+        SELECT l.customer_id, MIN(l.timestamp) AS first_at
+        FROM logs l
+        JOIN cohort_members m ON m.customer_id = l.customer_id
+        WHERE m.first_return_at IS NULL
+          AND l.category IN ({placeholders})
+          AND l.timestamp >= ? AND l.timestamp < ?
+          AND l.timestamp > m.registered_at
+        GROUP BY l.customer_id
+        ''', (*RETURN_CATEGORIES, start, current_week))
+        returns = cursor.fetchall()
+
+        with self.db.write() as conn:
+            row = conn.execute("SELECT value FROM cohort_state WHERE key = 'processed_until'").fetchone()
+            if (row[0] if row else None) != stored:
+                # Another update folded these weeks in meanwhile; adding them again would double count
+                return 0
+            conn.executemany('''
+            INSERT INTO cohort_activity (cohort_week, period, active_customers)
+            VALUES (?, ?, ?)
+            ON CONFLICT (cohort_week, period)
+            DO UPDATE SET active_customers = active_customers + excluded.active_customers
+            ''', activity)
+            conn.executemany('''
+            UPDATE cohort_members
+            SET first_return_at = ?, days_to_return = julianday(?) - julianday(registered_at)
+            WHERE customer_id = ? AND first_return_at IS NULL
+            ''', [(first_at, first_at, customer_id) for customer_id, first_at in returns])
+            conn.execute(
+                "INSERT OR REPLACE INTO cohort_state (key, value) VALUES ('processed_until', ?)",
+                (current_week,)
+            )
+
+        return (datetime.fromisoformat(current_week) - datetime.fromisoformat(start)).days // 7
+
+    def start_maintenance(self, interval=3600.0):
+        """
+        Background thread that runs update() every interval seconds, so pages
+        only read the cohort tables
+        """
+        if self._maintenance is not None:
+            return
+        self._maintenance_stop.clear()
+        self._maintenance = threading.Thread(target=self._maintenance_loop, args=(interval,),
+                                             name="cohort-maintenance", daemon=True)
+        self._maintenance.start()
+
+    def stop_maintenance(self):
+        if self._maintenance is None:
+            return
+        self._maintenance_stop.set()
+        self._maintenance.join()
+        self._maintenance = None
+
+    def _maintenance_loop(self, interval):
+        while True:
+            try:
+                self.update()
+            except sqlite3.Error as e:
+                print(f"Error updating cohorts: {e}")
+            if self._maintenance_stop.wait(interval):
+                break
+
+    @serialized
+    def rebuild(self, now=None):
+        """Drop all cohort state and recompute from the full log history"""
+        cursor = self.conn.cursor()
+        cursor.execute("DELETE FROM cohort_members")
+        cursor.execute("DELETE FROM cohort_activity")
+        cursor.execute("DELETE FROM cohort_state")
+        self.conn.commit()
+        return self.update(now)
+
+    def cohort_sizes(self):
+        query = """
+        SELECT cohort_week, COUNT(*) AS cohort_size
+        FROM cohort_members
+        GROUP BY cohort_week
+        ORDER BY cohort_week
+        """
+        return pd.read_sql_query(query, self.db.reader())
+
+    def retention_matrix(self, as_rate=True):
+        """Cohort week x weeks-since-registration matrix of returning customers"""
+        query = """
+        SELECT a.cohort_week, a.period, a.active_customers, s.cohort_size
+        FROM cohort_activity a
+        JOIN (
+            SELECT cohort_week, COUNT(*) AS cohort_size
+            FROM cohort_members
+            GROUP BY cohort_week
+        ) s ON s.cohort_week = a.cohort_week
+        """
+        df = pd.read_sql_query(query, self.db.reader())
+        if df.empty:
+            return pd.DataFrame()
+
+        values = 'active_customers'
+        if as_rate:
+            df['retention_rate'] = (df['active_customers'] / df['cohort_size']).round(4)
+            values = 'retention_rate'
+
+        matrix = df.pivot(index='cohort_week', columns='period', values=values).sort_index()
+        return matrix.fillna(0)
+
+    def retention_within(self, windows=(30, 60, 90)):
+        """Share of each cohort that returned for service/sales within N days of registering"""
+        columns = ",\n".join(
+            f"SUM(days_to_return <= {int(days)}) AS retained_{int(days)}d"
+            for days in windows
+        )
+        query = f"""
+        SELECT cohort_week, COUNT(*) AS cohort_size,
+        {columns}
+        FROM cohort_members
+        GROUP BY cohort_week
+        ORDER BY cohort_week
+        """
+        df = pd.read_sql_query(query, self.db.reader())
+        for days in windows:
+            df[f'retention_{int(days)}d'] = (df[f'retained_{int(days)}d'] / df['cohort_size']).round(4)
+        return df
+
+    def close(self):
+        """Stop background updates and release this thread's read connection"""
+        self.stop_maintenance()
+        self.db.release()
@@ -0,0 +1,158 @@
+import functools
+import os
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_DB_PATH = "logs/crm.db"
+
+# Applied to every connection. WAL lets readers and the writer proceed
+# concurrently; journal_mode is persistent, the rest are per connection.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def configure_connection(conn):
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class _Reader:
+    """A thread's read connection; closed by a finalizer once the thread's locals are dropped"""
+
+    __slots__ = ("conn", "hooks", "close", "__weakref__")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.hooks = set()
+        self.close = None
+
+
+class ConnectionManager:
+    """
+    Shared SQLite connections for one database file.
+
+    Each thread gets its own read connection from reader(), closed when the
+    thread exits; all writes go through the single writer() connection,
+    serialised by write_lock (or the write() context manager, which also
+    commits or rolls back).
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.write_lock = threading.RLock()
+        # Reentrant: a reader finalizer may run while this thread holds it
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._readers = []
+        self._reader_hooks = []
+        self._writer = None
+
+    def connect(self, check_same_thread=True):
+        """A new connection with the standard pragmas, owned by the caller"""
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=check_same_thread)
+        return configure_connection(conn)
+
+    def add_reader_hook(self, hook):
+        """
+        Run hook(conn) once on every read connection, e.g. to register
+        functions or TEMP views. A hook that returns False had nothing to
+        attach yet and is run again on the connection's next reader() call.
+        """
+        with self._lock:
+            if hook not in self._reader_hooks:
+                self._reader_hooks.append(hook)
+
+    def reader(self):
+        """This thread's read connection"""
+        reader = getattr(self._local, "reader", None)
+        if reader is None:
+            # Only used from this thread; check_same_thread=False lets close() run elsewhere
+            reader = self._local.reader = _Reader(self.connect(check_same_thread=False))
+            with self._lock:
+                self._readers.append(reader.conn)
+            # Threads come and go (Streamlit runs each rerun on a new one); the
+            # thread's locals are dropped when it exits, which closes its connection
+            reader.close = weakref.finalize(reader, self._discard, reader.conn)
+        if len(reader.hooks) < len(self._reader_hooks):
+            for hook in list(self._reader_hooks):
+                if hook not in reader.hooks and hook(reader.conn) is not False:
+                    reader.hooks.add(hook)
+        return reader.conn
+
+    def _discard(self, conn):
+        with self._lock:
+            if conn in self._readers:
+                self._readers.remove(conn)
+        conn.close()
+
+    def writer(self):
+        """The shared write connection; hold write_lock around each transaction"""
+        with self._lock:
+            if self._writer is None:
+                self._writer = self.connect(check_same_thread=False)
+            return self._writer
+
+    @contextmanager
+    def write(self):
+        """Exclusive use of the writer for one transaction"""
+        with self.write_lock:
+            conn = self.writer()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def release(self):
+        """Close this thread's read connection (the next reader() call opens a new one)"""
+        reader = getattr(self._local, "reader", None)
+        if reader is not None:
+            self._local.reader = None
+            reader.close()
+
+    def close(self):
+        """Close every connection handed out by this manager"""
+        with self._lock:
+            readers, self._readers = self._readers, []
+            writer, self._writer = self._writer, None
+        for conn in readers:
+            conn.close()
+        if writer is not None:
+            with self.write_lock:
+                writer.close()
+        # Threads holding a closed reader open a fresh one on next use
+        self._local = threading.local()
+
+
+def get_manager(db_path=DEFAULT_DB_PATH):
+    """The process-wide ConnectionManager for a database file"""
+    key = os.path.abspath(db_path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = ConnectionManager(db_path)
+        return manager
+
+
+def serialized(method):
+    """Run a method that uses self.db.writer() under the manager's write lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.db.write_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
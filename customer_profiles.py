@@ -0,0 +1,314 @@
+import json
+from datetime import datetime
+
+from sales_funnel import parse_sales_stage, stage_name
+
+# Contact fields taken from the newest registration / profile update that carries them
+CONTACT_FIELDS = ('name', 'email', 'phone', 'address', 'preferences')
+
+# Columns stored as JSON text
+JSON_FIELDS = ('preferences', 'vehicles', 'category_counts', 'satisfaction_trend')
+
+PROFILE_COLUMNS = (
+    'customer_id', 'name', 'email', 'phone', 'address', 'preferences', 'contact_updated_at',
+    'registered_at', 'first_seen', 'stage', 'vehicles', 'category_counts', 'event_count',
+    'service_count', 'services_completed', 'last_service_at', 'last_service_type',
+    'satisfaction_sum', 'satisfaction_count', 'satisfaction_trend',
+    'last_interaction', 'last_category', 'last_message', 'last_log_id'
+)
+
+# Service satisfaction scores kept in the trend (newest by timestamp)
+TREND_LENGTH = 10
+
+# Vehicles kept on the profile (most recently seen), so a profile row stays small
+MAX_VEHICLES = 20
+
+
+def ensure_customer_profiles_table(conn):
+    """Create the customer_profiles table if it doesn't exist"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS customer_profiles (
+        customer_id TEXT PRIMARY KEY,
+        name TEXT,
+        email TEXT,
+        phone TEXT,
+        address TEXT,
+        preferences TEXT,
+        contact_updated_at TEXT,
+        registered_at TEXT,
+        first_seen TEXT,
+        stage INTEGER NOT NULL DEFAULT 0,
+        vehicles TEXT,
+        category_counts TEXT,
+        event_count INTEGER NOT NULL DEFAULT 0,
+        service_count INTEGER NOT NULL DEFAULT 0,
+        services_completed INTEGER NOT NULL DEFAULT 0,
+        last_service_at TEXT,
+        last_service_type TEXT,
+        satisfaction_sum REAL NOT NULL DEFAULT 0,
+        satisfaction_count INTEGER NOT NULL DEFAULT 0,
+        satisfaction_trend TEXT,
+        last_interaction TEXT,
+        last_category TEXT,
+        last_message TEXT,
+        last_log_id INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    # Profiles changed since a given log id (incremental consumers such as the similarity index)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_customer_profiles_log ON customer_profiles (last_log_id)"
+    )
+    # Every logs row at or below last_log_id has been folded in (contiguous, unlike
+    # MAX(customer_profiles.last_log_id)); seeded from the profiles on first use
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS customer_profile_state (
+        key TEXT PRIMARY KEY,
+        value INTEGER
+    )
+    ''')
+    cursor.execute('''
+    INSERT OR IGNORE INTO customer_profile_state (key, value)
+    SELECT 'last_log_id', COALESCE(MAX(last_log_id), 0) FROM customer_profiles
+    ''')
+    conn.commit()
+
+
+def _new_profile(customer_id):
+    profile = dict.fromkeys(PROFILE_COLUMNS)
+    profile.update({
+        'customer_id': customer_id, 'stage': 0, 'vehicles': {}, 'category_counts': {},
+        'event_count': 0, 'service_count': 0, 'services_completed': 0,
+        'satisfaction_sum': 0.0, 'satisfaction_count': 0, 'satisfaction_trend': [], 'last_log_id': 0
+    })
+    return profile
+
+
+def _decode(row):
+    profile = dict(zip(PROFILE_COLUMNS, row))
+    for field in JSON_FIELDS:
+        if profile[field] is not None:
+            profile[field] = json.loads(profile[field])
+    profile['vehicles'] = profile['vehicles'] or {}
+    profile['category_counts'] = profile['category_counts'] or {}
+    profile['satisfaction_trend'] = profile['satisfaction_trend'] or []
+    return profile
+
+
+def _encode(profile):
+    return tuple(
+        json.dumps(profile[column]) if column in JSON_FIELDS and profile[column] is not None
+        else profile[column]
+        for column in PROFILE_COLUMNS
+    )
+
+
+def _details(details):
+    if isinstance(details, str):
+        try:
+            details = json.loads(details)
+        except (json.JSONDecodeError, TypeError):
+            return {}
+    return details if isinstance(details, dict) else {}
+
+
+def _apply(profile, log_id, timestamp, category, message, vehicle_id, details):
+    """Fold one log row into a profile; rows at or below last_log_id were already applied"""
+    if log_id <= profile['last_log_id']:
+        return
+    profile['last_log_id'] = log_id
+    details = _details(details)
+    timestamp = timestamp or ''
+    message = message or ''
+
+    profile['event_count'] += 1
+    counts = profile['category_counts']
+    counts[category] = counts.get(category, 0) + 1
+    if profile['first_seen'] is None or timestamp < profile['first_seen']:
+        profile['first_seen'] = timestamp
+    if profile['last_interaction'] is None or timestamp >= profile['last_interaction']:
+        profile['last_interaction'] = timestamp
+        profile['last_category'] = category
+        profile['last_message'] = message
+
+    if category == 'CUSTOMER':
+        if 'registration' in message and (profile['registered_at'] is None or timestamp < profile['registered_at']):
+            profile['registered_at'] = timestamp
+        contact = {field: details[field] for field in CONTACT_FIELDS if details.get(field) is not None}
+        if contact and (profile['contact_updated_at'] is None or timestamp >= profile['contact_updated_at']):
+            profile.update(contact)
+            profile['contact_updated_at'] = timestamp
+    elif category == 'SALES':
+        profile['stage'] = max(profile['stage'], parse_sales_stage(message))
+    elif category == 'SERVICE':
+        profile['service_count'] += 1
+        if 'COMPLETED' in message:
+            profile['services_completed'] += 1
+            if profile['last_service_at'] is None or timestamp >= profile['last_service_at']:
+                profile['last_service_at'] = timestamp
+                profile['last_service_type'] = details.get('service_type')
+        score = details.get('satisfaction_score')
+        if isinstance(score, (int, float)) and not isinstance(score, bool):
+            profile['satisfaction_sum'] += score
+            profile['satisfaction_count'] += 1
+            trend = profile['satisfaction_trend'] + [[timestamp, score]]
+            trend.sort(key=lambda point: point[0])
+            profile['satisfaction_trend'] = trend[-TREND_LENGTH:]
+
+    if vehicle_id:
+        vehicles = profile['vehicles']
+        model = details.get('model') or vehicles.pop(vehicle_id, None)
+        vehicles.pop(vehicle_id, None)
+        vehicles[vehicle_id] = model
+        while len(vehicles) > MAX_VEHICLES:
+            del vehicles[next(iter(vehicles))]
+
+
+def load_profiles(cursor, customer_ids):
+    """{customer_id: profile} for the given customers that have one"""
+    profiles = {}
+    customer_ids = list(customer_ids)
+    for start in range(0, len(customer_ids), 500):
+        chunk = customer_ids[start:start + 500]
+        cursor.execute(
+            f"SELECT {', '.join(PROFILE_COLUMNS)} FROM customer_profiles "
+            f"WHERE customer_id IN ({', '.join('?' for _ in chunk)})",
+            chunk
+        )
+        for row in cursor.fetchall():
+            profiles[row[0]] = _decode(row)
+    return profiles
+
+
+def _update_profiles(cursor, rows):
+    """rows: (id, timestamp, category, message, customer_id, vehicle_id, details), in id order"""
+    rows = [row for row in rows if row[4]]
+    if not rows:
+        return 0
+    profiles = load_profiles(cursor, {row[4] for row in rows})
+    for log_id, timestamp, category, message, customer_id, vehicle_id, details in rows:
+        profile = profiles.get(customer_id)
+        if profile is None:
+            profile = profiles[customer_id] = _new_profile(customer_id)
+        _apply(profile, log_id, timestamp, category, message, vehicle_id, details)
+    cursor.executemany(
+        f"INSERT OR REPLACE INTO customer_profiles ({', '.join(PROFILE_COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in PROFILE_COLUMNS)})",
+        [_encode(profile) for profile in profiles.values()]
+    )
+    return len(profiles)
+
+
+def sync_customer_profiles(cursor, batch_size=50000):
+    """Fold customer rows added to logs since the watermark into their profiles"""
+    cursor.execute("SELECT value FROM customer_profile_state WHERE key = 'last_log_id'")
+    row = cursor.fetchone()
+    last_id = row[0] if row else 0
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM logs")
+    max_id = cursor.fetchone()[0]
+    if max_id <= last_id:
+        return 0
+
+    applied = 0
+    while True:
+        cursor.execute('''
+        SELECT id, timestamp, category, message, customer_id, vehicle_id, details
+        FROM logs
+        WHERE id > ? AND id <= ? AND customer_id IS NOT NULL
+        ORDER BY id
+        LIMIT ?
+        ''', (last_id, max_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        _update_profiles(cursor, rows)
+        applied += len(rows)
+        last_id = rows[-1][0]
+    cursor.execute(
+        "INSERT OR REPLACE INTO customer_profile_state (key, value) VALUES ('last_log_id', ?)",
+        (max_id,)
+    )
+    return applied
+
+
+class CustomerProfileRecorder:
+    """Ingest listener that folds each customer's rows into their profile as they are written"""
+
+    def setup(self, conn):
+        ensure_customer_profiles_table(conn)
+
+    def on_logs(self, cursor, rows):
+        # Reads from the watermark rather than `rows`, so rows loaded with
+        # listeners=() since the last sync are folded in first
+        sync_customer_profiles(cursor)
+
+
+def backfill_customer_profiles(conn, batch_size=50000):
+    """Fold customer rows added to `logs` since the watermark into their profiles"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'logs'")
+    if not cursor.fetchone():
+        return 0
+
+    applied = sync_customer_profiles(cursor, batch_size)
+    conn.commit()
+    return applied
+
+
+def get_customer_profile(conn, customer_id):
+    """A customer's profile by primary key (None if they have no events)"""
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT {', '.join(PROFILE_COLUMNS)} FROM customer_profiles WHERE customer_id = ?",
+        (customer_id,)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    profile = _decode(row)
+    profile['stage_name'] = stage_name(profile['stage'])
+    profile['avg_satisfaction'] = (
+        profile['satisfaction_sum'] / profile['satisfaction_count'] if profile['satisfaction_count'] else None
+    )
+    return profile
+
+
+def _days_since(timestamp, now):
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is not None:
+        # structlog stamps UTC ("...Z"); compare in local time like the naive stamps
+        moment = moment.astimezone().replace(tzinfo=None)
+    return (now - moment).days
+
+
+def profile_features(profile, now=None):
+    """Purchase-model features for a profile, in the order the model was trained on"""
+    now = now or datetime.now()
+    features = {}
+
+    # Activity recency (days since last interaction)
+    features['days_since_last_interaction'] = _days_since(profile['last_interaction'], now)
+
+    # Interaction counts by category
+    category_counts = profile['category_counts']
+    for category in ['CUSTOMER', 'SALES', 'SERVICE', 'ESG']:
+        features[f'{category.lower()}_interaction_count'] = category_counts.get(category, 0)
+
+    # Sales funnel progression (highest stage reached, parsed at ingest)
+    features['sales_funnel_stage'] = profile['stage']
+
+    # Service history
+    features['service_count'] = profile['service_count']
+
+    # Average satisfaction score from service events
+    features['avg_satisfaction'] = (
+        profile['satisfaction_sum'] / profile['satisfaction_count'] if profile['satisfaction_count'] else 3.0
+    )
+
+    # Time since registration
+    if profile['registered_at']:
+        features['days_since_registration'] = _days_since(profile['registered_at'], now)
+    else:
+        features['days_since_registration'] = 0
+
+    return features
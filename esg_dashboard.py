@@ -3,7 +3,8 @@ import numpy as np
 import plotly.graph_objects as go
 from keras.models import load_model  # or tensorflow.keras.models if consistent
 
-# Load the ESG model
+# Load the ESG model once per process
+@st.cache_resource
 def load_esg_model():
     try:
         model = load_model("esg_model.h5")
@@ -83,11 +84,13 @@ def create_bar_chart(prediction):
 
 
 # Main function to show ESG dashboard
-def show_esg_dashboard():
+def show_esg_dashboard(model=None):
     st.title("🌍 ESG Risk Assessment Dashboard")
     st.markdown("Analyze ESG parameters and get recommendations to improve your **sustainability score**.")
 
-    model = load_esg_model()
+    # app.py passes the model its background warm-up loaded
+    if model is None:
+        model = load_esg_model()
     if model is None:
         return
 
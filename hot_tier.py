@@ -0,0 +1,178 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# Columns mirrored from `logs` (id included, so rows keep their disk identity)
+HOT_COLUMNS = (
+    'id', 'timestamp', 'level', 'category', 'message', 'customer_id',
+    'vehicle_id', 'operation_id', 'user_id', 'details'
+)
+
+
+class HotLogTier:
+    """
+    In-memory SQLite mirror of the most recent `hours` of logs.
+
+    The mirror has a `logs` table with the same columns as the disk table, so
+    LogAnalyzer runs its queries against it unchanged whenever the requested
+    range starts inside the tier (see covers()). Rows arrive through the
+    ingest listener protocol and through refresh(), which copies rows added
+    to disk since its id watermark (writes from other processes included).
+
+    When the mirror outgrows max_memory_mb the oldest rows are evicted and the
+    covered range shrinks accordingly, so queries fall back to disk instead of
+    returning partial results.
+    """
+
+    def __init__(self, hours=24, max_memory_mb=256, refresh_interval=1.0):
+        self.hours = hours
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.refresh_interval = refresh_interval
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._lock = threading.RLock()
+        self._last_id = 0
+        self._last_refresh = 0.0
+        # Oldest timestamp for which the mirror holds every row
+        self._horizon = None
+
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        CREATE TABLE logs (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT,
+            level TEXT,
+            category TEXT,
+            message TEXT,
+            customer_id TEXT,
+            vehicle_id TEXT,
+            operation_id TEXT,
+            user_id TEXT,
+            details TEXT
+        )
+        ''')
+        cursor.execute("CREATE INDEX idx_hot_time ON logs (timestamp, category)")
+        cursor.execute("CREATE INDEX idx_hot_category_time ON logs (category, timestamp)")
+        cursor.execute("CREATE INDEX idx_hot_customer_time ON logs (customer_id, timestamp)")
+        self.conn.commit()
+
+    def _cutoff(self):
+        return (datetime.now() - timedelta(hours=self.hours)).isoformat()
+
+    def _insert(self, rows):
+        cutoff = max(self._cutoff(), self._horizon or '')
+        recent = [row for row in rows if (row[1] or '') >= cutoff]
+        self.conn.executemany(
+            f"INSERT OR IGNORE INTO logs ({', '.join(HOT_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in HOT_COLUMNS)})",
+            recent
+        )
+
+    def load(self, disk_conn):
+        """Fill the mirror from disk; rows older than `hours` are skipped"""
+        cutoff = self._cutoff()
+        cursor = disk_conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM main.logs")
+        last_id = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT {', '.join(HOT_COLUMNS)} FROM main.logs WHERE timestamp >= ? AND id <= ?",
+            (cutoff, last_id)
+        )
+        with self._lock:
+            self.conn.execute("DELETE FROM logs")
+            self._horizon = None
+            while True:
+                rows = cursor.fetchmany(50000)
+                if not rows:
+                    break
+                self._insert(rows)
+            self.conn.commit()
+            self._last_id = last_id
+            self._horizon = cutoff
+            self._last_refresh = time.monotonic()
+            self._enforce_budget()
+
+    def refresh(self, disk_conn, force=False):
+        """Copy rows written to disk since the watermark; throttled to refresh_interval"""
+        if self._horizon is None:
+            return self.load(disk_conn)
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return
+        with self._lock:
+            cursor = disk_conn.cursor()
+            cursor.execute(
+                f"SELECT {', '.join(HOT_COLUMNS)} FROM main.logs WHERE id > ? ORDER BY id",
+                (self._last_id,)
+            )
+            rows = cursor.fetchall()
+            if rows:
+                self._insert(rows)
+                self._last_id = rows[-1][0]
+            self._last_refresh = now
+            self._evict()
+
+    # Ingest listener protocol (DatabaseLogHandler / ingest_events)
+    def setup(self, conn):
+        pass
+
+    def on_logs(self, cursor, rows):
+        # Doesn't move the refresh watermark: rows from other writers may still be missing
+        with self._lock:
+            self._insert([tuple(row.get(column) for column in HOT_COLUMNS) for row in rows])
+            self.conn.commit()
+
+    def _evict(self):
+        cutoff = self._cutoff()
+        self.conn.execute("DELETE FROM logs WHERE timestamp < ?", (cutoff,))
+        self.conn.commit()
+        self._horizon = max(self._horizon, cutoff)
+        self._enforce_budget()
+
+    def memory_bytes(self):
+        cursor = self.conn.cursor()
+        cursor.execute("PRAGMA page_size")
+        page_size = cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_count")
+        pages = cursor.fetchone()[0]
+        cursor.execute("PRAGMA freelist_count")
+        return (pages - cursor.fetchone()[0]) * page_size
+
+    def _enforce_budget(self):
+        """Drop the oldest tenth of the mirror until it fits the memory budget"""
+        while self.memory_bytes() > self.max_memory_bytes:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM logs")
+            count = cursor.fetchone()[0]
+            if not count:
+                break
+            cursor.execute(
+                "SELECT timestamp FROM logs ORDER BY timestamp LIMIT 1 OFFSET ?",
+                (max(count // 10, 1),)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute("DELETE FROM logs")
+            else:
+                cursor.execute("DELETE FROM logs WHERE timestamp <= ?", (row[0],))
+            # Everything newer than the evicted rows is still complete
+            cursor.execute("SELECT MIN(timestamp) FROM logs")
+            self._horizon = cursor.fetchone()[0] or datetime.now().isoformat()
+            self.conn.commit()
+
+    def covers(self, since):
+        """Whether every row with timestamp >= since is in the mirror"""
+        return self._horizon is not None and since >= self._horizon
+
+    def query(self, query, params=()):
+        with self._lock:
+            cursor = self.conn.execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+
+    def stats(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+            return {"rows": rows, "memory_bytes": self.memory_bytes(), "horizon": self._horizon}
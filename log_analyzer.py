@@ -1,57 +1,291 @@
 import pandas as pd
 import json
-import sqlite3
+import time
 from datetime import datetime, timedelta
+from sales_funnel import ensure_sales_stage_table, backfill_sales_stage_events, stage_name, FINAL_STAGE
+from sketches import DistinctSketchStore, SKETCH_FIELDS, ensure_heavy_hitter_table
+from log_compression import attach_compact_reader
+from connection_manager import get_manager
+from hot_tier import HotLogTier
+from log_query import LogQuery
+from log_search import ensure_search_index, fts_match_expression
+from customer_profiles import ensure_customer_profiles_table, backfill_customer_profiles, get_customer_profile
+from lead_scoring import ensure_lead_scores_table
+
+# strftime formats used to bucket events into reporting periods
+PERIOD_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%Y-W%W",
+    "month": "%Y-%m"
+}
 
 class LogAnalyzer:
-    def __init__(self, db_path="logs/crm.db"):
-        self.conn = sqlite3.connect(db_path)
+    def __init__(self, db_path="logs/crm.db", cache_ttl=300, hot_hours=24, hot_memory_mb=256):
+        self.db = get_manager(db_path)
+        self.cache_ttl = cache_ttl
+        self._cache = {}
+        # Recent rows mirrored in memory; hot_hours=0 disables it
+        self.hot_tier = HotLogTier(hot_hours, hot_memory_mb) if hot_hours else None
+        # Read compacted rows transparently through `logs`
+        self.db.add_reader_hook(attach_compact_reader)
+        self.sketches = DistinctSketchStore()
+        with self.db.write() as conn:
+            ensure_sales_stage_table(conn)
+            backfill_sales_stage_events(conn)
+            self.sketches.setup(conn)
+            self.sketches.refresh(conn)
+            ensure_heavy_hitter_table(conn)
+            ensure_search_index(conn)
+            ensure_customer_profiles_table(conn)
+            backfill_customer_profiles(conn)
+            ensure_lead_scores_table(conn)
+
+    @property
+    def conn(self):
+        # Queries run on the calling thread's read connection
+        return self.db.reader()
+
+    def _cached(self, key, compute):
+        """Return a cached result for key, recomputing it once cache_ttl has passed"""
+        now = time.monotonic()
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1].copy()
+        result = compute()
+        self._cache[key] = (now + self.cache_ttl, result)
+        return result.copy()
+
+    def _read_logs(self, query, params, since=None, limit=None):
+        """
+        Run a query over `logs` on the hot tier when it holds every matching
+        row, otherwise on disk. `since` is the query's lower timestamp bound;
+        `limit` marks newest-first LIMIT queries, which the tier can answer
+        whenever it has at least that many matches.
+        """
+        if self.hot_tier is not None:
+            self.hot_tier.refresh(self.conn)
+            if since is not None and self.hot_tier.covers(since):
+                return self.hot_tier.query(query, params)
+            if limit is not None:
+                df = self.hot_tier.query(query, params)
+                if len(df) >= limit:
+                    return df
+        return pd.read_sql_query(query, self.conn, params=params)
+
+    def query(self, log_query, debug=False):
+        """Run a LogQuery; debug=True prints the SQL, parameters and query plan first"""
+        sql, params = log_query.compile()
+        if debug:
+            print(f"SQL: {sql}")
+            print(f"Params: {params}")
+            for step in log_query.explain(self.conn):
+                print(f"Plan: {step}")
+        return self._read_logs(sql, params, since=log_query.lower_bound, limit=log_query.newest_first_limit)
+
+    def search(self, query, filters=None, limit=50):
+        """
+        Ranked full-text search over log messages and details (best match
+        first). `filters` is an optional LogQuery whose conditions (category,
+        customer, time range, ...) narrow the matches.
+        """
+        match = fts_match_expression(query)
+        if not match:
+            return pd.DataFrame()
+        clauses, params = filters.where_sql() if filters is not None else ([], ())
+        conditions = "".join(f" AND {clause}" for clause in clauses)
+        sql = f"""
+        SELECT logs.*,
+               snippet(logs_fts, -1, '[', ']', '...', 12) AS snippet,
+               bm25(logs_fts, 2.0, 1.0) AS score
+        FROM logs_fts
+        JOIN logs ON logs.id = logs_fts.rowid
+        WHERE logs_fts MATCH ?{conditions}
+        ORDER BY score
+        LIMIT ?
+        """
+        return pd.read_sql_query(sql, self.conn, params=(match, *params, limit))
+
+    def clear_cache(self):
+        self._cache.clear()
         
     def get_logs_by_category(self, category, limit=100):
-        query = "SELECT * FROM logs WHERE category = ? ORDER BY timestamp DESC LIMIT ?"
-        return pd.read_sql_query(query, self.conn, params=(category, limit))
+        return self.query(LogQuery().category(category).limit(limit))
     
     def get_logs_by_customer(self, customer_id, limit=100):
-        query = "SELECT * FROM logs WHERE customer_id = ? ORDER BY timestamp DESC LIMIT ?"
-        return pd.read_sql_query(query, self.conn, params=(customer_id, limit))
+        return self.query(LogQuery().customer(customer_id).limit(limit))
     
     def get_logs_by_timeframe(self, hours=24):
-        since = (datetime.now() - timedelta(hours=hours)).isoformat()
-        query = "SELECT * FROM logs WHERE timestamp >= ? ORDER BY timestamp DESC"
-        return pd.read_sql_query(query, self.conn, params=(since,))
+        return self.query(LogQuery().last(hours=hours))
+    
+    def get_customer_profile(self, customer_id):
+        """Materialized Customer 360 profile (one primary-key read), or None"""
+        return get_customer_profile(self.conn, customer_id)
     
     def get_customer_journey(self, customer_id):
-        query = """
-        SELECT timestamp, category, message, details
-        FROM logs 
-        WHERE customer_id = ? 
-        ORDER BY timestamp ASC
-        """
-        df = pd.read_sql_query(query, self.conn, params=(customer_id,))
-        return df
+        return self.query(
+            LogQuery().customer(customer_id)
+            .select('timestamp', 'category', 'message', 'details')
+            .order_by('timestamp')
+        )
     
     def get_esg_actions(self):
-        query = "SELECT * FROM logs WHERE category = 'ESG' ORDER BY timestamp DESC"
-        return pd.read_sql_query(query, self.conn)
+        return self.query(LogQuery().category('ESG'))
     
     def get_service_events(self, days=30):
+        return self.query(LogQuery().category('SERVICE').last(days=days))
+    
+    def get_sales_funnel_metrics(self, days=30):
         since = (datetime.now() - timedelta(days=days)).isoformat()
         query = """
-        SELECT * FROM logs 
-        WHERE category = 'SERVICE' AND timestamp >= ?
-        ORDER BY timestamp DESC
+        SELECT stage, COUNT(*) as count
+        FROM sales_stage_events
+        WHERE timestamp >= ?
+        GROUP BY stage
+        ORDER BY stage
         """
-        return pd.read_sql_query(query, self.conn, params=(since,))
+        df = pd.read_sql_query(query, self.conn, params=(since,))
+        df.insert(1, 'stage_name', df['stage'].map(stage_name))
+        return df
     
-    def get_sales_funnel_metrics(self, days=30):
-        since = (datetime.now() - timedelta(days=days)).isoformat()
+    def get_funnel_conversion(self, days=30, period="week", by_model=True):
+        """
+        Stage-to-stage funnel analytics computed in a single query.
+
+        For every period (when the stage was reached), vehicle model and stage:
+        customers entering the stage, how many reached the next stage (stage + 1),
+        drop-offs, conversion rate and median / p90 hours until they reached it.
+        """
+        if period not in PERIOD_FORMATS:
+            raise ValueError(f"period must be one of {list(PERIOD_FORMATS)}")
+
+        def compute():
+            since = (datetime.now() - timedelta(days=days)).isoformat()
+            model_expr = "COALESCE(m.model, 'Unknown')" if by_model else "'All models'"
+            query = f"""
+            WITH reached AS (
+                SELECT customer_id, stage, MIN(timestamp) AS reached_at
+                FROM sales_stage_events
+                WHERE timestamp >= ? AND customer_id IS NOT NULL AND customer_id != ''
+                GROUP BY customer_id, stage
+            ),
+            journey_model AS (
+                SELECT customer_id, model FROM (
+                    SELECT customer_id, model,
+                           ROW_NUMBER() OVER (PARTITION BY customer_id ORDER BY timestamp) AS rn
+                    FROM sales_stage_events
+                    WHERE timestamp >= ?
+                ) WHERE rn = 1
+            ),
+            steps AS (
+                -- Conversion is to the immediately following stage; time to it only
+                -- counts when it was reached after this one
+                SELECT strftime(?, r.reached_at) AS period,
+                       {model_expr} AS model,
+                       r.stage,
+                       nxt.customer_id IS NOT NULL AS converted,
+                       CASE WHEN nxt.reached_at >= r.reached_at
+                            THEN (julianday(nxt.reached_at) - julianday(r.reached_at)) * 24.0
+                       END AS hours_to_next
+                FROM reached r
+                LEFT JOIN reached nxt ON nxt.customer_id = r.customer_id AND nxt.stage = r.stage + 1
+                LEFT JOIN journey_model m ON m.customer_id = r.customer_id
+            ),
+            ranked AS (
+                SELECT period, model, stage, converted, hours_to_next,
+                       ROW_NUMBER() OVER g AS rn,
+                       COUNT(hours_to_next) OVER (PARTITION BY period, model, stage) AS n_timed
+                FROM steps
+                WHERE stage < ?
+                WINDOW g AS (PARTITION BY period, model, stage
+                             ORDER BY hours_to_next IS NULL, hours_to_next)
+            )
+            SELECT period, model, stage,
+                   COUNT(*) AS entered,
+                   SUM(converted) AS converted,
+                   COUNT(*) - SUM(converted) AS dropped_off,
+                   ROUND(CAST(SUM(converted) AS REAL) / COUNT(*), 4) AS conversion_rate,
+                   MAX(CASE WHEN rn = (n_timed * 50 + 99) / 100 THEN hours_to_next END)
+                       AS median_hours_to_next,
+                   MAX(CASE WHEN rn = (n_timed * 90 + 99) / 100 THEN hours_to_next END)
+                       AS p90_hours_to_next
+            FROM ranked
+            GROUP BY period, model, stage
+            ORDER BY period, model, stage
+            """
+            df = pd.read_sql_query(
+                query, self.conn,
+                params=(since, since, PERIOD_FORMATS[period], FINAL_STAGE)
+            )
+            df.insert(3, 'stage_name', df['stage'].map(stage_name))
+            df.insert(4, 'next_stage_name', (df['stage'] + 1).map(stage_name))
+            return df
+
+        return self._cached(("funnel_conversion", days, period, by_model), compute)
+    
+    def count_distinct(self, field="customer_id", days=None, category=None):
+        """Exact number of distinct values of field over the last `days` days (None = all time)"""
+        if field not in SKETCH_FIELDS:
+            raise ValueError(f"field must be one of {SKETCH_FIELDS}")
+
+        query = f"SELECT COUNT(DISTINCT {field}) FROM logs WHERE {field} IS NOT NULL AND {field} != ''"
+        params = []
+        if days is not None:
+            query += " AND timestamp >= ?"
+            params.append((datetime.now() - timedelta(days=days)).isoformat())
+        if category:
+            query += " AND category = ?"
+            params.append(category)
+
+        cursor = self.conn.cursor()
+        cursor.execute(query, params)
+        return cursor.fetchone()[0]
+
+    def approx_count_distinct(self, field="customer_id", days=None, category=None, max_error=0.02):
+        """
+        Approximate distinct count from merged per-day HyperLogLog sketches.
+
+        Whole days are merged, so the window starts at midnight `days` days ago.
+        Falls back to the exact count when the stored sketches cannot meet the
+        requested standard error.
+        """
+        if field not in SKETCH_FIELDS:
+            raise ValueError(f"field must be one of {SKETCH_FIELDS}")
+        if self.sketches.standard_error > max_error:
+            return self.count_distinct(field, days, category)
+
+        since_day = None
+        if days is not None:
+            since_day = (datetime.now() - timedelta(days=days)).date().isoformat()
+        return self.sketches.merged(self.conn.cursor(), field, since_day, category).count()
+    
+    def get_heavy_hitters(self, window_minutes=60, limit=10):
+        """Most frequent SYSTEM (message, component, level) tuples from the latest tracker snapshots"""
+        # One snapshot per tracker, each over the rows it saw; a key's window count is
+        # the sum over trackers whose snapshot is still within the window
+        since = (datetime.now() - timedelta(minutes=window_minutes)).isoformat()
         query = """
-        SELECT message, COUNT(*) as count
-        FROM logs 
-        WHERE category = 'SALES' AND timestamp >= ?
-        GROUP BY message
+        SELECT message, component, level, SUM(count) AS count, MAX(updated_at) AS updated_at
+        FROM heavy_hitters
+        WHERE window_minutes = ? AND updated_at >= ?
+        GROUP BY message, component, level
+        ORDER BY count DESC
+        LIMIT ?
         """
-        return pd.read_sql_query(query, self.conn, params=(since,))
+        hitters = pd.read_sql_query(query, self.conn, params=(window_minutes, since, limit))
+        hitters.insert(0, 'rank', range(1, len(hitters) + 1))
+        return hitters
+    
+    def get_top_leads(self, limit=20):
+        """Live lead ranking maintained on ingest by LeadScorer"""
+        query = """
+        SELECT customer_id, score, priority, stage, scored_at
+        FROM lead_scores
+        ORDER BY score DESC
+        LIMIT ?
+        """
+        leads = pd.read_sql_query(query, self.conn, params=(limit,))
+        leads['stage'] = leads['stage'].map(stage_name)
+        return leads
     
     def get_log_volume_by_day(self, days=30):
         since = (datetime.now() - timedelta(days=days)).isoformat()
@@ -62,14 +296,7 @@ class LogAnalyzer:
         GROUP BY day, category
         ORDER BY day
         """
-        return pd.read_sql_query(query, self.conn, params=(since,))
+        return self._read_logs(query, (since,), since=since)
     
     def get_inventory_logs(self, days=30):
-
-        since = (datetime.now() - timedelta(days=days)).isoformat()
-        query = """
-        SELECT * FROM logs 
-        WHERE category = 'INVENTORY' AND timestamp >= ?
-        ORDER BY timestamp DESC
-        """
-        return pd.read_sql_query(query, self.conn, params=(since,))
+        return self.query(LogQuery().category('INVENTORY').last(days=days))
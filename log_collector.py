@@ -0,0 +1,214 @@
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+from connection_manager import get_manager
+from logging_system import COLLECTOR_ADDRESS, default_ingest_listeners, ingest_events
+
+# Marks the end of the event stream for the writer thread
+_STOP = object()
+
+
+class _EventStreamHandler(socketserver.StreamRequestHandler):
+    """Reads newline-delimited JSON events from one producer connection"""
+
+    def handle(self):
+        collector = self.server.collector
+        collector._track(self.request, True)
+        try:
+            for line in self.rfile:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"Error decoding log event: {e}")
+                    continue
+                if isinstance(event, dict):
+                    # Blocks while the queue is full, so this producer's socket
+                    # buffer fills and its sends block in turn
+                    collector.queue.put(event)
+        finally:
+            collector._track(self.request, False)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LogCollector:
+    """
+    Single-writer log ingestion service.
+
+    Producer processes connect with logging_system.CollectorLogHandler and
+    stream JSON events; a bounded queue feeds one writer thread that owns the
+    only SQLite write connection and inserts in batches via ingest_events(),
+    so producers never contend for the database lock.
+    """
+
+    def __init__(self, db_path="logs/crm.db", address=COLLECTOR_ADDRESS, queue_size=100000,
+                 batch_size=5000, flush_interval=0.2, listeners=None):
+        self.db_path = db_path
+        self.address = address
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.listeners = default_ingest_listeners() if listeners is None else list(listeners)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = {"received": 0, "accepted": 0, "duplicates": 0, "dropped": 0, "batches": 0}
+        self.server = None
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+        self._writer = None
+        self._stopped = False
+        self._shutdown_lock = threading.Lock()
+
+    def _track(self, sock, active):
+        with self._connections_lock:
+            if active:
+                self._connections.add(sock)
+            else:
+                self._connections.discard(sock)
+
+    def start(self):
+        """Bind the socket and start the writer thread; call serve_forever() to accept producers"""
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(self.address, tuple):
+            self.server = _TCPServer(self.address, _EventStreamHandler)
+        else:
+            Path(self.address).parent.mkdir(parents=True, exist_ok=True)
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+            self.server = _UnixServer(self.address, _EventStreamHandler)
+        self.server.collector = self
+
+        self._writer = threading.Thread(target=self._write_loop, name="log-collector-writer")
+        self._writer.start()
+
+    def serve_forever(self):
+        if self.server is None:
+            self.start()
+        self.server.serve_forever()
+
+    def _next_batch(self):
+        """Up to batch_size events, waiting at most flush_interval after the first"""
+        batch = []
+        event = self.queue.get()
+        deadline = time.monotonic() + self.flush_interval
+        while event is not _STOP:
+            batch.append(event)
+            if len(batch) >= self.batch_size:
+                return batch, False
+            try:
+                event = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def _write_loop(self):
+        conn = get_manager(self.db_path).connect()
+        try:
+            done = False
+            while not done:
+                batch, done = self._next_batch()
+                if not batch:
+                    continue
+                try:
+                    result = ingest_events(conn, batch, batch_size=self.batch_size, listeners=self.listeners)
+                except Exception as e:
+                    # Any error (a bad event tripping a listener, a locked database) must not
+                    # kill the only writer: producers would block on the full queue forever
+                    conn.rollback()
+                    print(f"Error writing {len(batch)} log events, retrying one at a time: {e}")
+                    result = self._write_each(conn, batch)
+                self.stats["received"] += len(batch)
+                self.stats["accepted"] += result["accepted"]
+                self.stats["duplicates"] += result["duplicates"]
+                self.stats["dropped"] += result.get("dropped", 0)
+                self.stats["batches"] += 1
+        finally:
+            conn.close()
+
+    def _write_each(self, conn, batch):
+        """Write a failed batch event by event, dropping only the events that still fail"""
+        result = {"accepted": 0, "duplicates": 0, "dropped": 0}
+        for event in batch:
+            try:
+                written = ingest_events(conn, [event], listeners=self.listeners)
+                result["accepted"] += written["accepted"]
+                result["duplicates"] += written["duplicates"]
+            except Exception as e:
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    pass
+                result["dropped"] += 1
+                print(f"Dropped log event {event.get('operation_id')}: {e}")
+        return result
+
+    def shutdown(self):
+        """
+        Stop accepting producers, read what connected producers already sent,
+        flush everything queued to the database and remove the socket file.
+        Must not be called from the thread running serve_forever().
+        """
+        # A second caller waits here until the first shutdown has finished
+        with self._shutdown_lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            if self.server is not None:
+                self.server.shutdown()
+                self.server.server_close()
+
+            # Half-close open connections: handlers see EOF after the buffered data
+            with self._connections_lock:
+                connections = list(self._connections)
+            for sock in connections:
+                try:
+                    sock.shutdown(socket.SHUT_RD)
+                except OSError:
+                    pass
+            deadline = time.monotonic() + 10
+            while self._connections and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            if self._writer is not None:
+                self.queue.put(_STOP)
+                self._writer.join()
+            if not isinstance(self.address, tuple) and os.path.exists(self.address):
+                os.unlink(self.address)
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "logs/crm.db"
+    collector = LogCollector(db_path)
+    collector.start()
+
+    def stop(signum, frame):
+        # serve_forever() runs in this thread, so shut down from another one
+        threading.Thread(target=collector.shutdown).start()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    print(f"Log collector writing to {db_path}, listening on {collector.address}")
+    collector.serve_forever()
+    collector.shutdown()
+    print(f"Log collector stopped: {collector.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+import json
+import sqlite3
+import uuid
+import zlib
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:  # zlib preset dictionaries are used instead
+    zstandard = None
+
+WILDCARD = "<*>"
+
+# Columns encoded in logs_compact; everything else is stored as-is
+ENCODED_COLUMNS = ('message', 'details', 'operation_id')
+
+
+def _has_digit(token):
+    return any(char.isdigit() for char in token)
+
+
+class TemplateMiner:
+    """
+    Drain-style log template miner.
+
+    Messages are split on single spaces and grouped by token count and first
+    token. Within a group a message joins the most similar template when the
+    share of matching constant tokens reaches similarity_threshold; differing
+    positions become wildcards. Templates are never edited in place: a
+    generalised template is a new template, so rows encoded earlier still
+    decode against the template they were written with.
+    """
+
+    def __init__(self, similarity_threshold=0.5):
+        self.similarity_threshold = similarity_threshold
+        self._groups = {}
+
+    def _group_key(self, tokens):
+        first = tokens[0]
+        return (len(tokens), WILDCARD if _has_digit(first) else first)
+
+    def load(self, templates):
+        """Seed the miner with previously persisted template strings"""
+        for template in templates:
+            tokens = template.split(" ")
+            self._groups.setdefault(self._group_key(tokens), []).append(tokens)
+
+    def match(self, message):
+        """Return (template, params) for a message, or (None, None) if it can't be templated"""
+        if message is None or WILDCARD in message:
+            return None, None
+
+        tokens = message.split(" ")
+        group = self._groups.setdefault(self._group_key(tokens), [])
+
+        best_index, best_similarity = None, -1.0
+        for index, template in enumerate(group):
+            matches = sum(1 for t, token in zip(template, tokens) if t != WILDCARD and t == token)
+            similarity = matches / len(tokens)
+            if similarity > best_similarity:
+                best_index, best_similarity = index, similarity
+
+        if best_index is not None and best_similarity >= self.similarity_threshold:
+            template = [t if t == token else WILDCARD for t, token in zip(group[best_index], tokens)]
+            group[best_index] = template
+        else:
+            template = [WILDCARD if _has_digit(token) else token for token in tokens]
+            group.append(template)
+
+        params = [token for t, token in zip(template, tokens) if t == WILDCARD]
+        return " ".join(template), params
+
+
+def render_template(template, params):
+    """Rebuild the original message from a template and its parameters"""
+    parts = template.split(WILDCARD)
+    return parts[0] + "".join(param + part for param, part in zip(params, parts[1:]))
+
+
+class DetailsCodec:
+    """Dictionary compression for the `details` JSON column (zstd, or zlib with a preset dictionary)"""
+
+    def __init__(self, codec, dictionary):
+        self.codec = codec
+        self.dictionary = dictionary
+        if codec in ("zstd", "zstd-raw"):
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd-compressed logs")
+            dict_type = zstandard.DICT_TYPE_RAWCONTENT if codec == "zstd-raw" else zstandard.DICT_TYPE_AUTO
+            dict_data = zstandard.ZstdCompressionDict(dictionary, dict_type=dict_type)
+            # Rows are tiny, so drop the per-frame magic number and dictionary id
+            # (the dictionary id is stored in front of every value instead)
+            params = zstandard.ZstdCompressionParameters.from_level(
+                3, format=zstandard.FORMAT_ZSTD1_MAGICLESS, write_dict_id=0, write_content_size=1
+            )
+            self._compressor = zstandard.ZstdCompressor(dict_data=dict_data, compression_params=params)
+            self._decompressor = zstandard.ZstdDecompressor(
+                dict_data=dict_data, format=zstandard.FORMAT_ZSTD1_MAGICLESS
+            )
+
+    @classmethod
+    def train(cls, samples, dict_size=16384):
+        samples = [sample.encode() for sample in samples if sample]
+        if zstandard is not None:
+            try:
+                return cls("zstd", zstandard.train_dictionary(dict_size, samples).as_bytes())
+            except zstandard.ZstdError:
+                # Too few samples to train on; prime with raw sample content instead
+                return cls("zstd-raw", b"".join(samples)[-dict_size:])
+        # zlib only uses the last 32KB of a preset dictionary
+        return cls("zlib", b"".join(samples)[-32768:])
+
+    def compress(self, text):
+        if text is None:
+            return None
+        if self.codec == "zlib":
+            compressor = zlib.compressobj(level=6, zdict=self.dictionary)
+            return compressor.compress(text.encode()) + compressor.flush()
+        return self._compressor.compress(text.encode())
+
+    def decompress(self, blob):
+        if blob is None:
+            return None
+        if self.codec == "zlib":
+            decompressor = zlib.decompressobj(zdict=self.dictionary)
+            return (decompressor.decompress(blob) + decompressor.flush()).decode()
+        return self._decompressor.decompress(blob).decode()
+
+
+def _log_column_types(conn):
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA main.table_info(logs)")
+    return [(row[1], row[2]) for row in cursor.fetchall()]
+
+
+def _log_columns(conn):
+    return [column for column, _ in _log_column_types(conn)]
+
+
+# Encoded values are BLOBs, plain ones TEXT, so a row's storage tier never
+# needs an extra column. That keeps both arms of the `logs` union view plain
+# column references, which lets SQLite merge them in index order and decode
+# only the rows a query actually returns.
+PARAM_SEPARATOR = "\x1f"
+
+
+def encode_message(template_id, params, message):
+    if message is None:
+        return None
+    if template_id is None or any(PARAM_SEPARATOR in param for param in params):
+        return f"0{PARAM_SEPARATOR}{message}".encode()
+    return PARAM_SEPARATOR.join([str(template_id), *params]).encode()
+
+
+def encode_details(codec, dict_id, details):
+    if details is None:
+        return None
+    return dict_id.to_bytes(2, "big") + codec.compress(details)
+
+
+def encode_operation_id(operation_id):
+    """Canonical UUID strings are stored as their 16 raw bytes"""
+    try:
+        packed = uuid.UUID(operation_id)
+    except (ValueError, TypeError, AttributeError):
+        return operation_id
+    return packed.bytes if str(packed) == operation_id else operation_id
+
+
+# Lets ingest drop retries of events whose rows were already compacted
+COMPACT_OPERATION_ID_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_logs_compact_operation_id ON logs_compact (operation_id) "
+    "WHERE operation_id IS NOT NULL AND operation_id != ''"
+)
+
+
+def compacted_operation_ids(cursor, operation_ids):
+    """The subset of operation_ids whose rows have been moved to logs_compact"""
+    cursor.execute("SELECT name FROM main.sqlite_master WHERE type = 'table' AND name = 'logs_compact'")
+    if not cursor.fetchone():
+        return set()
+    encoded = {encode_operation_id(operation_id): operation_id for operation_id in operation_ids if operation_id}
+    keys = list(encoded)
+    found = set()
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        cursor.execute(
+            f"SELECT operation_id FROM main.logs_compact WHERE operation_id IN ({', '.join('?' for _ in chunk)})",
+            chunk
+        )
+        found.update(encoded[value] for value, in cursor.fetchall())
+    return found
+
+
+def ensure_compact_tables(conn):
+    """Create the compressed log storage tables; logs_compact mirrors the columns of `logs`"""
+    cursor = conn.cursor()
+    # Same declared types as `logs` (TEXT columns hold encoded BLOBs unchanged);
+    # matching affinities are required for SQLite to flatten the union view
+    columns = [f"{column} {column_type}".strip() for column, column_type in _log_column_types(conn)
+               if column != 'id']
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS logs_compact (
+        id INTEGER PRIMARY KEY,
+        {", ".join(columns)}
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS log_templates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        template TEXT UNIQUE NOT NULL
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS compression_dictionaries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        codec TEXT NOT NULL,
+        dictionary BLOB NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    ''')
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_logs_compact_category_time ON logs_compact (category, timestamp)"
+    )
+    cursor.execute(COMPACT_OPERATION_ID_INDEX_SQL)
+    conn.commit()
+
+
+def train_details_dictionary(conn, sample_size=20000, dict_size=16384):
+    """Train a details dictionary on a sample of rows and store it as the current one"""
+    ensure_compact_tables(conn)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT details FROM main.logs WHERE details IS NOT NULL ORDER BY id DESC LIMIT ?",
+        (sample_size,)
+    )
+    codec = DetailsCodec.train([row[0] for row in cursor.fetchall()], dict_size)
+    cursor.execute(
+        "INSERT INTO compression_dictionaries (codec, dictionary, created_at) VALUES (?, ?, ?)",
+        (codec.codec, codec.dictionary, datetime.now().isoformat())
+    )
+    conn.commit()
+    return cursor.lastrowid, codec
+
+
+def _load_codecs(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, codec, dictionary FROM compression_dictionaries")
+    return {dict_id: DetailsCodec(codec, dictionary) for dict_id, codec, dictionary in cursor.fetchall()}
+
+
+# Derived tables synced from main.logs by contiguous id watermarks; their
+# catch-up scans don't see logs_compact, so rows past any of them must stay put
+LISTENER_STATE_TABLES = (
+    'sales_stage_state', 'distinct_sketch_state', 'search_index_state', 'customer_profile_state'
+)
+
+
+def _listener_watermark(cursor):
+    """Highest log id every existing derived table has processed, or None if there are none"""
+    watermark = None
+    for table in LISTENER_STATE_TABLES:
+        cursor.execute("SELECT name FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        if not cursor.fetchone():
+            continue
+        cursor.execute(f"SELECT value FROM main.{table} WHERE key = 'last_log_id'")
+        row = cursor.fetchone()
+        last_id = int(row[0]) if row and row[0] is not None else 0
+        watermark = last_id if watermark is None else min(watermark, last_id)
+    return watermark
+
+
+def compact_logs(conn, before=None, categories=None, batch_size=20000):
+    """
+    Move rows older than `before` from `logs` into `logs_compact`.
+
+    Messages become a template id plus parameters, details are compressed
+    with the latest trained dictionary (one is trained first if none exists)
+    and UUID operation ids are packed to 16 bytes.
+    Row ids are preserved, so derived tables keyed on log id stay valid.
+    Only rows every ingest listener's watermark has passed are moved.
+    Returns the number of rows moved.
+    """
+    ensure_compact_tables(conn)
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id FROM compression_dictionaries ORDER BY id DESC LIMIT 1")
+    row = cursor.fetchone()
+    if row:
+        dict_id = row[0]
+        codec = _load_codecs(conn)[dict_id]
+    else:
+        dict_id, codec = train_details_dictionary(conn)
+
+    cursor.execute("SELECT id, template FROM log_templates")
+    template_ids = {template: template_id for template_id, template in cursor.fetchall()}
+    miner = TemplateMiner()
+    miner.load(template_ids)
+
+    columns = _log_columns(conn)
+    message_index = columns.index('message')
+    details_index = columns.index('details')
+    operation_index = columns.index('operation_id')
+
+    where = ["id > ?"]
+    params = []
+    if before is not None:
+        where.append("timestamp < ?")
+        params.append(before.isoformat() if isinstance(before, datetime) else before)
+    if categories:
+        where.append(f"category IN ({', '.join('?' for _ in categories)})")
+        params.extend(categories)
+    watermark = _listener_watermark(cursor)
+    if watermark is not None:
+        where.append("id <= ?")
+        params.append(watermark)
+
+    select = f'''
+    SELECT {", ".join(columns)} FROM main.logs
+    WHERE {" AND ".join(where)}
+    ORDER BY id
+    LIMIT ?
+    '''
+    insert = f'''
+    INSERT INTO logs_compact ({", ".join(columns)})
+    VALUES ({", ".join("?" for _ in columns)})
+    '''
+
+    moved = 0
+    last_id = 0
+    while True:
+        cursor.execute(select, (last_id, *params, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        encoded = []
+        for row in rows:
+            row = list(row)
+            message = row[message_index]
+            template, message_params = miner.match(message)
+            template_id = None
+            if template is not None:
+                template_id = template_ids.get(template)
+                if template_id is None:
+                    cursor.execute("INSERT INTO log_templates (template) VALUES (?)", (template,))
+                    template_id = template_ids[template] = cursor.lastrowid
+            row[message_index] = encode_message(template_id, message_params, message)
+            row[details_index] = encode_details(codec, dict_id, row[details_index])
+            row[operation_index] = encode_operation_id(row[operation_index])
+            encoded.append(row)
+
+        cursor.executemany(insert, encoded)
+        last_id = rows[-1][0]
+        cursor.execute(
+            f"DELETE FROM main.logs WHERE id IN ({', '.join('?' for _ in rows)})",
+            [row[0] for row in rows]
+        )
+        conn.commit()
+        moved += len(rows)
+
+    return moved
+
+
+def attach_compact_reader(conn):
+    """
+    Make compacted rows readable through `logs` on this connection.
+
+    Registers decode functions and TEMP views; the one named `logs` shadows
+    main.logs for unqualified names, so every existing query sees plain and
+    compacted rows alike with message and details decoded. Returns False
+    when no compacted storage exists yet, so ConnectionManager runs it again
+    on the next reader() call. Writers must keep using their own connections
+    (or `main.logs` explicitly).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM main.sqlite_master WHERE type = 'table' AND name = 'logs_compact'")
+    if not cursor.fetchone():
+        return False
+
+    templates = {}
+    codecs = {}
+
+    def decode_message(value):
+        if not isinstance(value, bytes):
+            return value
+        template_id, *params = value.decode().split(PARAM_SEPARATOR)
+        template_id = int(template_id)
+        if template_id == 0:
+            return PARAM_SEPARATOR.join(params)
+        template = templates.get(template_id)
+        if template is None:
+            lookup = conn.cursor()
+            lookup.execute("SELECT id, template FROM log_templates")
+            templates.update(lookup.fetchall())
+            template = templates[template_id]
+        return render_template(template, params)
+
+    def decode_details(value):
+        if not isinstance(value, bytes):
+            return value
+        dict_id = int.from_bytes(value[:2], "big")
+        codec = codecs.get(dict_id)
+        if codec is None:
+            codecs.update(_load_codecs(conn))
+            codec = codecs[dict_id]
+        return codec.decompress(value[2:])
+
+    def decode_operation_id(value):
+        return str(uuid.UUID(bytes=value)) if isinstance(value, bytes) else value
+
+    conn.create_function("decode_message", 1, decode_message, deterministic=True)
+    conn.create_function("decode_details", 1, decode_details, deterministic=True)
+    conn.create_function("decode_operation_id", 1, decode_operation_id, deterministic=True)
+
+    columns = _log_columns(conn)
+    decoded = [
+        f"decode_{column}({column}) AS {column}" if column in ENCODED_COLUMNS else column
+        for column in columns
+    ]
+
+    cursor.execute("DROP VIEW IF EXISTS temp.logs")
+    cursor.execute("DROP VIEW IF EXISTS temp.logs_all_tiers")
+    cursor.execute(f'''
+    CREATE TEMP VIEW logs_all_tiers AS
+    SELECT {", ".join(columns)} FROM main.logs
+    UNION ALL
+    SELECT {", ".join(columns)} FROM main.logs_compact
+    ''')
+    cursor.execute(f'''
+    CREATE TEMP VIEW logs AS
+    SELECT {", ".join(decoded)} FROM logs_all_tiers
+    ''')
+    return True
+
+
+def storage_stats(conn):
+    """Row counts and on-disk page usage for plain and compacted log storage"""
+    cursor = conn.cursor()
+    stats = {}
+    for table in ("logs", "logs_compact"):
+        try:
+            cursor.execute(f"SELECT COUNT(*) FROM main.{table}")
+            stats[f"{table}_rows"] = cursor.fetchone()[0]
+        except sqlite3.OperationalError:
+            stats[f"{table}_rows"] = 0
+    cursor.execute("PRAGMA page_count")
+    page_count = cursor.fetchone()[0]
+    cursor.execute("PRAGMA page_size")
+    stats["database_bytes"] = page_count * cursor.fetchone()[0]
+    return stats
+
+
+if __name__ == "__main__":
+    import sys
+    from datetime import timedelta
+    from connection_manager import get_manager
+
+    # python log_compression.py [days]: compact rows older than `days` (default 30)
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    conn = get_manager("logs/crm.db").connect()
+    before_stats = storage_stats(conn)
+    moved = compact_logs(conn, before=datetime.now() - timedelta(days=days))
+    conn.execute("VACUUM")
+    after_stats = storage_stats(conn)
+    print(f"Compacted {moved} rows older than {days} days")
+    print(f"Database size: {before_stats['database_bytes']:,} -> {after_stats['database_bytes']:,} bytes")
+    conn.close()
@@ -0,0 +1,203 @@
+import re
+from datetime import datetime, timedelta
+
+# Columns of `logs` that can be selected, filtered and sorted on
+LOG_FIELDS = (
+    'id', 'timestamp', 'level', 'category', 'message', 'customer_id',
+    'vehicle_id', 'operation_id', 'user_id', 'details'
+)
+
+# Comparison operators accepted by where() and detail()
+OPERATORS = ('=', '!=', '<', '<=', '>', '>=', 'LIKE', 'IN', 'NOT IN', 'IS NULL', 'IS NOT NULL')
+
+# details.<key>[.<key>...] addresses a value inside the JSON details column
+_DETAIL_PATH = re.compile(r'^details((?:\.[A-Za-z_][A-Za-z0-9_]*)+)$')
+
+
+def _field_sql(field):
+    """SQL expression and result column name for a field or details.<path> reference"""
+    if field in LOG_FIELDS:
+        return field, field
+    match = _DETAIL_PATH.match(field)
+    if match:
+        path = match.group(1)
+        return f"json_extract(details, '${path}')", path.rsplit('.', 1)[-1]
+    raise ValueError(f"Unknown log field: {field}")
+
+
+def _timestamp(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+class LogQuery:
+    """
+    Composable query over `logs` that compiles to one parameterised statement.
+
+    Every builder method returns a new LogQuery, so partial queries can be
+    shared and extended:
+
+        recent_service = LogQuery().category('SERVICE').last(days=30)
+        oil_changes = (recent_service.detail('service_type', '=', 'Oil Change')
+                       .select('timestamp', 'customer_id', 'details.satisfaction_score')
+                       .limit(50))
+
+    Rows come back newest first unless order_by() says otherwise.
+    """
+
+    def __init__(self):
+        self._columns = []
+        self._filters = []
+        self._since = None
+        self._until = None
+        self._order = []
+        self._limit = None
+
+    def _copy(self):
+        query = LogQuery()
+        query._columns = list(self._columns)
+        query._filters = list(self._filters)
+        query._since = self._since
+        query._until = self._until
+        query._order = list(self._order)
+        query._limit = self._limit
+        return query
+
+    def select(self, *fields):
+        """Project fields (or details.<path> values); the default is every column"""
+        query = self._copy()
+        for field in fields:
+            _field_sql(field)
+            query._columns.append(field)
+        return query
+
+    def where(self, field, op, value=None):
+        op = op.upper()
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {op}")
+        expression, _ = _field_sql(field)
+        query = self._copy()
+        if op in ('IS NULL', 'IS NOT NULL'):
+            query._filters.append((f"{expression} {op}", ()))
+        elif op in ('IN', 'NOT IN'):
+            values = tuple(value)
+            if not values:
+                # Empty IN matches nothing; empty NOT IN matches everything
+                query._filters.append(("0" if op == 'IN' else "1", ()))
+            else:
+                query._filters.append((f"{expression} {op} ({', '.join('?' for _ in values)})", values))
+        else:
+            query._filters.append((f"{expression} {op} ?", (value,)))
+        return query
+
+    def category(self, *categories):
+        if len(categories) == 1:
+            return self.where('category', '=', categories[0])
+        return self.where('category', 'IN', categories)
+
+    def customer(self, customer_id):
+        return self.where('customer_id', '=', customer_id)
+
+    def vehicle(self, vehicle_id):
+        return self.where('vehicle_id', '=', vehicle_id)
+
+    def level(self, *levels):
+        # Levels are stored in both cases ('info' from structlog, 'INFO' from generators)
+        query = self._copy()
+        values = tuple(level.upper() for level in levels)
+        query._filters.append((f"UPPER(level) IN ({', '.join('?' for _ in values)})", values))
+        return query
+
+    def detail(self, key, op, value=None):
+        """Filter on a value inside the JSON details column, e.g. detail('model', '=', 'SUV Pro')"""
+        return self.where(f"details.{key}", op, value)
+
+    def since(self, start):
+        query = self._copy()
+        start = _timestamp(start)
+        query._since = start if query._since is None else max(query._since, start)
+        return query
+
+    def until(self, end):
+        """Exclusive upper bound on timestamp"""
+        query = self._copy()
+        end = _timestamp(end)
+        query._until = end if query._until is None else min(query._until, end)
+        return query
+
+    def last(self, hours=0, days=0):
+        return self.since(datetime.now() - timedelta(hours=hours, days=days))
+
+    def order_by(self, field, descending=False):
+        expression, _ = _field_sql(field)
+        query = self._copy()
+        query._order.append((expression, descending))
+        return query
+
+    def limit(self, n):
+        query = self._copy()
+        query._limit = int(n)
+        return query
+
+    @property
+    def lower_bound(self):
+        """Earliest timestamp the query can match (None when unbounded)"""
+        return self._since
+
+    @property
+    def newest_first_limit(self):
+        """The LIMIT when rows are ordered newest first, else None"""
+        if self._limit is not None and self._order_terms()[0] == ('timestamp', True):
+            return self._limit
+        return None
+
+    def _order_terms(self):
+        return self._order or [('timestamp', True)]
+
+    def where_sql(self):
+        """(WHERE conditions, params) on unqualified logs columns, for embedding in other statements"""
+        clauses = []
+        params = []
+        if self._since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(self._since)
+        if self._until is not None:
+            clauses.append("timestamp < ?")
+            params.append(self._until)
+        for clause, values in self._filters:
+            clauses.append(clause)
+            params.extend(values)
+        return clauses, tuple(params)
+
+    def compile(self):
+        """(sql, params) for the whole query"""
+        if self._columns:
+            projection = []
+            for field in self._columns:
+                expression, name = _field_sql(field)
+                projection.append(expression if expression == name else f"{expression} AS {name}")
+        else:
+            projection = ['*']
+
+        clauses, params = self.where_sql()
+        params = list(params)
+
+        sql = f"SELECT {', '.join(projection)} FROM logs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY " + ", ".join(
+            f"{expression} {'DESC' if descending else 'ASC'}" for expression, descending in self._order_terms()
+        )
+        if self._limit is not None:
+            sql += " LIMIT ?"
+            params.append(self._limit)
+        return sql, tuple(params)
+
+    def explain(self, conn):
+        """SQLite's query plan for this query, one step per line"""
+        sql, params = self.compile()
+        cursor = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[3] for row in cursor.fetchall()]
+
+    def __repr__(self):
+        sql, params = self.compile()
+        return f"LogQuery({sql!r}, {params!r})"
@@ -0,0 +1,92 @@
+import re
+
+# details flattened to "key value key value ..." text (array items as bare values)
+FLATTEN_DETAILS_SQL = '''
+CASE WHEN json_valid({0}) THEN (
+    SELECT group_concat(CASE WHEN typeof(key) = 'text' THEN key || ' ' || atom ELSE atom END, ' ')
+    FROM json_tree({0})
+    WHERE atom IS NOT NULL
+) ELSE {0} END
+'''
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def ensure_search_index(conn):
+    """
+    Create the FTS5 index over log messages and flattened details and index
+    any rows it hasn't seen yet. Entries are keyed by log id; searches join
+    back to `logs`, so deleted rows drop out of results and compacted rows
+    stay searchable.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM main.sqlite_master WHERE type = 'table' AND name = 'logs'")
+    if not cursor.fetchone():
+        return 0
+
+    cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS main.logs_fts USING fts5(
+        message_text,
+        details_text,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS main.search_index_state (
+        key TEXT PRIMARY KEY,
+        value INTEGER
+    )
+    ''')
+    indexed = sync_search_index(cursor)
+    conn.commit()
+    return indexed
+
+
+def sync_search_index(cursor):
+    """Index rows added to logs since the watermark, in one statement"""
+    cursor.execute("SELECT value FROM main.search_index_state WHERE key = 'last_log_id'")
+    row = cursor.fetchone()
+    last_id = row[0] if row else 0
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM main.logs")
+    max_id = cursor.fetchone()[0]
+    if max_id <= last_id:
+        return 0
+
+    cursor.execute(f'''
+    INSERT INTO main.logs_fts (rowid, message_text, details_text)
+    SELECT id, message, {FLATTEN_DETAILS_SQL.format('details')}
+    FROM main.logs
+    WHERE id > ? AND id <= ?
+    ''', (last_id, max_id))
+    indexed = cursor.rowcount
+    cursor.execute(
+        "INSERT OR REPLACE INTO main.search_index_state (key, value) VALUES ('last_log_id', ?)",
+        (max_id,)
+    )
+    return indexed
+
+
+class SearchIndexer:
+    """Ingest listener that keeps logs_fts in step with every inserted batch"""
+
+    def setup(self, conn):
+        ensure_search_index(conn)
+
+    def on_logs(self, cursor, rows):
+        sync_search_index(cursor)
+
+
+def fts_match_expression(text):
+    """
+    Turn free text into an FTS5 query: every word or "quoted phrase" must
+    match, punctuation inside a term (phone numbers, needs_followup) becomes a
+    phrase, and a trailing * keeps prefix matching.
+    """
+    terms = []
+    for match in _TERM.finditer(text or ''):
+        term = match.group(1) if match.group(1) is not None else match.group(2)
+        prefix = match.group(1) is None and term.endswith('*')
+        term = term.rstrip('*').replace('"', '').strip()
+        if term:
+            terms.append(f'"{term}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
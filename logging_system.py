@@ -1,9 +1,20 @@
 import structlog
 import logging
+import contextlib
 import uuid
 import datetime
 import json
+import os
+import socket
+import sqlite3
+import threading
 from pathlib import Path
+from sales_funnel import SalesStageRecorder
+from sketches import DistinctSketchStore, HeavyHitterTracker
+from log_search import SearchIndexer
+from customer_profiles import CustomerProfileRecorder
+from lead_scoring import LeadScorer
+from log_compression import COMPACT_OPERATION_ID_INDEX_SQL, compacted_operation_ids
 
 # Ensure log directory exists
 log_dir = Path("logs")
@@ -106,52 +117,294 @@ def log_system_event(event_type, component=None, details=None):
         details=details
     )
 
+# Columns written for every log row, in insert order
+LOG_COLUMNS = (
+    'timestamp', 'level', 'category', 'message', 'customer_id',
+    'vehicle_id', 'operation_id', 'user_id', 'details'
+)
+
+# Retried writes carry the same operation_id and are dropped by the unique index
+INSERT_LOG_SQL = f'''
+INSERT INTO logs ({", ".join(LOG_COLUMNS)})
+VALUES ({", ".join("?" for _ in LOG_COLUMNS)})
+ON CONFLICT DO NOTHING
+'''
+
+def ensure_logs_table(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        level TEXT,
+        category TEXT,
+        message TEXT,
+        customer_id TEXT,
+        vehicle_id TEXT,
+        operation_id TEXT,
+        user_id TEXT,
+        details TEXT
+    )
+    ''')
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name = 'idx_logs_operation_id'")
+    if not cursor.fetchone():
+        # Databases written before the index may hold retried duplicates; keep the first copy
+        cursor.execute('''
+        DELETE FROM logs
+        WHERE operation_id IS NOT NULL AND operation_id != ''
+          AND id NOT IN (
+              SELECT MIN(id) FROM logs
+              WHERE operation_id IS NOT NULL AND operation_id != ''
+              GROUP BY operation_id
+          )
+        ''')
+        if cursor.rowcount:
+            print(f"Removed {cursor.rowcount} duplicate log rows before indexing operation_id")
+        cursor.execute('''
+        CREATE UNIQUE INDEX idx_logs_operation_id ON logs (operation_id)
+        WHERE operation_id IS NOT NULL AND operation_id != ''
+        ''')
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'logs_compact'")
+    if cursor.fetchone():
+        cursor.execute(COMPACT_OPERATION_ID_INDEX_SQL)
+    conn.commit()
+
+def default_ingest_listeners():
+    """Derived structures kept up to date as log rows are written"""
+    # LeadScorer reads the profiles CustomerProfileRecorder has just updated, so it comes after
+    return [SalesStageRecorder(), DistinctSketchStore(), HeavyHitterTracker(), SearchIndexer(),
+            CustomerProfileRecorder(), LeadScorer()]
+
+def _event_row(event):
+    """Normalise a bulk event dict (structlog-style 'event' or 'message') to LOG_COLUMNS order"""
+    details = event.get('details')
+    if details is not None and not isinstance(details, str):
+        details = json.dumps(details)
+    return (
+        event.get('timestamp') or datetime.datetime.now().isoformat(),
+        event.get('level', 'INFO'),
+        event.get('category', ''),
+        event.get('message', event.get('event', '')),
+        event.get('customer_id'),
+        event.get('vehicle_id'),
+        event.get('operation_id') or generate_operation_id(),
+        event.get('user_id'),
+        details
+    )
+
+def ingest_events(conn, events, batch_size=200000, listeners=None):
+    """
+    Idempotent bulk load of log events from an iterable of dicts.
+
+    Events are written in transactions of batch_size rows; an event whose
+    operation_id is already stored (e.g. a client retry) is skipped by the
+    unique index, or by a lookup in logs_compact once compact_logs has moved
+    the original. Ingest listeners (default: the same ones as
+    DatabaseLogHandler) see only the rows actually inserted, and those with
+    a flush(cursor) method are flushed at the end of every batch. Pass
+    listeners=() for raw loads and refresh derived tables afterwards.
+    """
+    listeners = default_ingest_listeners() if listeners is None else list(listeners)
+    ensure_logs_table(conn)
+    for listener in listeners:
+        listener.setup(conn)
+
+    cursor = conn.cursor()
+    accepted = 0
+    received = 0
+    batch = []
+    # Top-level 'component' (log_system_event) isn't a column; hand it to listeners by operation_id
+    components = {}
+
+    def flush(batch):
+        # Random UUIDs scatter unique-index writes; inserting in key order keeps them page-local
+        batch.sort(key=lambda values: values[6])
+        try:
+            # The unique index only covers main.logs; retries of compacted rows are dropped here
+            compacted = compacted_operation_ids(cursor, [values[6] for values in batch])
+            if compacted:
+                batch = [values for values in batch if values[6] not in compacted]
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM logs")
+            last_id = cursor.fetchone()[0]
+            cursor.executemany(INSERT_LOG_SQL, batch)
+            inserted = cursor.rowcount
+            if listeners and inserted:
+                # AUTOINCREMENT ids are increasing, so this transaction's rows are id > last_id
+                cursor.execute(f"SELECT id, {', '.join(LOG_COLUMNS)} FROM logs WHERE id > ? ORDER BY id", (last_id,))
+                rows = [dict(zip(('id',) + LOG_COLUMNS, values)) for values in cursor.fetchall()]
+                for row in rows:
+                    row['component'] = components.get(row['operation_id'])
+                for listener in listeners:
+                    listener.on_logs(cursor, rows)
+                for listener in listeners:
+                    if hasattr(listener, 'flush'):
+                        listener.flush(cursor)
+            conn.commit()
+        except Exception:
+            # Don't leave the batch and partial derived rows open for the next writer to commit
+            conn.rollback()
+            raise
+        components.clear()
+        return inserted
+
+    for event in events:
+        row = _event_row(event)
+        batch.append(row)
+        if event.get('component'):
+            components[row[6]] = event['component']
+        if len(batch) >= batch_size:
+            accepted += flush(batch)
+            received += len(batch)
+            batch = []
+    if batch:
+        accepted += flush(batch)
+        received += len(batch)
+
+    return {"accepted": accepted, "duplicates": received - accepted}
+
 # Database logging handler (for persistent storage)
 class DatabaseLogHandler(logging.Handler):
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, listeners=None, write_lock=None, flush_interval=10.0):
         super().__init__()
         self.conn = db_connection
+        # Held around each insert when the connection is shared with other writers
+        self.write_lock = write_lock or contextlib.nullcontext()
+        # Each listener gets setup(conn) once and on_logs(cursor, rows) for
+        # every batch of inserted rows, inside the same transaction. Listeners
+        # with a flush(cursor) method (HeavyHitterTracker) are flushed every
+        # flush_interval seconds, so state persists after a burst goes quiet
+        self.listeners = default_ingest_listeners() if listeners is None else list(listeners)
+        self.flush_interval = flush_interval
+        self._flusher = None
+        self._flush_stop = threading.Event()
         self._ensure_table_exists()
+        self._start_flusher()
         
     def _ensure_table_exists(self):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            level TEXT,
-            category TEXT,
-            message TEXT,
-            customer_id TEXT,
-            vehicle_id TEXT,
-            operation_id TEXT,
-            user_id TEXT,
-            details TEXT
-        )
-        ''')
-        self.conn.commit()
-        
+        ensure_logs_table(self.conn)
+        for listener in self.listeners:
+            listener.setup(self.conn)
+
+    def add_listener(self, listener):
+        listener.setup(self.conn)
+        self.listeners.append(listener)
+        self._start_flusher()
+
+    def _start_flusher(self):
+        if self._flusher is not None or not any(hasattr(listener, 'flush') for listener in self.listeners):
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name="log-listener-flush", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._flush_stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Let listeners with a flush(cursor) method persist their state"""
+        # Same lock order as emit(): handler lock, then the shared write lock
+        with self.lock, self.write_lock:
+            try:
+                cursor = self.conn.cursor()
+                for listener in self.listeners:
+                    if hasattr(listener, 'flush'):
+                        listener.flush(cursor)
+                self.conn.commit()
+            except Exception as e:
+                try:
+                    self.conn.rollback()
+                except sqlite3.Error:
+                    pass
+                print(f"Error flushing log listeners: {e}")
+
+    def close(self):
+        self._flush_stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        super().close()
+
     def emit(self, record):
         if hasattr(record, 'msg') and isinstance(record.msg, str):
             try:
                 log_data = json.loads(record.getMessage())
-                cursor = self.conn.cursor()
-                cursor.execute('''
-                INSERT INTO logs (
-                    timestamp, level, category, message, customer_id, 
-                    vehicle_id, operation_id, user_id, details
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    log_data.get('timestamp', datetime.datetime.now().isoformat()),
-                    log_data.get('level', ''),
-                    log_data.get('category', ''),
-                    log_data.get('event', ''),
-                    log_data.get('customer_id', ''),
-                    log_data.get('vehicle_id', ''),
-                    log_data.get('operation_id', ''),
-                    log_data.get('user_id', ''),
-                    json.dumps(log_data.get('details', {}))
-                ))
-                self.conn.commit()
+                row = {
+                    'timestamp': log_data.get('timestamp', datetime.datetime.now().isoformat()),
+                    'level': log_data.get('level', ''),
+                    'category': log_data.get('category', ''),
+                    'message': log_data.get('event', ''),
+                    'customer_id': log_data.get('customer_id', ''),
+                    'vehicle_id': log_data.get('vehicle_id', ''),
+                    'operation_id': log_data.get('operation_id', ''),
+                    'user_id': log_data.get('user_id', ''),
+                    'details': json.dumps(log_data.get('details', {})),
+                    # Not a logs column; passed through to listeners only
+                    'component': log_data.get('component')
+                }
+                with self.write_lock:
+                    try:
+                        cursor = self.conn.cursor()
+                        if compacted_operation_ids(cursor, [row['operation_id']]):
+                            return
+                        cursor.execute(INSERT_LOG_SQL, tuple(row[column] for column in LOG_COLUMNS))
+                        if cursor.rowcount:
+                            row['id'] = cursor.lastrowid
+                            for listener in self.listeners:
+                                listener.on_logs(cursor, [row])
+                        self.conn.commit()
+                    except Exception:
+                        # Don't leave the row and partial derived rows open on the shared
+                        # writer, for the next writer to commit
+                        self.conn.rollback()
+                        raise
             except (json.JSONDecodeError, Exception) as e:
-                print(f"Error processing log record: {e}")
\ No newline at end of file
+                print(f"Error processing log record: {e}")
+
+# Default collector address: a Unix socket where available, loopback TCP otherwise
+COLLECTOR_ADDRESS = str(log_dir / "collector.sock") if hasattr(socket, "AF_UNIX") else ("127.0.0.1", 9020)
+
+# Client handler for log_collector.py (for multi-process deployments)
+class CollectorLogHandler(logging.Handler):
+    """
+    Drop-in replacement for DatabaseLogHandler when several processes log to
+    the same database: records are streamed as JSON lines to the collector,
+    which is the only process that writes to SQLite. When the collector falls
+    behind, sends block rather than growing memory (backpressure).
+    """
+
+    def __init__(self, address=COLLECTOR_ADDRESS, timeout=10.0):
+        super().__init__()
+        self.address = address
+        self.timeout = timeout
+        self.sock = None
+        self._pid = None
+
+    def _connect(self):
+        family = socket.AF_INET if isinstance(self.address, tuple) else socket.AF_UNIX
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.address)
+        self.sock = sock
+        self._pid = os.getpid()
+
+    def emit(self, record):
+        try:
+            # A socket inherited across fork would interleave writes from two processes
+            if self.sock is None or self._pid != os.getpid():
+                self._connect()
+            self.sock.sendall(record.getMessage().replace("\n", " ").encode() + b"\n")
+        except OSError as e:
+            print(f"Error sending log record to collector: {e}")
+            self.close_socket()
+
+    def close_socket(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def close(self):
+        self.close_socket()
+        super().close()
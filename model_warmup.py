@@ -0,0 +1,99 @@
+import threading
+import time
+
+
+def warm_sentiment_scorer(scorer):
+    """Score one full (padded) batch, tracing the model at the batch shape it serves with"""
+    scorer.predict_proba([""])
+
+
+def load_keras_model(path):
+    from tensorflow.keras.models import load_model
+    return load_model(path)
+
+
+def warm_keras_model(model):
+    """Trace the predict function on zeros shaped like the model's input"""
+    import numpy as np
+    model.predict(np.zeros((1,) + tuple(model.input_shape[1:])), verbose=0)
+
+
+def load_pickle(path):
+    import joblib
+    return joblib.load(path)
+
+
+def warm_arima_model(model):
+    model.get_forecast(steps=6)
+
+
+class ModelWarmer:
+    """
+    Loads registered models on one background thread and reports readiness.
+
+    Each model is loaded, then warmed with a dummy inference, so TensorFlow
+    builds its predict graph before the first real request. Pages call get()
+    and render a "warming up" state while it returns None instead of
+    blocking; status() gives per-model state ("pending", "loading", "ready"
+    or "failed"), load time and error.
+    """
+
+    def __init__(self):
+        self._specs = []
+        self._models = {}
+        self._status = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, name, load, warm=None):
+        """Add a model: load() returns it, warm(model) runs a dummy inference"""
+        with self._lock:
+            self._specs.append((name, load, warm))
+            self._status[name] = {"state": "pending", "seconds": None, "error": None}
+
+    def start(self):
+        """Start loading in the background; returns at once"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        for name, load, warm in self._specs:
+            self._set(name, state="loading")
+            started = time.perf_counter()
+            try:
+                model = load()
+                if warm is not None:
+                    warm(model)
+            except Exception as e:
+                print(f"Error warming up model {name}: {e}")
+                self._set(name, state="failed", error=str(e), seconds=time.perf_counter() - started)
+                continue
+            with self._lock:
+                self._models[name] = model
+            self._set(name, state="ready", seconds=time.perf_counter() - started)
+
+    def _set(self, name, **fields):
+        with self._lock:
+            self._status[name] = {**self._status[name], **fields}
+
+    def get(self, name):
+        """The loaded model, or None until it is ready"""
+        return self._models.get(name)
+
+    def status(self, name=None):
+        """State of one model, or of all of them by name"""
+        with self._lock:
+            if name is not None:
+                return dict(self._status[name])
+            return {model: dict(status) for model, status in self._status.items()}
+
+    def wait(self, name, timeout=None):
+        """Block until a model is ready or failed (scripts and tests; pages shouldn't); returns it or None"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.status(name)["state"] in ("pending", "loading"):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(0.05)
+        return self.get(name)
@@ -0,0 +1,148 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# PBKDF2-HMAC-SHA256 work factor (OWASP's current recommendation). Rows
+# hashed with a different count are rehashed on their next login.
+PBKDF2_ITERATIONS = 600_000
+
+HASH_SCHEME = "pbkdf2_sha256"
+
+
+class HashingBusy(Exception):
+    """The hashing pool's queue is full"""
+
+
+def legacy_hash(password, salt):
+    """The original unsalted-iteration scheme: SHA-256 of password + salt"""
+    return hashlib.sha256((password + salt).encode()).hexdigest()
+
+
+def hash_password(password, salt, iterations=PBKDF2_ITERATIONS):
+    """Stored as pbkdf2_sha256$<iterations>$<hex digest>; the salt keeps its own column"""
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), iterations)
+    return f"{HASH_SCHEME}${iterations}${digest.hex()}"
+
+
+def verify_password(password, salt, stored_hash):
+    """Whether password matches a stored hash in either scheme"""
+    if stored_hash.startswith(HASH_SCHEME + "$"):
+        _, iterations, _ = stored_hash.split("$")
+        return hmac.compare_digest(hash_password(password, salt, int(iterations)), stored_hash)
+    return hmac.compare_digest(legacy_hash(password, salt), stored_hash)
+
+
+class PasswordHasher:
+    """
+    Bounded pool for key derivation.
+
+    pbkdf2_hmac releases the GIL, so `workers` hashes run in parallel while
+    callers wait without holding any database lock. At most `queue_limit`
+    more may wait for a worker; beyond that hash() and verify() raise
+    HashingBusy at once instead of queueing without bound.
+    """
+
+    def __init__(self, iterations=PBKDF2_ITERATIONS, workers=4, queue_limit=32):
+        self.iterations = iterations
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self.completed = 0
+        self.rejected = 0
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingBusy()
+        try:
+            result = self._pool.submit(func, *args).result()
+        finally:
+            self._slots.release()
+        # Successful hashes and verifications only; failures and rejections aren't throughput
+        self.completed += 1
+        return result
+
+    def hash(self, password, salt):
+        return self._run(hash_password, password, salt, self.iterations)
+
+    def verify(self, password, salt, stored_hash):
+        return self._run(verify_password, password, salt, stored_hash)
+
+    def hash_many(self, passwords_and_salts, iterations=None, workers=None):
+        """
+        Hash (password, salt) pairs in parallel on a separate pool, so a large
+        batch doesn't queue ahead of logins on this one
+        """
+        iterations = iterations or self.iterations
+        pairs = list(passwords_and_salts)
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                thread_name_prefix="password-hash-bulk") as pool:
+            return list(pool.map(lambda pair: hash_password(pair[0], pair[1], iterations), pairs,
+                                 chunksize=max(len(pairs) // 64, 1)))
+
+    def needs_rehash(self, stored_hash):
+        """Legacy SHA-256 rows and rows hashed with a different iteration count"""
+        return not stored_hash.startswith(f"{HASH_SCHEME}${self.iterations}$")
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+class LoginRateLimiter:
+    """
+    Sliding-window limit on login attempts per key ("user:<name>", "ip:<addr>").
+
+    Each key keeps the times of its attempts within the last `window`
+    seconds. An attempt over any key's limit is refused before a database
+    read or a hash. A successful login clears its user key.
+    """
+
+    def __init__(self, max_attempts=5, window=60.0, ip_max_attempts=30):
+        self.max_attempts = max_attempts
+        self.ip_max_attempts = ip_max_attempts
+        self.window = window
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.refused = 0
+
+    def _limit(self, key):
+        return self.ip_max_attempts if key.startswith("ip:") else self.max_attempts
+
+    def allow(self, *keys):
+        """Record an attempt against every key; False (nothing recorded) if any is over its limit"""
+        now = time.monotonic()
+        cutoff = now - self.window
+        with self._lock:
+            if now - self._last_sweep > self.window:
+                self._sweep(cutoff)
+            windows = []
+            for key in keys:
+                attempts = self._attempts.setdefault(key, deque())
+                while attempts and attempts[0] <= cutoff:
+                    attempts.popleft()
+                if len(attempts) >= self._limit(key):
+                    self.refused += 1
+                    return False
+                windows.append(attempts)
+            for attempts in windows:
+                attempts.append(now)
+            return True
+
+    def reset(self, key):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def sweep(self):
+        """Drop idle keys now, e.g. from a maintenance thread when no logins arrive"""
+        with self._lock:
+            self._sweep(time.monotonic() - self.window)
+
+    def _sweep(self, cutoff):
+        """Drop keys with no attempts left in the window"""
+        self._attempts = {key: attempts for key, attempts in self._attempts.items()
+                          if attempts and attempts[-1] > cutoff}
+        self._last_sweep = time.monotonic()
@@ -5,6 +5,9 @@ import json
 import uuid
 import os
 from pathlib import Path
+from sales_funnel import ensure_sales_stage_table, backfill_sales_stage_events
+from log_search import ensure_search_index
+from customer_profiles import ensure_customer_profiles_table, backfill_customer_profiles
 
 # Ensure logs directory exists
 log_dir = Path("logs")
@@ -18,6 +21,13 @@ cursor = conn.cursor()
 # Drop and recreate the table to ensure we're starting fresh
 print("Creating tables...")
 cursor.execute("DROP TABLE IF EXISTS logs")
+cursor.execute("DROP TABLE IF EXISTS sales_stage_events")
+cursor.execute("DROP TABLE IF EXISTS distinct_sketches")
+cursor.execute("DROP TABLE IF EXISTS distinct_sketch_state")
+cursor.execute("DROP TABLE IF EXISTS logs_fts")
+cursor.execute("DROP TABLE IF EXISTS search_index_state")
+cursor.execute("DROP TABLE IF EXISTS customer_profiles")
+cursor.execute("DROP TABLE IF EXISTS lead_scores")
 cursor.execute('''
 CREATE TABLE logs (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -110,6 +120,11 @@ for record in test_records:
     cursor.execute(f"INSERT INTO logs ({fields_str}) VALUES ({placeholders})", params)
 
 conn.commit()
+ensure_sales_stage_table(conn)
+backfill_sales_stage_events(conn)
+ensure_search_index(conn)
+ensure_customer_profiles_table(conn)
+backfill_customer_profiles(conn)
 print("Inserted test records.")
 
 # Verify data was inserted
@@ -5,78 +5,45 @@ from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 import joblib
 import json
+import os
 from datetime import datetime, timedelta
-import sqlite3
+from sales_funnel import ensure_sales_stage_table, backfill_sales_stage_events, PURCHASE_STAGE
+from customer_profiles import (ensure_customer_profiles_table, backfill_customer_profiles, get_customer_profile,
+                               profile_features)
+from similar_customers import CustomerSimilarityIndex
+from vehicle_recommendations import VehicleRecommender
+from lead_scoring import LeadScorer, lead_priority
+from log_compression import attach_compact_reader
+from connection_manager import get_manager
 
 class PredictiveAnalytics:
     def __init__(self, db_path="logs/crm.db"):
-        self.conn = sqlite3.connect(db_path)
+        self.db = get_manager(db_path)
+        # Read compacted rows transparently through `logs`
+        self.db.add_reader_hook(attach_compact_reader)
+        with self.db.write() as conn:
+            ensure_sales_stage_table(conn)
+            backfill_sales_stage_events(conn)
+            ensure_customer_profiles_table(conn)
+            backfill_customer_profiles(conn)
         self.model_path = "models"
         self.purchase_model = None
         self.service_model = None
+        self.similarity_index = None
+        self.recommender = None
+
+    @property
+    def conn(self):
+        return self.db.reader()
     
     def _prepare_customer_features(self, customer_id):
-        """Extract features for a customer based on their log history"""
-        # Get all logs for this customer
-        query = "SELECT * FROM logs WHERE customer_id = ?"
-        customer_logs = pd.read_sql_query(query, self.conn, params=(customer_id,))
+        """Extract features for a customer from their materialized profile"""
+        profile = get_customer_profile(self.conn, customer_id)
         
-        if customer_logs.empty:
+        if profile is None:
             return None
         
-        # Extract features
-        features = {}
-        
-        # Activity recency (days since last interaction)
-        if not customer_logs.empty:
-            latest_interaction = pd.to_datetime(customer_logs['timestamp']).max()
-            features['days_since_last_interaction'] = (datetime.now() - latest_interaction).days
-        else:
-            features['days_since_last_interaction'] = 365  # Default for new customers
-            
-        # Interaction counts by category
-        category_counts = customer_logs['category'].value_counts().to_dict()
-        for category in ['CUSTOMER', 'SALES', 'SERVICE', 'ESG']:
-            features[f'{category.lower()}_interaction_count'] = category_counts.get(category, 0)
-            
-        # Sales funnel progression
-        sales_logs = customer_logs[customer_logs['category'] == 'SALES']
-        if not sales_logs.empty:
-            # Check highest funnel stage reached
-            stages = ['LEAD', 'CONTACT', 'TEST_DRIVE', 'NEGOTIATION', 'PURCHASE', 'DELIVERY']
-            stage_reached = 0
-            for i, stage in enumerate(stages):
-                if sales_logs['message'].str.contains(stage).any():
-                    stage_reached = i + 1
-            features['sales_funnel_stage'] = stage_reached
-        else:
-            features['sales_funnel_stage'] = 0
-            
-        # Service history
-        service_logs = customer_logs[customer_logs['category'] == 'SERVICE']
-        features['service_count'] = len(service_logs)
-        
-        # Average satisfaction score from service events
-        satisfaction_scores = []
-        for _, log in service_logs.iterrows():
-            try:
-                details = json.loads(log['details'])
-                if 'satisfaction_score' in details:
-                    satisfaction_scores.append(details['satisfaction_score'])
-            except:
-                pass
-                
-        features['avg_satisfaction'] = np.mean(satisfaction_scores) if satisfaction_scores else 3.0
-        
-        # Time since registration
-        customer_reg = customer_logs[customer_logs['message'] == 'Customer registration']
-        if not customer_reg.empty:
-            reg_date = pd.to_datetime(customer_reg['timestamp'].iloc[0])
-            features['days_since_registration'] = (datetime.now() - reg_date).days
-        else:
-            features['days_since_registration'] = 0
-            
-        return features
+        return profile_features(profile)
     
     def train_purchase_prediction_model(self):
         """Train a model to predict likelihood of purchase"""
@@ -84,6 +51,10 @@ class PredictiveAnalytics:
         query = "SELECT DISTINCT customer_id FROM logs WHERE customer_id IS NOT NULL"
         customer_ids = pd.read_sql_query(query, self.conn)['customer_id'].tolist()
         
+        # Customers who have completed a purchase
+        query = "SELECT DISTINCT customer_id FROM sales_stage_events WHERE stage = ?"
+        purchasers = set(pd.read_sql_query(query, self.conn, params=(PURCHASE_STAGE,))['customer_id'])
+        
         # Prepare training data
         X = []
         y = []
@@ -91,10 +62,7 @@ class PredictiveAnalytics:
         for customer_id in customer_ids:
             features = self._prepare_customer_features(customer_id)
             if features:
-                # Check if customer has completed a purchase
-                query = "SELECT * FROM logs WHERE customer_id = ? AND message LIKE '%PURCHASE%'"
-                purchase_logs = pd.read_sql_query(query, self.conn, params=(customer_id,))
-                has_purchased = not purchase_logs.empty
+                has_purchased = customer_id in purchasers
                 
                 X.append(list(features.values()))
                 y.append(1 if has_purchased else 0)
@@ -112,8 +80,13 @@ class PredictiveAnalytics:
             
             # Save model
             self.purchase_model = model
+            os.makedirs(self.model_path, exist_ok=True)
             joblib.dump(model, f"{self.model_path}/purchase_prediction_model.joblib")
             
+            # Refresh every live lead score with the new model
+            with self.db.write() as conn:
+                LeadScorer(f"{self.model_path}/purchase_prediction_model.joblib").rescore_all(conn)
+            
             # Return accuracy
             accuracy = model.score(X_test, y_test)
             return accuracy
@@ -141,9 +114,7 @@ class PredictiveAnalytics:
         return {
             "customer_id": customer_id,
             "purchase_likelihood": round(probability * 100, 2),
-            "recommendation": "High priority lead" if probability > 0.7 else 
-                              "Medium priority lead" if probability > 0.4 else 
-                              "Low priority lead"
+            "recommendation": lead_priority(probability)
         }
     
     def predict_service_needs(self, vehicle_id):
@@ -196,6 +167,34 @@ class PredictiveAnalytics:
             "confidence": "Low (based on standard intervals)"
         }
 
+    def build_similarity_index(self):
+        """Bulk-build (and save) the nearest-neighbour index over customer profiles"""
+        self.similarity_index = CustomerSimilarityIndex(f"{self.model_path}/customer_similarity.joblib")
+        return self.similarity_index.build(self.conn)
+    
+    def similar_customers(self, customer_id, k=10):
+        """The k customers most like customer_id (customer_id, distance), nearest first"""
+        if self.similarity_index is None:
+            index = CustomerSimilarityIndex(f"{self.model_path}/customer_similarity.joblib")
+            if not index.load():
+                index.build(self.conn)
+            self.similarity_index = index
+        return self.similarity_index.similar_customers(self.conn, customer_id, k)
+    
+    def build_vehicle_recommender(self):
+        """Bulk-build (and save) the item-item vehicle recommender"""
+        self.recommender = VehicleRecommender(f"{self.model_path}/vehicle_recommender.joblib")
+        return self.recommender.build(self.conn)
+    
+    def recommend_vehicles(self, customer_id, n=5):
+        """Top-n vehicle models for a customer (model, score), best first"""
+        if self.recommender is None:
+            recommender = VehicleRecommender(f"{self.model_path}/vehicle_recommender.joblib")
+            if not recommender.load():
+                recommender.build(self.conn)
+            self.recommender = recommender
+        return self.recommender.recommend(self.conn, customer_id, n)
+    
     def identify_customer_segments(self, min_cluster_size=5):
         """Segment customers based on their interaction patterns"""
         from sklearn.cluster import KMeans
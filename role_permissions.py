@@ -0,0 +1,77 @@
+import json
+import time
+import zlib
+
+
+class _CompiledRoles:
+    """One immutable build of every role's permissions"""
+
+    def __init__(self, roles):
+        # One bit per (module, action) pair seen in any role
+        self.bits = {}
+        self.masks = {}
+        self.permissions = {}
+        # Same permissions, same version, in every process
+        self.versions = {}
+        for role_name, permissions in roles.items():
+            mask = 0
+            for module, actions in permissions.items():
+                for action in actions:
+                    bit = self.bits.setdefault((module, action), 1 << len(self.bits))
+                    mask |= bit
+            self.masks[role_name] = mask
+            self.permissions[role_name] = {module: tuple(actions) for module, actions in permissions.items()}
+            self.versions[role_name] = zlib.crc32(json.dumps(permissions, sort_keys=True).encode())
+
+
+class PermissionTable:
+    """
+    Role permissions compiled into one bitmask per role.
+
+    check() is two dict lookups and an AND; permissions() returns a role's
+    whole {module: [actions]} map without parsing JSON. load() builds a new
+    snapshot from the roles table and swaps it in with a single assignment,
+    so readers never see a half-built table and need no lock.
+    AuthenticationSystem reloads it after create_role/update_role; changes
+    made by other processes are picked up once the snapshot is `max_age`
+    seconds old.
+    """
+
+    def __init__(self, max_age=60.0):
+        self.max_age = max_age
+        self._compiled = None
+        self._loaded_at = 0.0
+
+    def load(self, conn):
+        """Compile every row of the roles table and swap it in"""
+        cursor = conn.cursor()
+        cursor.execute("SELECT role_name, permissions FROM roles")
+        roles = {role_name: json.loads(permissions) for role_name, permissions in cursor.fetchall()}
+        self._compiled = _CompiledRoles(roles)
+        self._loaded_at = time.monotonic()
+        return len(roles)
+
+    def stale(self):
+        return self._compiled is None or time.monotonic() - self._loaded_at >= self.max_age
+
+    def check(self, role, module, action):
+        compiled = self._compiled
+        return bool(compiled.masks.get(role, 0) & compiled.bits.get((module, action), 0))
+
+    def mask(self, role):
+        """The role's bitmask; test a (module, action) with mask & bit(module, action)"""
+        return self._compiled.masks.get(role, 0)
+
+    def bit(self, module, action):
+        return self._compiled.bits.get((module, action), 0)
+
+    def permissions(self, role):
+        """All of a role's permissions as {module: [actions]}; {} for unknown roles"""
+        return {module: list(actions) for module, actions in self._compiled.permissions.get(role, {}).items()}
+
+    def version(self, role):
+        """Checksum of the role's permissions; changes whenever they do"""
+        return self._compiled.versions.get(role)
+
+    def roles(self):
+        return list(self._compiled.masks)
@@ -0,0 +1,130 @@
+import json
+
+# Ordered sales funnel; a stage's integer code is its position + 1 (0 = no stage)
+SALES_STAGES = ['LEAD', 'CONTACT', 'TEST_DRIVE', 'NEGOTIATION', 'PURCHASE', 'DELIVERY']
+STAGE_CODES = {stage: i + 1 for i, stage in enumerate(SALES_STAGES)}
+PURCHASE_STAGE = STAGE_CODES['PURCHASE']
+FINAL_STAGE = len(SALES_STAGES)
+
+
+def stage_name(stage):
+    """Map an integer stage code back to its name"""
+    if 1 <= stage <= FINAL_STAGE:
+        return SALES_STAGES[stage - 1]
+    return None
+
+
+def parse_sales_stage(message):
+    """Parse the funnel stage out of a SALES log message ("Sales event: TEST_DRIVE")"""
+    if not message:
+        return 0
+
+    event_type = message.split(":", 1)[-1].strip()
+    if event_type in STAGE_CODES:
+        return STAGE_CODES[event_type]
+
+    # Free-form messages: highest stage mentioned anywhere in the text
+    stage_reached = 0
+    for stage, code in STAGE_CODES.items():
+        if stage in message:
+            stage_reached = code
+    return stage_reached
+
+
+def _detail_model(details):
+    if isinstance(details, str):
+        try:
+            details = json.loads(details)
+        except (json.JSONDecodeError, TypeError):
+            return None
+    if isinstance(details, dict):
+        return details.get('model')
+    return None
+
+
+def ensure_sales_stage_table(conn):
+    """Create the sales_stage_events table and its indexes if they don't exist"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sales_stage_events (
+        log_id INTEGER PRIMARY KEY,
+        timestamp TEXT,
+        customer_id TEXT,
+        vehicle_id TEXT,
+        model TEXT,
+        stage INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sales_stage_customer ON sales_stage_events (customer_id, stage)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sales_stage_time ON sales_stage_events (timestamp, stage)"
+    )
+    # Every logs row at or below last_log_id has been parsed (contiguous, unlike MAX(log_id))
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sales_stage_state (
+        key TEXT PRIMARY KEY,
+        value INTEGER
+    )
+    ''')
+    conn.commit()
+
+
+def _stage_event(log_id, timestamp, message, customer_id, vehicle_id, details):
+    return (log_id, timestamp, customer_id, vehicle_id, _detail_model(details), parse_sales_stage(message))
+
+
+def _store_stage_events(cursor, events):
+    cursor.executemany('''
+    INSERT OR REPLACE INTO sales_stage_events (log_id, timestamp, customer_id, vehicle_id, model, stage)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', [event for event in events if event[-1]])
+
+
+def sync_sales_stage_events(cursor):
+    """Parse SALES rows added to logs since the watermark"""
+    cursor.execute("SELECT value FROM sales_stage_state WHERE key = 'last_log_id'")
+    row = cursor.fetchone()
+    last_id = row[0] if row else 0
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM logs")
+    max_id = cursor.fetchone()[0]
+    if max_id <= last_id:
+        return 0
+
+    cursor.execute('''
+    SELECT id, timestamp, message, customer_id, vehicle_id, details
+    FROM logs
+    WHERE id > ? AND id <= ? AND category = 'SALES'
+    ''', (last_id, max_id))
+    stages = [_stage_event(*row) for row in cursor.fetchall()]
+    _store_stage_events(cursor, stages)
+    cursor.execute(
+        "INSERT OR REPLACE INTO sales_stage_state (key, value) VALUES ('last_log_id', ?)",
+        (max_id,)
+    )
+    return sum(1 for event in stages if event[-1])
+
+
+class SalesStageRecorder:
+    """Ingest listener that records the funnel stage of each SALES row as it is written"""
+
+    def setup(self, conn):
+        ensure_sales_stage_table(conn)
+
+    def on_logs(self, cursor, rows):
+        # Reads from the watermark rather than `rows`, so rows loaded with
+        # listeners=() since the last sync are parsed first
+        sync_sales_stage_events(cursor)
+
+
+def backfill_sales_stage_events(conn):
+    """Parse SALES rows added to `logs` since the watermark"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'logs'")
+    if not cursor.fetchone():
+        return 0
+
+    recorded = sync_sales_stage_events(cursor)
+    conn.commit()
+    return recorded
@@ -6,6 +6,11 @@ import json
 import uuid
 from pathlib import Path
 import time
+from sales_funnel import ensure_sales_stage_table, backfill_sales_stage_events
+from sketches import DistinctSketchStore
+from log_search import ensure_search_index
+from customer_profiles import ensure_customer_profiles_table, backfill_customer_profiles
+from lead_scoring import LeadScorer, ensure_lead_scores_table
 
 # Ensure log directory exists
 log_dir = Path("logs")
@@ -31,6 +36,12 @@ CREATE TABLE IF NOT EXISTS logs (
 )
 ''')
 conn.commit()
+ensure_sales_stage_table(conn)
+sketches = DistinctSketchStore()
+sketches.setup(conn)
+ensure_search_index(conn)
+ensure_customer_profiles_table(conn)
+ensure_lead_scores_table(conn)
 
 # Sample data
 customer_ids = [f"CUST-{i:04d}" for i in range(1, 51)]
@@ -59,6 +70,13 @@ def random_date(start, end):
 
 # Clear existing data
 cursor.execute("DELETE FROM logs")
+cursor.execute("DELETE FROM sales_stage_events")
+cursor.execute("DELETE FROM distinct_sketches")
+cursor.execute("DELETE FROM distinct_sketch_state")
+cursor.execute("DELETE FROM logs_fts")
+cursor.execute("DELETE FROM search_index_state")
+cursor.execute("DELETE FROM customer_profiles")
+cursor.execute("DELETE FROM lead_scores")
 conn.commit()
 
 # Generate system logs
@@ -303,5 +321,12 @@ for i in range(10):
     ))
 
 conn.commit()
+
+# Parse funnel stages, build distinct-count sketches, search index, customer profiles and lead scores
+backfill_sales_stage_events(conn)
+sketches.refresh(conn)
+ensure_search_index(conn)
+backfill_customer_profiles(conn)
+LeadScorer().rescore_all(conn)
 print(f"Sample data generation complete! Generated logs for {len(customer_ids)} customers.")
 print("You can now run your Streamlit app to see the visualizations.")
\ No newline at end of file
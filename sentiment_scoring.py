@@ -0,0 +1,64 @@
+import numpy as np
+
+SENTIMENT_MODEL_PATH = "sentiment_model.keras"
+# Fitted vocabulary saved by train_sentiment_model.py
+TOKENIZER_PATH = "sentiment_tokenizer.json"
+# Sequence length the model was trained on
+SENTIMENT_MAXLEN = 200
+BATCH_SIZE = 256
+
+
+def save_tokenizer(tokenizer, path=TOKENIZER_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(tokenizer.to_json())
+
+
+def load_tokenizer(path=TOKENIZER_PATH):
+    from tensorflow.keras.preprocessing.text import tokenizer_from_json
+    try:
+        with open(path, encoding="utf-8") as f:
+            return tokenizer_from_json(f.read())
+    except FileNotFoundError:
+        # An unfitted tokenizer maps every comment to nothing, so don't serve without one
+        raise FileNotFoundError(f"{path} not found; run train_sentiment_model.py to save the fitted tokenizer")
+
+
+class SentimentScorer:
+    """
+    The sentiment model with the tokenizer it was trained with.
+
+    Texts are tokenized together, padded to SENTIMENT_MAXLEN and scored
+    batch_size rows at a time. The last batch is zero-padded to full size,
+    so every call has the same input shape and TensorFlow traces the model
+    once.
+    """
+
+    def __init__(self, model, tokenizer, batch_size=BATCH_SIZE):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.batch_size = batch_size
+
+    def predict_proba(self, texts):
+        """Probability that each text is positive"""
+        from tensorflow.keras.preprocessing.sequence import pad_sequences
+        texts = ["" if text is None else str(text) for text in texts]
+        if not texts:
+            return np.array([])
+        sequences = pad_sequences(self.tokenizer.texts_to_sequences(texts), maxlen=SENTIMENT_MAXLEN)
+        scores = np.empty(len(texts))
+        batch = np.zeros((self.batch_size, SENTIMENT_MAXLEN), dtype=sequences.dtype)
+        for start in range(0, len(texts), self.batch_size):
+            rows = sequences[start:start + self.batch_size]
+            batch[:len(rows)] = rows
+            batch[len(rows):] = 0
+            scores[start:start + len(rows)] = np.asarray(self.model.predict_on_batch(batch)).ravel()[:len(rows)]
+        return scores
+
+    def predict(self, texts):
+        """'Positive' or 'Negative' for each text"""
+        return ['Positive' if score >= 0.5 else 'Negative' for score in self.predict_proba(texts)]
+
+
+def load_sentiment_scorer(model_path=SENTIMENT_MODEL_PATH, tokenizer_path=TOKENIZER_PATH, batch_size=BATCH_SIZE):
+    from tensorflow.keras.models import load_model
+    return SentimentScorer(load_model(model_path), load_tokenizer(tokenizer_path), batch_size)
@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+
+def _copy(info):
+    # Callers get their own permissions dict; cached entries are never shared
+    return {**info, "permissions": {module: list(actions) for module, actions in info["permissions"].items()}}
+
+
+class SessionCache:
+    """
+    In-process TTL + LRU cache of validated sessions.
+
+    An entry lives for at most `ttl` seconds and never past its session's
+    expires_at. AuthenticationSystem drops entries explicitly when a session
+    is logged out or a user's password, details or role change. Other
+    processes sharing the database only see such changes once the TTL runs
+    out.
+
+    Every invalidation bumps `generation`; a loader that read the database
+    before an invalidation can't put its now stale result back (see put()).
+    """
+
+    def __init__(self, ttl=60, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.generation = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, session_id):
+        """Cached session info, or None on a miss"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            deadline, info = entry
+            if deadline <= time.monotonic():
+                del self._sessions[session_id]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return _copy(info)
+
+    def put(self, session_id, info, expires_at, generation):
+        """Cache info loaded at `generation`; skipped if anything was invalidated since"""
+        remaining = (datetime.fromisoformat(expires_at) - datetime.now()).total_seconds()
+        if remaining <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._sessions[session_id] = (time.monotonic() + min(self.ttl, remaining), _copy(info))
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def _invalidate(self, matches):
+        with self._lock:
+            self.generation += 1
+            stale = [session_id for session_id, (_, info) in self._sessions.items() if matches(info)]
+            for session_id in stale:
+                del self._sessions[session_id]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def invalidate(self, session_id):
+        with self._lock:
+            self.generation += 1
+            if self._sessions.pop(session_id, None) is None:
+                return 0
+            self.invalidations += 1
+            return 1
+
+    def invalidate_user(self, user_id):
+        return self._invalidate(lambda info: info["user_id"] == user_id)
+
+    def invalidate_role(self, role):
+        return self._invalidate(lambda info: info["role"] == role)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._sessions.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._sessions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
@@ -0,0 +1,168 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+# Overrides the secret stored in the database, e.g. to share it between deployments
+SECRET_ENV_VAR = "CRM_SESSION_SECRET"
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def ensure_token_tables(conn):
+    """Create the signing secret and revocation tables if they don't exist"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS auth_secrets (
+        name TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    ''')
+    # A row revokes one token (token_id) or every token a user was issued up to revoked_at
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS token_revocations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        token_id TEXT,
+        user_id INTEGER,
+        revoked_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_token_revocations_expires ON token_revocations (expires_at)")
+    conn.commit()
+
+
+def load_or_create_secret(conn):
+    """The HMAC key: $CRM_SESSION_SECRET, else one generated once and kept in auth_secrets"""
+    if os.getenv(SECRET_ENV_VAR):
+        return os.getenv(SECRET_ENV_VAR).encode()
+    cursor = conn.cursor()
+    cursor.execute("INSERT OR IGNORE INTO auth_secrets (name, value) VALUES ('session_token', ?)",
+                   (secrets.token_hex(32),))
+    cursor.execute("SELECT value FROM auth_secrets WHERE name = 'session_token'")
+    secret = cursor.fetchone()[0]
+    conn.commit()
+    return secret.encode()
+
+
+class SessionTokens:
+    """
+    HMAC-SHA256 signed session tokens.
+
+    A token is base64url(JSON payload) + "." + base64url(signature). The
+    payload carries the token id, user id, username, role, the role's
+    permissions version and issue/expiry times, so verify() needs no
+    database read.
+
+    Revocations are held in memory: single tokens (logout) until they would
+    have expired anyway, and per-user cut-offs (password reset, role change)
+    for one token lifetime. They are also written to token_revocations.
+    sync() picks up rows other processes added since the last sync, and
+    prune() forgets entries that can no longer match a live token.
+    """
+
+    def __init__(self, secret, lifetime=86400):
+        self.secret = secret
+        self.lifetime = lifetime
+        self._revoked_tokens = {}
+        self._revoked_users = {}
+        self._watermark = 0
+        self._lock = threading.Lock()
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self.secret, payload.encode(), hashlib.sha256).digest())
+
+    def issue(self, user_id, username, role, permissions_version):
+        now = time.time()
+        payload = _b64encode(json.dumps({
+            "jti": secrets.token_hex(8),
+            "uid": user_id,
+            "usr": username,
+            "role": role,
+            "pv": permissions_version,
+            "iat": round(now, 3),
+            "exp": int(now + self.lifetime)
+        }, separators=(",", ":")).encode())
+        return f"{payload}.{self._sign(payload)}"
+
+    def decode(self, token):
+        """The payload of a correctly signed token, expired or not; None otherwise"""
+        payload, _, signature = token.partition(".")
+        if not signature or not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        try:
+            return json.loads(_b64decode(payload))
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+    def verify(self, token):
+        """The payload of a valid, unexpired and unrevoked token, or None"""
+        claims = self.decode(token)
+        if claims is None or claims["exp"] <= time.time():
+            return None
+        if claims["jti"] in self._revoked_tokens:
+            return None
+        revoked_at = self._revoked_users.get(claims["uid"])
+        if revoked_at is not None and claims["iat"] <= revoked_at:
+            return None
+        return claims
+
+    def _remember(self, token_id, user_id, revoked_at, expires_at):
+        with self._lock:
+            if token_id is not None:
+                self._revoked_tokens[token_id] = expires_at
+            else:
+                self._revoked_users[user_id] = max(revoked_at, self._revoked_users.get(user_id, 0))
+
+    def revoke(self, conn, claims):
+        """Revoke one token (logout)"""
+        self._record(conn, claims["jti"], claims["uid"], time.time(), claims["exp"])
+
+    def revoke_user(self, conn, user_id):
+        """Revoke every token issued to a user so far"""
+        now = time.time()
+        self._record(conn, None, user_id, now, now + self.lifetime)
+
+    def _record(self, conn, token_id, user_id, revoked_at, expires_at):
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO token_revocations (token_id, user_id, revoked_at, expires_at) VALUES (?, ?, ?, ?)",
+            (token_id, user_id, revoked_at, expires_at)
+        )
+        conn.commit()
+        self._remember(token_id, user_id, revoked_at, expires_at)
+
+    def sync(self, conn):
+        """Load revocations recorded since the last sync (including other processes'); returns how many"""
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT id, token_id, user_id, revoked_at, expires_at FROM token_revocations
+        WHERE id > ? AND expires_at > ? ORDER BY id
+        ''', (self._watermark, time.time()))
+        rows = cursor.fetchall()
+        for row_id, token_id, user_id, revoked_at, expires_at in rows:
+            self._remember(token_id, user_id, revoked_at, expires_at)
+            self._watermark = row_id
+        return len(rows)
+
+    def prune(self):
+        """Forget revocations whose tokens have expired anyway"""
+        now = time.time()
+        with self._lock:
+            self._revoked_tokens = {token_id: expires_at for token_id, expires_at in self._revoked_tokens.items()
+                                    if expires_at > now}
+            self._revoked_users = {user_id: revoked_at for user_id, revoked_at in self._revoked_users.items()
+                                   if revoked_at + self.lifetime > now}
+
+    def stats(self):
+        return {"revoked_tokens": len(self._revoked_tokens), "revoked_users": len(self._revoked_users)}
@@ -0,0 +1,197 @@
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+# Feature vector per customer, read straight from customer_profiles. Mirrors
+# PredictiveAnalytics._prepare_customer_features, except that the two "days
+# since" features are stored as absolute day numbers: distances are the same,
+# and vectors don't go stale as the clock moves.
+SIMILARITY_FEATURES = (
+    'last_interaction_day', 'customer_interaction_count', 'sales_interaction_count',
+    'service_interaction_count', 'esg_interaction_count', 'sales_funnel_stage',
+    'service_count', 'avg_satisfaction', 'registration_day'
+)
+
+FEATURES_SQL = '''
+SELECT customer_id,
+       COALESCE(julianday(last_interaction), julianday('now')),
+       COALESCE(json_extract(category_counts, '$.CUSTOMER'), 0),
+       COALESCE(json_extract(category_counts, '$.SALES'), 0),
+       COALESCE(json_extract(category_counts, '$.SERVICE'), 0),
+       COALESCE(json_extract(category_counts, '$.ESG'), 0),
+       stage,
+       service_count,
+       CASE WHEN satisfaction_count > 0 THEN satisfaction_sum / satisfaction_count ELSE 3.0 END,
+       COALESCE(julianday(COALESCE(registered_at, first_seen)), julianday('now')),
+       last_log_id
+FROM customer_profiles
+WHERE last_log_id > ?
+'''
+
+
+def load_profile_features(conn, since_log_id=0):
+    """(customer_ids, feature matrix, newest last_log_id) for profiles changed after since_log_id"""
+    cursor = conn.cursor()
+    cursor.execute(FEATURES_SQL, (since_log_id,))
+    rows = cursor.fetchall()
+    if not rows:
+        return [], np.empty((0, len(SIMILARITY_FEATURES))), since_log_id
+    customer_ids = [row[0] for row in rows]
+    matrix = np.array([row[1:-1] for row in rows], dtype=float)
+    return customer_ids, matrix, max(row[-1] for row in rows)
+
+
+class CustomerSimilarityIndex:
+    """
+    "Customers like this one": a BallTree over standardized profile features.
+
+    build() fits the scaler and tree over every profile and saves them to
+    `path`. refresh() picks up profiles changed since the build (by their
+    last_log_id) into a small delta that is searched by brute force, and
+    masks their stale entries in the tree. Once the delta outgrows
+    rebuild_fraction of the tree the whole index is rebuilt.
+    """
+
+    def __init__(self, path="models/customer_similarity.joblib", leaf_size=40,
+                 rebuild_fraction=0.1, refresh_interval=5.0):
+        self.path = Path(path)
+        self.leaf_size = leaf_size
+        self.rebuild_fraction = rebuild_fraction
+        self.refresh_interval = refresh_interval
+        self.tree = None
+        self.ids = np.array([], dtype=object)
+        self.positions = {}
+        self.mean = None
+        self.scale = None
+        self.watermark = 0
+        self._delta_ids = []
+        self._delta_vectors = []
+        self._delta_matrix = None
+        self._delta_positions = {}
+        self._stale = set()
+        self._last_refresh = 0.0
+
+    def _scaled(self, matrix):
+        return (matrix - self.mean) / self.scale
+
+    def build(self, conn):
+        """Fit the scaler and tree over every profile, then save the index"""
+        customer_ids, matrix, watermark = load_profile_features(conn)
+        if not customer_ids:
+            return 0
+        self.mean = matrix.mean(axis=0)
+        scale = matrix.std(axis=0)
+        self.scale = np.where(scale > 0, scale, 1.0)
+        self.tree = BallTree(self._scaled(matrix), leaf_size=self.leaf_size)
+        self.ids = np.array(customer_ids, dtype=object)
+        self.positions = {customer_id: i for i, customer_id in enumerate(customer_ids)}
+        self.watermark = watermark
+        self._delta_ids = []
+        self._delta_vectors = []
+        self._delta_positions = {}
+        self._stale = set()
+        self._last_refresh = time.monotonic()
+        self.save()
+        return len(customer_ids)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump({
+            "tree": self.tree, "ids": self.ids, "mean": self.mean, "scale": self.scale,
+            "watermark": self.watermark
+        }, self.path)
+
+    def load(self):
+        """Load the last saved build; False if there is none"""
+        try:
+            state = joblib.load(self.path)
+        except (FileNotFoundError, EOFError):
+            return False
+        self.tree = state["tree"]
+        self.ids = state["ids"]
+        self.positions = {customer_id: i for i, customer_id in enumerate(self.ids)}
+        self.mean = state["mean"]
+        self.scale = state["scale"]
+        self.watermark = state["watermark"]
+        self._delta_ids = []
+        self._delta_vectors = []
+        self._delta_positions = {}
+        self._stale = set()
+        return True
+
+    def refresh(self, conn, force=False):
+        """Fold profiles changed since the watermark into the delta; throttled to refresh_interval"""
+        if self.tree is None:
+            return self.build(conn)
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return 0
+        self._last_refresh = now
+        customer_ids, matrix, watermark = load_profile_features(conn, self.watermark)
+        if not customer_ids:
+            return 0
+        for customer_id, vector in zip(customer_ids, self._scaled(matrix)):
+            if customer_id in self._delta_positions:
+                self._delta_vectors[self._delta_positions[customer_id]] = vector
+            else:
+                self._delta_positions[customer_id] = len(self._delta_ids)
+                self._delta_ids.append(customer_id)
+                self._delta_vectors.append(vector)
+            if customer_id in self.positions:
+                self._stale.add(customer_id)
+        self._delta_matrix = np.array(self._delta_vectors)
+        self.watermark = watermark
+        if len(self._delta_ids) > self.rebuild_fraction * len(self.ids):
+            self.build(conn)
+        return len(customer_ids)
+
+    def _vector(self, customer_id):
+        if customer_id in self._delta_positions:
+            return self._delta_vectors[self._delta_positions[customer_id]]
+        if customer_id in self.positions:
+            return np.asarray(self.tree.get_arrays()[0][self.positions[customer_id]])
+        return None
+
+    def similar_customers(self, conn, customer_id, k=10):
+        """The k customers nearest to customer_id, as a DataFrame of customer_id and distance"""
+        self.refresh(conn)
+        vector = self._vector(customer_id) if self.tree is not None else None
+        if vector is None:
+            return pd.DataFrame(columns=['customer_id', 'distance'])
+
+        # Tree candidates, skipping the customer itself and entries superseded by the delta
+        n = min(k + 1, len(self.ids))
+        while True:
+            distances, indices = self.tree.query(vector.reshape(1, -1), k=n)
+            matches = {}
+            for distance, index in zip(distances[0], indices[0]):
+                candidate = self.ids[index]
+                if candidate != customer_id and candidate not in self._stale:
+                    matches[candidate] = distance
+            if len(matches) >= k or n >= len(self.ids):
+                break
+            n = min(2 * n, len(self.ids))
+
+        # Changed or new profiles, by brute force
+        if self._delta_ids:
+            delta_distances = np.linalg.norm(self._delta_matrix - vector, axis=1)
+            nearest = np.argpartition(delta_distances, min(k, len(delta_distances) - 1))[:k + 1]
+            for i in nearest:
+                candidate = self._delta_ids[i]
+                if candidate != customer_id:
+                    matches[candidate] = delta_distances[i]
+
+        nearest = sorted(matches.items(), key=lambda item: item[1])[:k]
+        return pd.DataFrame(nearest, columns=['customer_id', 'distance'])
+
+    def stats(self):
+        return {
+            "customers": len(self.ids) - len(self._stale) + len(self._delta_ids),
+            "tree_size": len(self.ids),
+            "delta_size": len(self._delta_ids),
+            "watermark": self.watermark
+        }
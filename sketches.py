@@ -0,0 +1,447 @@
+import hashlib
+import json
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+from array import array
+from collections import deque
+from datetime import datetime
+
+# Identifier columns tracked with per-day distinct-count sketches
+SKETCH_FIELDS = ('customer_id', 'vehicle_id')
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter with 2**precision one-byte registers.
+
+    Standard error is about 1.04 / sqrt(2**precision); sketches of the same
+    precision merge losslessly, so per-day sketches can be combined over any
+    date range.
+    """
+
+    def __init__(self, precision=12, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    @classmethod
+    def for_error(cls, error):
+        """Smallest sketch whose standard error is at most `error`"""
+        return cls(precision=max(4, min(16, math.ceil(math.log2((1.04 / error) ** 2)))))
+
+    @property
+    def standard_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value):
+        h = _hash64(value)
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        """Fold another sketch of the same precision into this one"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.m
+        if m == 16:
+            alpha = 0.673
+        elif m == 32:
+            alpha = 0.697
+        elif m == 64:
+            alpha = 0.709
+        else:
+            alpha = 0.7213 / (1 + 1.079 / m)
+
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        # Small-range correction (linear counting)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return bytes([self.precision]) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(precision=data[0], registers=data[1:])
+
+
+class DistinctSketchStore:
+    """
+    Per-day, per-category HyperLogLog sketches of customer_id and vehicle_id,
+    persisted in the `distinct_sketches` table next to `logs`.
+
+    Acts as an ingest listener for DatabaseLogHandler. Each batch, like
+    refresh(), adds every row between a contiguous log id watermark and the
+    newest row, so rows written by other paths (generators, bulk loads) are
+    picked up too. Re-adding a row is harmless since sketches are idempotent,
+    and cached registers are merged with the stored ones before writing so
+    concurrent writer processes don't overwrite each other's updates.
+    """
+
+    def __init__(self, precision=12, cache_days=3):
+        self.precision = precision
+        self.cache_days = cache_days
+        self._cache = {}
+
+    @property
+    def standard_error(self):
+        return 1.04 / math.sqrt(1 << self.precision)
+
+    def setup(self, conn):
+        cursor = conn.cursor()
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS distinct_sketches (
+            day TEXT NOT NULL,
+            category TEXT NOT NULL,
+            field TEXT NOT NULL,
+            registers BLOB NOT NULL,
+            PRIMARY KEY (field, day, category)
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS distinct_sketch_state (
+            key TEXT PRIMARY KEY,
+            value INTEGER
+        )
+        ''')
+        conn.commit()
+
+    def _load(self, cursor, key):
+        sketch = self._cache.get(key)
+        if sketch is None:
+            field, day, category = key
+            cursor.execute(
+                "SELECT registers FROM distinct_sketches WHERE field = ? AND day = ? AND category = ?",
+                (field, day, category)
+            )
+            row = cursor.fetchone()
+            sketch = HyperLogLog.from_bytes(row[0]) if row else HyperLogLog(self.precision)
+            self._cache[key] = sketch
+        return sketch
+
+    def _add(self, cursor, rows):
+        touched = {}
+        loaded = set()
+        for row in rows:
+            day = (row['timestamp'] or '')[:10]
+            if not day:
+                continue
+            for field in SKETCH_FIELDS:
+                value = row.get(field)
+                if value:
+                    key = (field, day, row['category'] or '')
+                    sketch = touched.get(key)
+                    if sketch is None:
+                        if key not in self._cache:
+                            loaded.add(key)
+                        sketch = touched[key] = self._load(cursor, key)
+                    sketch.add(value)
+
+        for key, sketch in touched.items():
+            if key in loaded:
+                continue
+            # Another process may have updated this sketch since it was cached
+            cursor.execute(
+                "SELECT registers FROM distinct_sketches WHERE field = ? AND day = ? AND category = ?", key
+            )
+            row = cursor.fetchone()
+            if row:
+                sketch.merge(HyperLogLog.from_bytes(row[0]))
+        cursor.executemany(
+            "INSERT OR REPLACE INTO distinct_sketches (field, day, category, registers) VALUES (?, ?, ?, ?)",
+            [(*key, sketch.to_bytes()) for key, sketch in touched.items()]
+        )
+        self._trim_cache()
+
+    def sync(self, cursor, batch_size=50000):
+        """Add rows written to logs since the watermark to their day's sketches"""
+        cursor.execute("SELECT value FROM distinct_sketch_state WHERE key = 'last_log_id'")
+        row = cursor.fetchone()
+        last_id = row[0] if row else 0
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM logs")
+        max_id = cursor.fetchone()[0]
+        if max_id <= last_id:
+            return 0
+
+        processed = 0
+        while True:
+            cursor.execute('''
+            SELECT id, timestamp, category, customer_id, vehicle_id
+            FROM logs
+            WHERE id > ? AND id <= ?
+            ORDER BY id
+            LIMIT ?
+            ''', (last_id, max_id, batch_size))
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, values)) for values in cursor.fetchall()]
+            if not rows:
+                break
+            self._add(cursor, rows)
+            last_id = rows[-1]['id']
+            processed += len(rows)
+        cursor.execute(
+            "INSERT OR REPLACE INTO distinct_sketch_state (key, value) VALUES ('last_log_id', ?)",
+            (max_id,)
+        )
+        return processed
+
+    def on_logs(self, cursor, rows):
+        # Reads from the watermark rather than `rows`, so rows loaded with
+        # listeners=() since the last sync are added first
+        self.sync(cursor)
+
+    def _trim_cache(self):
+        days = sorted({key[1] for key in self._cache})
+        if len(days) > self.cache_days:
+            keep = set(days[-self.cache_days:])
+            self._cache = {key: sketch for key, sketch in self._cache.items() if key[1] in keep}
+
+    def refresh(self, conn, batch_size=50000):
+        """Add rows written to `logs` since the watermark to their day's sketches"""
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'logs'")
+        if not cursor.fetchone():
+            return 0
+
+        processed = self.sync(cursor, batch_size)
+        conn.commit()
+        return processed
+
+    def merged(self, cursor, field, since_day=None, category=None):
+        """Union of the stored sketches for a field over a day range"""
+        query = "SELECT registers FROM distinct_sketches WHERE field = ?"
+        params = [field]
+        if since_day:
+            query += " AND day >= ?"
+            params.append(since_day)
+        if category:
+            query += " AND category = ?"
+            params.append(category)
+
+        result = HyperLogLog(self.precision)
+        cursor.execute(query, params)
+        for (registers,) in cursor.fetchall():
+            result.merge(HyperLogLog.from_bytes(registers))
+        return result
+
+
+class CountMinSketch:
+    """Count-min sketch: over-estimates counts by at most ~2N/width with high probability"""
+
+    def __init__(self, width=1024, depth=4):
+        self.width = width
+        self.depth = depth
+        self.tables = [array('I', bytes(4 * width)) for _ in range(depth)]
+
+    def _indexes(self, key):
+        return [hash((seed, key)) % self.width for seed in range(self.depth)]
+
+    def add(self, key, count=1):
+        """Add count for key and return its new estimate"""
+        estimate = None
+        for table, index in zip(self.tables, self._indexes(key)):
+            table[index] += count
+            if estimate is None or table[index] < estimate:
+                estimate = table[index]
+        return estimate
+
+    def estimate(self, key):
+        return min(table[index] for table, index in zip(self.tables, self._indexes(key)))
+
+
+def ensure_heavy_hitter_table(conn):
+    """Create the heavy_hitters snapshot table if it doesn't exist"""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(heavy_hitters)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if columns and 'writer' not in columns:
+        # Pre-writer snapshot layout; the table is rebuilt by the next snapshot anyway
+        cursor.execute("DROP TABLE heavy_hitters")
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS heavy_hitters (
+        writer TEXT NOT NULL,
+        window_minutes INTEGER NOT NULL,
+        rank INTEGER NOT NULL,
+        message TEXT,
+        component TEXT,
+        level TEXT,
+        count INTEGER NOT NULL,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (writer, window_minutes, rank)
+    )
+    ''')
+    conn.commit()
+
+
+def _epoch(timestamp):
+    """Seconds since the epoch for an ISO timestamp (naive ones are local time), or None"""
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _key_part(value):
+    # Keys must be hashable; a dict/list component (or message) is keyed by its text
+    if value is None:
+        return ''
+    return value if isinstance(value, str) else str(value)
+
+
+class HeavyHitterTracker:
+    """
+    Streaming top-K of (message, component, level) over sliding windows.
+
+    Time is split into fixed buckets, each holding a count-min sketch and
+    its `capacity` highest-count keys, so memory is bounded by
+    buckets x (width x depth + capacity) regardless of log volume. Window
+    counts sum the bucket estimates of every candidate seen in the window.
+    Rows count in the bucket of their own timestamp, so a backfill of older
+    logs doesn't land in the current windows.
+
+    As an ingest listener it tracks the configured categories and writes
+    the top keys per window to `heavy_hitters` on flush() (after every
+    ingest_events batch, and periodically from DatabaseLogHandler), so
+    readers in other processes never have to scan raw logs.
+    """
+
+    def __init__(self, categories=('SYSTEM',), bucket_seconds=60, buckets=60, width=1024, depth=4,
+                 capacity=50, snapshot_windows=(5, 15, 60), top_k=10):
+        self.categories = set(categories)
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = buckets
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+        self.snapshot_windows = snapshot_windows
+        self.top_k = top_k
+        self._buckets = deque()
+        # Snapshot rows are per tracker: trackers only count the rows they saw
+        self._instance = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+
+    def _bucket(self, at, now):
+        """The bucket for time `at`, or None when it is older than the buckets kept"""
+        newest = int(now // self.bucket_seconds)
+        while self._buckets and self._buckets[0][0] <= newest - self.max_buckets:
+            self._buckets.popleft()
+        # Clock skew: rows stamped in the future count in the current bucket
+        bucket_id = min(int(at // self.bucket_seconds), newest)
+        if bucket_id <= newest - self.max_buckets:
+            return None
+        index = len(self._buckets)
+        while index and self._buckets[index - 1][0] >= bucket_id:
+            index -= 1
+            if self._buckets[index][0] == bucket_id:
+                return self._buckets[index]
+        bucket = (bucket_id, CountMinSketch(self.width, self.depth), {})
+        self._buckets.insert(index, bucket)
+        return bucket
+
+    def add(self, key, at=None, now=None):
+        """Count key at time `at` (default: now); returns False if it is too old to be kept"""
+        now = time.time() if now is None else now
+        at = now if at is None else at
+        with self._lock:
+            bucket = self._bucket(at, now)
+            if bucket is None:
+                return False
+            _, sketch, candidates = bucket
+            estimate = sketch.add(key)
+            if key in candidates or len(candidates) < self.capacity:
+                candidates[key] = estimate
+            else:
+                smallest = min(candidates, key=candidates.get)
+                if estimate > candidates[smallest]:
+                    del candidates[smallest]
+                    candidates[key] = estimate
+
+    def top(self, window_minutes=60, k=10, now=None):
+        """Most frequent keys over the last window_minutes, as (key, estimated_count) pairs"""
+        now = time.time() if now is None else now
+        oldest = int(now // self.bucket_seconds) - math.ceil(window_minutes * 60 / self.bucket_seconds)
+        with self._lock:
+            window = [bucket for bucket in self._buckets if bucket[0] > oldest]
+            keys = set()
+            for _, _, candidates in window:
+                keys.update(candidates)
+            counts = {
+                key: sum(sketch.estimate(key) for _, sketch, _ in window)
+                for key in keys
+            }
+        return sorted(counts.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def setup(self, conn):
+        ensure_heavy_hitter_table(conn)
+
+    def on_logs(self, cursor, rows):
+        now = time.time()
+        # Backfilled rows older than every window can't affect a snapshot
+        oldest = now - max(self.snapshot_windows) * 60
+        for row in rows:
+            if row['category'] not in self.categories:
+                continue
+            at = _epoch(row['timestamp'])
+            if at is None:
+                at = now
+            elif at < oldest:
+                continue
+            component = row.get('component')
+            if not component and row.get('details'):
+                try:
+                    details = json.loads(row['details'])
+                    component = details.get('component') if isinstance(details, dict) else None
+                except (json.JSONDecodeError, TypeError):
+                    pass
+            self.add((_key_part(row['message']), _key_part(component or None),
+                      _key_part(row['level']).upper()), at, now)
+
+    def flush(self, cursor):
+        """Listener hook: persist the current top-K"""
+        self.snapshot(cursor)
+
+    def snapshot(self, cursor, now=None):
+        """
+        Replace this tracker's persisted top-K for every snapshot window.
+
+        Each tracker keeps its own rows (readers sum them), and rows of
+        trackers that stopped longer ago than the largest window are removed.
+        """
+        now = time.time() if now is None else now
+        updated_at = datetime.fromtimestamp(now).isoformat()
+        writer = f"{socket.gethostname()}:{os.getpid()}:{self._instance}"
+        rows = []
+        for window in self.snapshot_windows:
+            for rank, ((message, component, level), count) in enumerate(self.top(window, self.top_k, now), 1):
+                rows.append((writer, window, rank, message, component, level, count, updated_at))
+
+        stale = datetime.fromtimestamp(now - max(self.snapshot_windows) * 60).isoformat()
+        cursor.execute("DELETE FROM heavy_hitters WHERE writer = ? OR updated_at < ?", (writer, stale))
+        cursor.executemany('''
+        INSERT INTO heavy_hitters (writer, window_minutes, rank, message, component, level, count, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
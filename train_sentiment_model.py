@@ -5,6 +5,7 @@ from tensorflow.keras.preprocessing.text import Tokenizer
 from tensorflow.keras.preprocessing.sequence import pad_sequences
 from sklearn.model_selection import train_test_split
 import matplotlib.pyplot as plt
+from sentiment_scoring import save_tokenizer, SENTIMENT_MAXLEN, SENTIMENT_MODEL_PATH, TOKENIZER_PATH
 
 # Load dataset
 df = pd.read_csv("D:/Major project/sentiment_dataset.csv")
@@ -25,14 +26,14 @@ labels = review_df['Sentiment'].values
 tokenizer = Tokenizer(num_words=5000)
 tokenizer.fit_on_texts(texts)
 sequences = tokenizer.texts_to_sequences(texts)
-padded_sequences = pad_sequences(sequences, maxlen=200)
+padded_sequences = pad_sequences(sequences, maxlen=SENTIMENT_MAXLEN)
 
 # Split data into training and validation sets
 X_train, X_val, y_train, y_val = train_test_split(padded_sequences, labels, test_size=0.2, random_state=42)
 
 # Define the LSTM model with added regularization
 model = Sequential([
-    Embedding(input_dim=5000, output_dim=32, input_length=200),  # Correctly define input_dim and input_length
+    Embedding(input_dim=5000, output_dim=32, input_length=SENTIMENT_MAXLEN),  # Correctly define input_dim and input_length
     SpatialDropout1D(0.2),  # Add SpatialDropout1D for better regularization
     Bidirectional(LSTM(64, dropout=0.5, recurrent_dropout=0.5)),  # Bidirectional LSTM
     Dropout(0.5),
@@ -62,6 +63,7 @@ plt.legend()
 plt.savefig('Loss_Plot.jpg')
 plt.show()
 
-# Save the model
-model.save("sentiment_model.keras")
-print("Model saved to 'sentiment_model.keras'")
\ No newline at end of file
+# Save the model, and the fitted tokenizer the app needs to reproduce its vocabulary
+model.save(SENTIMENT_MODEL_PATH)
+save_tokenizer(tokenizer, TOKENIZER_PATH)
+print(f"Model saved to '{SENTIMENT_MODEL_PATH}', tokenizer to '{TOKENIZER_PATH}'")
\ No newline at end of file
@@ -0,0 +1,249 @@
+import json
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Score multiplier for models matching the customer's registration preferences
+# (e.g. "SUV" matches "SUV Pro"); cold-start customers get popular matches first
+PREFERENCE_BOOST = 1.5
+
+
+def _preference_models(preferences, items):
+    """Catalog models whose name contains one of the customer's preference words"""
+    if isinstance(preferences, str):
+        try:
+            preferences = json.loads(preferences)
+        except (json.JSONDecodeError, TypeError):
+            preferences = [preferences]
+    if not isinstance(preferences, list):
+        return []
+    words = {str(preference).lower() for preference in preferences}
+    return [model for model in items if words & set(model.lower().split())]
+
+
+class VehicleRecommender:
+    """
+    Item-item collaborative filtering over a sparse customer x model matrix.
+
+    A customer's weight for a model is the furthest funnel stage reached
+    with it in sales_stage_events (LEAD=1 ... DELIVERY=6). The item Gram
+    matrix X.T @ X is kept exactly: refresh() re-reads the rows of customers
+    with new events since the watermark and applies new.T @ new - old.T @ old,
+    then recomputes the cosine similarities (pruned to `neighbours` per
+    model). Changed rows live in an override table until they outgrow
+    rebuild_fraction of the matrix. Preferences from customer_profiles are
+    applied when recommending, so they don't inflate the matrix.
+    """
+
+    def __init__(self, path="models/vehicle_recommender.joblib", neighbours=50,
+                 rebuild_fraction=0.1, refresh_interval=5.0):
+        self.path = Path(path)
+        self.neighbours = neighbours
+        self.rebuild_fraction = rebuild_fraction
+        self.refresh_interval = refresh_interval
+        self.items = []
+        self.item_positions = {}
+        self.customer_positions = {}
+        self.interactions = None
+        self.gram = None
+        self.similarity = None
+        self.popularity = None
+        self.watermark = 0
+        self._overrides = {}
+        self._last_refresh = 0.0
+
+    def _watermark(self, conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(log_id), 0) FROM sales_stage_events")
+        return cursor.fetchone()[0]
+
+    def _read_interactions(self, conn, max_log_id, customer_ids=None):
+        """{customer_id: {model: weight}} for every customer, or just customer_ids"""
+        cursor = conn.cursor()
+        rows = {}
+        chunks = [None] if customer_ids is None else [
+            customer_ids[start:start + 500] for start in range(0, len(customer_ids), 500)
+        ]
+        for chunk in chunks:
+            in_clause = "" if chunk is None else f"AND customer_id IN ({', '.join('?' for _ in chunk)})"
+            params = (max_log_id,) + (() if chunk is None else tuple(chunk))
+            cursor.execute(f'''
+            SELECT customer_id, model, MAX(stage)
+            FROM sales_stage_events
+            WHERE log_id <= ? AND customer_id IS NOT NULL AND model IS NOT NULL {in_clause}
+            GROUP BY customer_id, model
+            ''', params)
+            for customer_id, model, stage in cursor.fetchall():
+                rows.setdefault(customer_id, {})[model] = float(stage)
+        return rows
+
+    def _add_items(self, models):
+        new = [model for model in sorted(models) if model not in self.item_positions]
+        for model in new:
+            self.item_positions[model] = len(self.items)
+            self.items.append(model)
+        return bool(new)
+
+    def _matrix(self, rows):
+        """Stack {model: weight} rows into a sparse matrix over the item catalog"""
+        data, indices, indptr = [], [], [0]
+        for row in rows:
+            for model, weight in row.items():
+                indices.append(self.item_positions[model])
+                data.append(weight)
+            indptr.append(len(indices))
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), len(self.items)))
+
+    def _compute_similarity(self):
+        """Cosine similarity from the Gram matrix, keeping the top `neighbours` per model"""
+        norms = np.sqrt(self.gram.diagonal())
+        inverse = sparse.diags(np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0))
+        similarity = (inverse @ self.gram @ inverse).tocsr()
+        similarity.setdiag(0)
+        similarity.eliminate_zeros()
+        for i in range(similarity.shape[0]):
+            start, end = similarity.indptr[i], similarity.indptr[i + 1]
+            if end - start > self.neighbours:
+                row = similarity.data[start:end]
+                row[np.argsort(row)[:end - start - self.neighbours]] = 0
+        similarity.eliminate_zeros()
+        self.similarity = similarity
+
+    def build(self, conn):
+        """Read every interaction, precompute item-item similarity and save the index"""
+        watermark = self._watermark(conn)
+        self.items = []
+        self.item_positions = {}
+        rows = self._read_interactions(conn, watermark)
+        self._add_items({model for row in rows.values() for model in row})
+        customers = list(rows)
+        self.customer_positions = {customer_id: i for i, customer_id in enumerate(customers)}
+        self.interactions = self._matrix([rows[customer_id] for customer_id in customers])
+        self.gram = (self.interactions.T @ self.interactions).tocsr()
+        self.popularity = np.asarray(self.interactions.sum(axis=0)).ravel()
+        self._compute_similarity()
+        self.watermark = watermark
+        self._overrides = {}
+        self._last_refresh = time.monotonic()
+        self.save()
+        return self.interactions.nnz
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump({
+            "items": self.items, "customers": list(self.customer_positions), "interactions": self.interactions,
+            "gram": self.gram, "popularity": self.popularity, "watermark": self.watermark
+        }, self.path)
+
+    def load(self):
+        """Load the last saved build; False if there is none"""
+        try:
+            state = joblib.load(self.path)
+        except (FileNotFoundError, EOFError):
+            return False
+        self.items = state["items"]
+        self.item_positions = {model: i for i, model in enumerate(self.items)}
+        self.customer_positions = {customer_id: i for i, customer_id in enumerate(state["customers"])}
+        self.interactions = state["interactions"]
+        self.gram = state["gram"]
+        self.popularity = state["popularity"]
+        self.watermark = state["watermark"]
+        self._overrides = {}
+        self._compute_similarity()
+        return True
+
+    def _row(self, customer_id):
+        """(item indices, weights) of a customer's current interactions"""
+        if customer_id in self._overrides:
+            return self._overrides[customer_id]
+        position = self.customer_positions.get(customer_id)
+        if position is None:
+            return np.array([], dtype=int), np.array([])
+        start, end = self.interactions.indptr[position], self.interactions.indptr[position + 1]
+        return self.interactions.indices[start:end], self.interactions.data[start:end]
+
+    def refresh(self, conn, force=False):
+        """Apply interactions added since the watermark; throttled to refresh_interval"""
+        if self.gram is None:
+            return self.build(conn)
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return 0
+        self._last_refresh = now
+
+        watermark = self._watermark(conn)
+        if watermark <= self.watermark:
+            return 0
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT DISTINCT customer_id FROM sales_stage_events
+        WHERE log_id > ? AND log_id <= ? AND customer_id IS NOT NULL
+        ''', (self.watermark, watermark))
+        changed = [row[0] for row in cursor.fetchall()]
+        rows = self._read_interactions(conn, watermark, changed)
+
+        if self._add_items({model for row in rows.values() for model in row}):
+            size = len(self.items)
+            self.gram.resize((size, size))
+            self.interactions.resize((self.interactions.shape[0], size))
+            self.popularity = np.concatenate([self.popularity, np.zeros(size - len(self.popularity))])
+
+        old = []
+        for customer_id in changed:
+            indices, weights = self._row(customer_id)
+            old.append({self.items[i]: weight for i, weight in zip(indices, weights)})
+        new = [rows.get(customer_id, {}) for customer_id in changed]
+        old_matrix, new_matrix = self._matrix(old), self._matrix(new)
+        self.gram = (self.gram + new_matrix.T @ new_matrix - old_matrix.T @ old_matrix).tocsr()
+        self.gram.eliminate_zeros()
+        self.popularity += np.asarray(new_matrix.sum(axis=0) - old_matrix.sum(axis=0)).ravel()
+        for customer_id, position in zip(changed, range(new_matrix.shape[0])):
+            start, end = new_matrix.indptr[position], new_matrix.indptr[position + 1]
+            self._overrides[customer_id] = (new_matrix.indices[start:end], new_matrix.data[start:end])
+        self.watermark = watermark
+
+        if len(self._overrides) > self.rebuild_fraction * max(self.interactions.shape[0], 1):
+            self.build(conn)
+        else:
+            self._compute_similarity()
+        return len(changed)
+
+    def recommend(self, conn, customer_id, n=5):
+        """Top-n models for a customer (model, score); popular models fill in for cold starts"""
+        self.refresh(conn)
+        if not self.items:
+            return pd.DataFrame(columns=['model', 'score'])
+        indices, weights = self._row(customer_id)
+        if len(indices):
+            scores = np.asarray(self.similarity[indices].T @ weights).ravel()
+        else:
+            scores = np.zeros(len(self.items))
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT preferences FROM customer_profiles WHERE customer_id = ?", (customer_id,))
+        row = cursor.fetchone()
+        preferred = np.zeros(len(self.items), dtype=bool)
+        if row and row[0]:
+            for model in _preference_models(row[0], self.items):
+                preferred[self.item_positions[model]] = True
+            scores = np.where(preferred, scores * PREFERENCE_BOOST, scores)
+
+        # Models already in the customer's sales funnel aren't recommended again
+        seen = set(indices)
+        order = np.lexsort((-self.popularity, ~preferred, -scores))
+        top = [i for i in order if i not in seen][:n]
+        return pd.DataFrame({'model': [self.items[i] for i in top], 'score': scores[top]})
+
+    def stats(self):
+        return {
+            "customers": len(self.customer_positions) + sum(
+                1 for customer_id in self._overrides if customer_id not in self.customer_positions),
+            "models": len(self.items),
+            "interactions": self.interactions.nnz if self.interactions is not None else 0,
+            "overrides": len(self._overrides),
+            "watermark": self.watermark
+        }